@@ -1,6 +1,18 @@
 import httpx
+import queue
 import sys
+import threading
+import time
+from collections import deque
+from functools import partial
+from typing import Callable, Deque, List, Optional
+from app.core.alerting import alert_suppressor
 from app.core.config import settings
+from app.core.metrics import timed
+
+# Лимит длины одного сообщения Telegram
+MAX_MESSAGE_LENGTH = 4096
+BATCH_SEPARATOR = "\n\n➖➖➖\n\n"
 
 
 async def send_telegram_message(text: str) -> None:
@@ -22,7 +34,7 @@ async def send_telegram_message(text: str) -> None:
         return
     
     try:
-        url = f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage"
+        url = f"{settings.TELEGRAM_API_URL}/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage"
         
         payload = {
             "chat_id": settings.ADMIN_CHAT_ID,
@@ -50,3 +62,235 @@ async def send_telegram_message(text: str) -> None:
             f"[Telegram] Unexpected error sending alert: {type(e).__name__}: {e}",
             file=sys.stderr
         )
+
+
+_STOP = object()
+
+
+class TelegramDispatcher:
+    """
+    Единственный долгоживущий отправщик алертов в Telegram.
+
+    Алерты кладутся в ограниченную очередь и отправляются одним фоновым потоком
+    через постоянный keep-alive клиент. Несколько алертов, пришедших подряд,
+    склеиваются в одно сообщение (до лимита 4096 символов). На HTTP 429
+    выдерживается пауза retry_after из ответа Telegram.
+
+    Если передан ticker, он опрашивается раз в tick_interval (и при потоке
+    алертов тоже), а возвращённые им тексты (например, сводки подавленных
+    ошибок) отправляются как алерты. При остановке вызывается flusher
+    (по умолчанию тот же ticker), чтобы накопленные сводки не потерялись.
+
+    Как и send_telegram_message, никогда не пишет в логгер — только в stderr,
+    чтобы ошибки отправки не порождали новые алерты.
+    """
+
+    def __init__(
+        self,
+        token: Optional[str] = None,
+        chat_id: Optional[str] = None,
+        api_url: Optional[str] = None,
+        max_queue: int = 1000,
+        batch_window: float = 0.5,
+        max_retries: int = 3,
+        timeout: float = 5.0,
+        ticker: Optional[Callable[[], List[str]]] = None,
+        tick_interval: float = 5.0,
+        flusher: Optional[Callable[[], List[str]]] = None
+    ) -> None:
+        self.token = token if token is not None else settings.TELEGRAM_BOT_TOKEN
+        self.chat_id = chat_id if chat_id is not None else settings.ADMIN_CHAT_ID
+        self.api_url = api_url or settings.TELEGRAM_API_URL
+        self.batch_window = batch_window
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.ticker = ticker
+        self.tick_interval = tick_interval
+        self.flusher = flusher or ticker
+        self._next_tick = time.monotonic() + tick_interval
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._pending: Deque[str] = deque()
+        self._stopping = False
+        self.sent_messages = 0
+        self.sent_alerts = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.token and self.chat_id)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._next_tick = time.monotonic() + self.tick_interval
+            self._thread = threading.Thread(target=self._run, name="telegram-dispatcher", daemon=True)
+            self._thread.start()
+
+    def submit(self, text: str) -> bool:
+        """
+        Ставит алерт в очередь. Не блокирует: при переполненной очереди алерт отбрасывается.
+        """
+        if not self.configured:
+            print(
+                "[Telegram] Skipping alert - TELEGRAM_BOT_TOKEN or ADMIN_CHAT_ID not configured",
+                file=sys.stderr
+            )
+            return False
+
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait(text[:MAX_MESSAGE_LENGTH])
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """
+        Отправляет всё, что осталось в очереди, и останавливает поток.
+        """
+        thread = self._thread
+        if thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        thread.join(timeout=timeout)
+        self._thread = None
+
+    def _next_batch(self) -> Optional[List[str]]:
+        """
+        Ждёт первый алерт и добирает следующие, пока не истекло окно склейки
+        или сообщение не упёрлось в лимит. None — сигнал остановки.
+        """
+        # Срок тика проверяется на каждом шаге: при непрерывном потоке алертов
+        # очередь не пустеет, но сводки всё равно должны уходить
+        self._tick_if_due()
+        while not self._pending:
+            if self._stopping:
+                return None
+            timeout = max(self._next_tick - time.monotonic(), 0) if self.ticker else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._tick_if_due()
+                continue
+            if item is _STOP:
+                self._stop_requested()
+                continue
+            self._pending.append(item)
+        first = self._pending.popleft()
+
+        batch = [first]
+        length = len(first)
+        deadline = time.monotonic() + self.batch_window
+        while True:
+            if self._pending:
+                item = self._pending[0]
+                if length + len(BATCH_SEPARATOR) + len(item) > MAX_MESSAGE_LENGTH:
+                    return batch
+                batch.append(self._pending.popleft())
+                length += len(BATCH_SEPARATOR) + len(item)
+                continue
+
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=max(remaining, 0)) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                return batch
+            if item is _STOP:
+                # Досылаем текущую пачку и остаток, затем останавливаемся
+                self._stop_requested()
+                return batch
+            self._pending.append(item)
+
+    def _stop_requested(self) -> None:
+        self._stopping = True
+        if self.flusher is not None:
+            self._pending.extend(self._tick(self.flusher))
+
+    def _tick_if_due(self) -> None:
+        if self.ticker is None or time.monotonic() < self._next_tick:
+            return
+        self._next_tick = time.monotonic() + self.tick_interval
+        self._pending.extend(self._tick(self.ticker))
+
+    def _tick(self, ticker: Callable[[], List[str]]) -> List[str]:
+        try:
+            return [text[:MAX_MESSAGE_LENGTH] for text in ticker()]
+        except Exception as e:
+            print(f"[Telegram] Ticker error: {e}", file=sys.stderr)
+            return []
+
+    @timed("telegram_send")
+    def _send(self, client: httpx.Client, text: str) -> bool:
+        url = f"{self.api_url}/bot{self.token}/sendMessage"
+        payload = {"chat_id": self.chat_id, "text": text, "parse_mode": "HTML"}
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = client.post(url, json=payload)
+            except httpx.HTTPError as e:
+                print(f"[Telegram] Error sending alert: {type(e).__name__}: {e}", file=sys.stderr)
+                time.sleep(min(2 ** attempt, 10))
+                continue
+
+            if response.status_code == 429:
+                retry_after = _retry_after(response)
+                print(f"[Telegram] Rate limited, retrying in {retry_after}s", file=sys.stderr)
+                time.sleep(retry_after)
+                continue
+            if response.is_success:
+                return True
+
+            print(f"[Telegram] HTTP error {response.status_code} sending alert", file=sys.stderr)
+            return False
+        return False
+
+    def _run(self) -> None:
+        limits = httpx.Limits(max_connections=1, max_keepalive_connections=1)
+        with httpx.Client(timeout=self.timeout, limits=limits) as client:
+            while True:
+                batch = self._next_batch()
+                if batch is None:
+                    return
+                try:
+                    if self._send(client, BATCH_SEPARATOR.join(batch)):
+                        self.sent_messages += 1
+                        self.sent_alerts += len(batch)
+                    else:
+                        self.failed += len(batch)
+                except Exception as e:
+                    self.failed += len(batch)
+                    print(f"[Telegram] Dispatcher error: {e}", file=sys.stderr)
+
+
+def _retry_after(response: httpx.Response) -> float:
+    """
+    Telegram кладёт паузу в parameters.retry_after, прокси — в заголовок Retry-After.
+    """
+    try:
+        return float(response.json()["parameters"]["retry_after"])
+    except Exception:
+        pass
+    try:
+        return float(response.headers.get("Retry-After", 1))
+    except ValueError:
+        return 1.0
+
+
+telegram_dispatcher = TelegramDispatcher(
+    ticker=alert_suppressor.collect_summaries,
+    flusher=partial(alert_suppressor.collect_summaries, flush=True)
+)
@@ -0,0 +1,135 @@
+import html
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+# Сообщение обрезается до нормализации, чтобы стоимость не зависела от длины лога
+MAX_TEMPLATE_SOURCE = 256
+
+_NORMALIZERS = [
+    (re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"), "<uuid>"),
+    (re.compile(r"0x[0-9a-fA-F]+"), "<hex>"),
+    (re.compile(r"'[^']*'|\"[^\"]*\""), "<str>"),
+    (re.compile(r"\d+(?:\.\d+)?"), "<n>"),
+]
+
+Fingerprint = Tuple[str, str, int, str]
+
+
+def normalize_message(message: str) -> str:
+    """
+    Приводит текст ошибки к шаблону: идентификаторы, строки в кавычках и числа
+    заменяются плейсхолдерами, чтобы одна и та же ошибка давала один отпечаток.
+    """
+    template = message[:MAX_TEMPLATE_SOURCE]
+    for pattern, placeholder in _NORMALIZERS:
+        template = pattern.sub(placeholder, template)
+    return template
+
+
+@dataclass
+class _Occurrence:
+    # Когда ушёл последний алерт или сводка по отпечатку
+    reported_at: float
+    last_seen: float
+    suppressed: int = 0
+
+
+class AlertSuppressor:
+    """
+    Подавление штормов одинаковых ошибок.
+
+    Отпечаток ошибки — модуль, функция, строка и нормализованный шаблон сообщения.
+    Окно скользящее: отпечаток подавляется, пока повторы идут чаще, чем раз в window
+    секунд, и забывается, когда повторов не было целое окно. Первое появление
+    отправляется сразу, повторы только считаются; не чаще раза в окно они
+    превращаются в сводку «xN in last Ts», где T — реальный охваченный промежуток.
+    Таблица отпечатков ограничена по размеру (LRU), поэтому память и CPU
+    на алертинг не растут даже при лавине логов.
+    """
+
+    def __init__(
+        self,
+        window: float = 60.0,
+        max_fingerprints: int = 1000,
+        clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.window = window
+        self.max_fingerprints = max_fingerprints
+        self._clock = clock
+        self._table: "OrderedDict[Fingerprint, _Occurrence]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.suppressed_total = 0
+        self.evicted = 0
+
+    @staticmethod
+    def fingerprint(record) -> Fingerprint:
+        return (record["module"], record["function"], record["line"], normalize_message(record["message"]))
+
+    def should_alert(self, record) -> bool:
+        """
+        True, если запись нужно отправить сейчас; False — повтор, учтённый в сводке.
+        """
+        key = self.fingerprint(record)
+        now = self._clock()
+        with self._lock:
+            occurrence = self._table.get(key)
+            if occurrence is None:
+                self._table[key] = _Occurrence(reported_at=now, last_seen=now)
+                if len(self._table) > self.max_fingerprints:
+                    self._table.popitem(last=False)
+                    self.evicted += 1
+                return True
+
+            self._table.move_to_end(key)
+            if now - occurrence.last_seen >= self.window:
+                # Затихшая ошибка вернулась — снова алертим сразу. Ещё не отправленные
+                # повторы остаются в счётчике и уйдут ближайшей сводкой
+                if not occurrence.suppressed:
+                    occurrence.reported_at = now
+                occurrence.last_seen = now
+                return True
+
+            occurrence.last_seen = now
+            occurrence.suppressed += 1
+            self.suppressed_total += 1
+            return False
+
+    def collect_summaries(self, now: Optional[float] = None, flush: bool = False) -> List[str]:
+        """
+        Сводки по отпечаткам, у которых с последнего алерта прошло не меньше окна.
+        Отпечатки без повторов за последнее окно удаляются: следующее их
+        появление снова уйдёт сразу.
+        flush=True — сводки по всем накопленным повторам, не дожидаясь окна (при остановке).
+        """
+        now = self._clock() if now is None else now
+        summaries = []
+        with self._lock:
+            for key in list(self._table):
+                occurrence = self._table[key]
+                if occurrence.suppressed and (flush or now - occurrence.reported_at >= self.window):
+                    summaries.append(self._format_summary(key, occurrence.suppressed, now - occurrence.reported_at))
+                    occurrence.reported_at = now
+                    occurrence.suppressed = 0
+                elif not occurrence.suppressed and now - occurrence.last_seen >= self.window:
+                    del self._table[key]
+        return summaries
+
+    def _format_summary(self, key: Fingerprint, count: int, span: float) -> str:
+        module, function, line, template = key
+        return (
+            f"🔁 <b>x{count}</b> in last {max(1, round(span))}s\n\n"
+            f"<b>Module:</b> {module}\n"
+            f"<b>Function:</b> {function}\n"
+            f"<b>Line:</b> {line}\n\n"
+            f"<b>Message:</b>\n{html.escape(template)}"
+        )
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+
+alert_suppressor = AlertSuppressor()
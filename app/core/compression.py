@@ -0,0 +1,190 @@
+import gzip
+import hashlib
+from typing import Callable, Dict, Optional, Tuple
+from starlette.datastructures import Headers, MutableHeaders
+from app.core.config import settings
+from app.core.utils import LRUCache
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+GZIP_LEVEL = 6
+# Средний уровень: сжатие при промахе кэша не должно заметно добавлять к латентности
+BROTLI_QUALITY = 5
+# Ответы крупнее этого размера сжимаются, но не кэшируются
+MAX_CACHED_BODY = 1024 * 1024
+
+# Cache-Control по префиксу пути для ответов, где обработчик его не задал.
+# no-cache: браузер переспрашивает каждый раз, но получает 304, если данные не менялись
+DEFAULT_CACHE_CONTROL: Tuple[Tuple[str, str], ...] = (
+    ("/v1/config", "no-cache"),
+    ("/v1/logs", "no-cache"),
+    ("/v1/orders", "no-cache"),
+    ("/v1/agents", "no-cache"),
+    ("/v1/", "no-store"),
+)
+
+
+def _compress_gzip(body: bytes) -> bytes:
+    # mtime=0: одинаковое тело даёт одинаковые байты
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _compress_brotli(body: bytes) -> bytes:
+    return brotli.compress(body, quality=BROTLI_QUALITY)
+
+
+COMPRESSORS: Dict[str, Callable[[bytes], bytes]] = {"gzip": _compress_gzip}
+if brotli is not None:
+    COMPRESSORS["br"] = _compress_brotli
+
+
+def choose_encoding(accept_encoding: str, available: Dict[str, Callable[[bytes], bytes]] = COMPRESSORS) -> Optional[str]:
+    """
+    Лучшая кодировка из Accept-Encoding: br, затем gzip. q=0 запрещает кодировку.
+    """
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in ("br", "gzip"):
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if encoding in available and quality > 0:
+            return encoding
+    return None
+
+
+def _opaque(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Слабое сравнение, как требует If-None-Match."""
+    target = _opaque(etag)
+    return any(
+        value == "*" or _opaque(value) == target
+        for value in (item.strip() for item in if_none_match.split(","))
+    )
+
+
+class CompressionMiddleware:
+    """
+    ASGI-middleware для API дашборда: ETag, Cache-Control, 304 и сжатие.
+
+    Готовый ответ получает ETag (если обработчик не поставил свой — хэш
+    тела), и повторный опрос с тем же If-None-Match получает 304 без тела.
+    /v1/config, /v1/orders и /v1/logs ставят ETag по версии данных и сами
+    отвечают 304, не выполняя запрос; сюда доходят только изменившиеся ответы.
+    Тела больше minimum_size сжимаются brotli или gzip; сжатые байты
+    кэшируются по (путь, ETag, кодировка), поэтому неизменившиеся данные
+    сжимаются один раз. Потоковые ответы (экспорт, SSE) проходят без изменений.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = settings.COMPRESSION_MIN_SIZE,
+        cache_size: int = settings.COMPRESSION_CACHE_SIZE,
+        paths: Tuple[str, ...] = ("/v1/",),
+        cache_control: Tuple[Tuple[str, str], ...] = DEFAULT_CACHE_CONTROL
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.paths = paths
+        self.cache_control = cache_control
+        self.cache = LRUCache(maxsize=cache_size)
+
+    def _cache_control_for(self, path: str) -> Optional[str]:
+        for prefix, value in self.cache_control:
+            if path.startswith(prefix):
+                return value
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        start_message = None
+        streaming = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, streaming
+            if streaming:
+                await send(message)
+            elif message["type"] == "http.response.start":
+                content_type = Headers(raw=message["headers"]).get("content-type", "")
+                if content_type.startswith("text/event-stream"):
+                    # SSE: заголовки нужны клиенту сразу, а первое событие может прийти не скоро
+                    streaming = True
+                    await send(message)
+                else:
+                    start_message = message
+            elif message.get("more_body", False):
+                # Потоковый ответ: отдаём как есть, не буферизуя
+                streaming = True
+                await send(start_message)
+                await send(message)
+            else:
+                await self._finish(send, scope["path"], request_headers, start_message, message.get("body", b""))
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _finish(self, send, path: str, request_headers: Headers, start_message, body: bytes) -> None:
+        headers = MutableHeaders(raw=list(start_message["headers"]))
+        if start_message["status"] != 200 or "content-encoding" in headers:
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        etag = headers.get("etag")
+        if etag is None:
+            etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+            headers["ETag"] = etag
+        if "cache-control" not in headers:
+            cache_control = self._cache_control_for(path)
+            if cache_control:
+                headers["Cache-Control"] = cache_control
+        headers.add_vary_header("Accept-Encoding")
+
+        encoding = None
+        if len(body) >= self.minimum_size:
+            encoding = choose_encoding(request_headers.get("accept-encoding", ""))
+        if encoding is not None and not etag.startswith("W/"):
+            # Сжатое представление побайтно отличается, поэтому строгий ETag становится слабым
+            headers["ETag"] = "W/" + etag
+
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, etag):
+            not_modified = MutableHeaders(raw=[])
+            for name in ("etag", "cache-control", "vary"):
+                if name in headers:
+                    not_modified[name] = headers[name]
+            await send({"type": "http.response.start", "status": 304, "headers": not_modified.raw})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        if encoding is not None:
+            compress = COMPRESSORS[encoding]
+            if len(body) <= MAX_CACHED_BODY:
+                body = self.cache.get_or_create((path, etag, encoding), lambda: compress(body))
+            else:
+                body = compress(body)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+
+        await send({**start_message, "headers": headers.raw})
+        await send({"type": "http.response.body", "body": body})
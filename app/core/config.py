@@ -15,13 +15,81 @@ class Settings(BaseSettings):
     VAPI_WEBHOOK_SECRET: str = ""
     VAPI_SECRET_TOKEN: str = "your-secret-token-here"
     
-    # VAPI Call Routing
+    # VAPI Call Routing (списки из окружения дополняются файлами: номер или префикс с * в строке)
     VIP_NUMBERS: List[str] = ["+1111111111"]
     BLACKLIST_NUMBERS: List[str] = []
+    VIP_NUMBERS_FILE: str = "config/vip_numbers.txt"
+    BLACKLIST_NUMBERS_FILE: str = "config/blacklist_numbers.txt"
+    # Код страны для номеров без международного префикса
+    DEFAULT_COUNTRY_CODE: str = "7"
+    
+    # Inbound Admission (скорости — запросов в секунду; 0 — без ограничения)
+    # Предел одновременных запросов действует на вебхуки всех типов, включая tool-calls и end-of-call-report
+    INBOUND_MAX_CONCURRENCY: int = 200
+    # VAPI шлёт вебхуки всех звонков с нескольких общих адресов, поэтому лимит по IP
+    # по умолчанию выключен; адреса и подсети (CIDR) из INBOUND_TRUSTED_SOURCES его не проходят
+    INBOUND_IP_RATE: float = 0.0
+    INBOUND_IP_BURST: float = 400.0
+    INBOUND_TRUSTED_SOURCES: List[str] = []
+    INBOUND_CALLER_RATE: float = 20.0
+    INBOUND_CALLER_BURST: float = 60.0
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    # Брать IP из X-Real-IP (только за доверенным прокси)
+    RATE_LIMIT_TRUST_PROXY: bool = False
+    # Бюджеты срочных событий: параллельность на класс, отдельно для VIP, и очередь ожидания класса
+    INBOUND_ASSISTANT_CONCURRENCY: int = 64
+    INBOUND_TOOL_CONCURRENCY: int = 32
+    INBOUND_VIP_CONCURRENCY: int = 16
+    INBOUND_OTHER_CONCURRENCY: int = 8
+    INBOUND_CLASS_QUEUE: int = 64
+    # SLO ответа на assistant-request (секунды): при угрозе телеметрия отбрасывается первой
+    INBOUND_LATENCY_SLO: float = 0.5
+
+    # Дедупликация повторных вебхуков (TTL, секунды; файл пустой — без сохранения между рестартами)
+    WEBHOOK_DEDUP_TTL: float = 600.0
+    WEBHOOK_DEDUP_MAX: int = 50000
+    WEBHOOK_DEDUP_FILE: str = ".run/webhook_dedup.json"
+    
+    # Сжатие ответов API дашборда: минимальный размер тела (байты) и число кэшируемых сжатых ответов
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_CACHE_SIZE: int = 128
+
+    # Детектор остановок event loop: порог в секундах, 0 — выключен
+    LOOP_WATCHDOG_THRESHOLD: float = 0.0
+
+    # Config Hot Reload (интервал опроса файлов конфигурации, секунды; 0 — выключено)
+    CONFIG_WATCH_INTERVAL: float = 1.0
+    # Файл-счётчик поколений конфига, общий для всех воркеров (относительно корня проекта)
+    CONFIG_GENERATION_FILE: str = ".run/config.generation"
+    # Предыдущие версии settings.yaml для отката (каталог и сколько версий хранить)
+    CONFIG_HISTORY_DIR: str = "config/history"
+    CONFIG_HISTORY_SIZE: int = 20
+    
+    # Knowledge Base (каталог для on-disk индекса, относительно корня проекта)
+    KB_INDEX_DIR: str = ".run/kb_index"
+    
+    # Orders (SQLite-база заказов, относительно корня проекта)
+    ORDERS_DB_PATH: str = "data/orders.db"
+    
+    # Agents (описания агентов, относительно корня проекта)
+    AGENTS_CONFIG_PATH: str = "config/agents.yaml"
+    
+    # Call Sessions (состояние звонков в памяти: лимит сессий, TTL простоя в секундах, реплик на звонок)
+    CALL_SESSION_MAX: int = 5000
+    CALL_SESSION_TTL: float = 900.0
+    CALL_SESSION_TURNS: int = 20
+    
+    # Prompt Assembly (приблизительный бюджет токенов системного промпта)
+    PROMPT_TOKEN_BUDGET: int = 3000
+    
+    # Logging (фоновая запись через очередь Loguru и компактная схема JSON)
+    LOG_ASYNC: bool = True
+    LOG_COMPACT_JSON: bool = True
     
     # Telegram Monitoring
     TELEGRAM_BOT_TOKEN: str = ""
     ADMIN_CHAT_ID: str = ""
+    TELEGRAM_API_URL: str = "https://api.telegram.org"
 
     model_config = SettingsConfigDict(
         env_file=".env", 
@@ -0,0 +1,72 @@
+import mmap
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+from app.core.logger import logger
+
+_STAMP = struct.Struct("<Q")
+
+
+class ConfigGeneration:
+    """
+    Общий для всех воркеров счётчик поколений конфигурации.
+
+    Хранится в маленьком файле, отображённом в память (mmap), поэтому
+    проверка на каждом запросе — это чтение 8 байт без системных вызовов.
+    Воркер, изменивший конфигурацию, увеличивает счётчик; остальные видят
+    новое значение и лениво перечитывают конфиг. Внешние сервисы не нужны.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._mm: Optional[mmap.mmap] = None
+        self._lock = threading.Lock()
+        self._failed = False
+
+    def _open(self) -> Optional[mmap.mmap]:
+        with self._lock:
+            if self._mm is not None or self._failed:
+                return self._mm
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    # Несколько воркеров могут создавать файл одновременно:
+                    # расширение до нужного размера идемпотентно
+                    if os.fstat(fd).st_size < _STAMP.size:
+                        os.ftruncate(fd, _STAMP.size)
+                    self._mm = mmap.mmap(fd, _STAMP.size)
+                finally:
+                    os.close(fd)
+            except OSError as e:
+                self._failed = True
+                logger.error(f"Config generation file unavailable at {self.path}: {e}")
+            return self._mm
+
+    def read(self) -> int:
+        mm = self._mm or self._open()
+        if mm is None:
+            return 0
+        return _STAMP.unpack_from(mm, 0)[0]
+
+    def bump(self) -> int:
+        """
+        Публикует новое поколение. Значение — метка времени в наносекундах,
+        но не меньше предыдущего + 1, поэтому одновременные записи
+        из разных процессов не требуют межпроцессной блокировки.
+        """
+        mm = self._mm or self._open()
+        if mm is None:
+            return 0
+        stamp = max(_STAMP.unpack_from(mm, 0)[0] + 1, time.time_ns())
+        _STAMP.pack_into(mm, 0, stamp)
+        return stamp
+
+    def close(self) -> None:
+        with self._lock:
+            if self._mm is not None:
+                self._mm.close()
+                self._mm = None
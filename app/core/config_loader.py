@@ -1,15 +1,21 @@
+import hashlib
 import os
 import yaml
 from pathlib import Path
 from typing import List, Optional
 from functools import lru_cache
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from app.core.logger import logger
+from app.core.metrics import timed
 
 # BASE_DIR указывает на корень проекта (на три уровня выше этого файла: app/core/config_loader.py)
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
+DEFAULT_CONFIG_PATH = "config/settings.yaml"
 
 class VoiceSettings(BaseModel):
+    # Снимки конфигурации разделяются между потоками, поэтому они неизменяемые
+    model_config = ConfigDict(frozen=True)
+
     provider: str
     voice_id: str = Field(..., min_length=1)
     stability: float = Field(0.5, ge=0.0, le=1.0)
@@ -17,37 +23,56 @@ class VoiceSettings(BaseModel):
     dynamic_fields: dict[str, str] = Field(default_factory=dict)
 
 class AppSettings(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     system_prompt: str
     knowledge_base_file: Optional[str] = None
     voice_settings: VoiceSettings
     tools_enabled: List[str] = Field(default_factory=list)
 
-def _read_knowledge_base(file_path: str) -> str:
-    """Безопасно читает файл базы знаний relative to BASE_DIR."""
+def config_fingerprint(config: AppSettings) -> str:
+    """
+    Возвращает стабильный хэш содержимого конфигурации.
+    Используется как ключ кэшей: одинаковые настройки дают одинаковый ключ.
+    """
+    return hashlib.sha256(config.model_dump_json().encode("utf-8")).hexdigest()
+
+def config_etag(body: bytes) -> str:
+    """ETag (строгий) для сериализованной конфигурации."""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+def resolve_path(file_path: str) -> Path:
+    """Приводит путь к абсолютному относительно BASE_DIR."""
     path = Path(file_path)
     if not path.is_absolute():
         path = BASE_DIR / path
+    return path
+
+def _check_knowledge_base(file_path: str) -> bool:
+    """
+    Проверяет, что файл базы знаний доступен, не читая его целиком.
+    Содержимое индексируется и читается по частям в services.knowledge_base.
+    """
+    path = resolve_path(file_path)
         
     try:
-        content = path.read_text(encoding="utf-8")
-        logger.info(f"Loaded knowledge base from {path.absolute()}")
-        return content
+        size = path.stat().st_size
+        logger.info(f"Knowledge base found at {path.absolute()} ({size} bytes)")
+        return size > 0
     except FileNotFoundError:
         logger.error(f"Knowledge base file not found at {path.absolute()}")
-        return ""
+        return False
     except Exception as e:
         logger.error(f"Unexpected error reading knowledge base at {path.absolute()}: {e}")
-        return ""
+        return False
 
-@lru_cache()
-def get_config(config_path: str = "config/settings.yaml") -> AppSettings:
+@timed("config_load")
+def load_config(config_path: str = DEFAULT_CONFIG_PATH) -> AppSettings:
     """
     Loads, validates, and enhances the configuration from a YAML file.
     All paths are resolved relative to BASE_DIR.
     """
-    path = Path(config_path)
-    if not path.is_absolute():
-        path = BASE_DIR / path
+    path = resolve_path(config_path)
 
     if not path.exists():
         logger.error(f"Config file not found: {path.absolute()}")
@@ -62,10 +87,17 @@ def get_config(config_path: str = "config/settings.yaml") -> AppSettings:
     # Context Injection (Logic preserved but not polluting the main settings object)
     # The actual injection should happen when the prompt is sent to the LLM.
     if settings.knowledge_base_file:
-        kb_content = _read_knowledge_base(settings.knowledge_base_file)
-        if kb_content:
+        if _check_knowledge_base(settings.knowledge_base_file):
             logger.info("Knowledge base content is ready for injection.")
             # For now, we don't modify settings.system_prompt here to avoid 
             # saving bloated prompts back to config files.
 
     return settings
+
+@lru_cache()
+def get_config(config_path: str = DEFAULT_CONFIG_PATH) -> AppSettings:
+    """
+    Cached variant of load_config.
+    Request handlers should prefer the watched snapshot from config_watcher.
+    """
+    return load_config(config_path)
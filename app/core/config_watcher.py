@@ -0,0 +1,166 @@
+import os
+import threading
+from typing import Optional, Tuple
+from app.core.config import settings
+from app.core.config_generation import ConfigGeneration
+from app.core.config_loader import AppSettings, DEFAULT_CONFIG_PATH, config_etag, load_config, resolve_path
+from app.core.logger import logger
+
+# (путь, mtime_ns, размер) для каждого отслеживаемого файла
+FileSignature = Tuple[Tuple[str, int, int], ...]
+
+
+class ConfigStore:
+    """
+    Хранилище текущего снимка конфигурации.
+
+    Снимок — неизменяемый AppSettings, который заменяется целиком одной
+    операцией присваивания. Читатели берут его без блокировок; блокировка
+    нужна только писателям, чтобы две перезагрузки не шли одновременно.
+    Если новая конфигурация не проходит валидацию, остаётся последний рабочий снимок.
+
+    При нескольких воркерах снимок дополнительно сверяется с общим счётчиком
+    поколений: если другой воркер опубликовал изменения, конфиг перечитывается
+    при следующем обращении.
+    """
+
+    def __init__(
+        self,
+        config_path: str = DEFAULT_CONFIG_PATH,
+        generation: Optional[ConfigGeneration] = None
+    ) -> None:
+        self.config_path = config_path
+        self.generation = generation
+        self.snapshot: Optional[AppSettings] = None
+        # (снимок, JSON, ETag): сериализуется один раз на снимок, а не на каждый GET
+        self._rendered: Optional[Tuple[AppSettings, bytes, str]] = None
+        self._seen_generation = 0
+        self._lock = threading.Lock()
+
+    def current(self) -> AppSettings:
+        snapshot = self.snapshot
+        if snapshot is None:
+            # Первое обращение до запуска наблюдателя — загружаем синхронно
+            snapshot = self.reload()
+        elif self.generation is not None and self.generation.read() != self._seen_generation:
+            # Другой воркер опубликовал новую конфигурацию
+            snapshot = self.reload()
+        return snapshot
+
+    def reload(self) -> AppSettings:
+        with self._lock:
+            # Поколение читаем до загрузки: если его поднимут во время парсинга,
+            # следующий запрос перечитает конфиг ещё раз
+            seen = self.generation.read() if self.generation is not None else 0
+            try:
+                new_snapshot = load_config(self.config_path)
+            except Exception as e:
+                if self.snapshot is None:
+                    raise
+                # Запоминаем поколение и при ошибке, чтобы не парсить битый файл на каждом запросе
+                self._seen_generation = seen
+                logger.error(f"Config reload failed, keeping last good snapshot: {e}")
+                return self.snapshot
+
+            self.snapshot = new_snapshot
+            self._seen_generation = seen
+            return new_snapshot
+
+    def rendered(self) -> Tuple[bytes, str]:
+        """
+        JSON текущего снимка и его ETag.
+        """
+        snapshot = self.current()
+        rendered = self._rendered
+        if rendered is None or rendered[0] is not snapshot:
+            body = snapshot.model_dump_json().encode("utf-8")
+            rendered = self._rendered = (snapshot, body, config_etag(body))
+        return rendered[1], rendered[2]
+
+    def publish(self) -> AppSettings:
+        """
+        Перечитывает конфиг и сообщает остальным воркерам о новом поколении.
+        """
+        if self.generation is not None:
+            self.generation.bump()
+        return self.reload()
+
+    def watched_paths(self) -> Tuple[str, ...]:
+        paths = [str(resolve_path(self.config_path))]
+        snapshot = self.snapshot
+        if snapshot is not None and snapshot.knowledge_base_file:
+            paths.append(str(resolve_path(snapshot.knowledge_base_file)))
+        return tuple(paths)
+
+
+def _file_signature(paths: Tuple[str, ...]) -> FileSignature:
+    signature = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            signature.append((path, st.st_mtime_ns, st.st_size))
+        except OSError:
+            signature.append((path, -1, -1))
+    return tuple(signature)
+
+
+class ConfigWatcher:
+    """
+    Фоновый поток, который опрашивает mtime/размер файла настроек и базы знаний
+    и перезагружает снимок в ConfigStore при изменениях.
+    Парсинг и валидация выполняются в этом потоке, а не в обработчиках запросов.
+    """
+
+    def __init__(self, store: ConfigStore, interval: float = 1.0) -> None:
+        self.store = store
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._signature: Optional[FileSignature] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self.store.current()
+        self._signature = _file_signature(self.store.watched_paths())
+        self._thread = threading.Thread(target=self._run, name="config-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"Config watcher started (interval {self.interval}s)")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+    def check(self) -> bool:
+        """
+        Проверяет файлы один раз. Возвращает True, если была перезагрузка.
+        """
+        signature = _file_signature(self.store.watched_paths())
+        if signature == self._signature:
+            return False
+
+        self.store.reload()
+        # Путь к базе знаний мог измениться вместе с конфигом
+        self._signature = _file_signature(self.store.watched_paths())
+        logger.info("Configuration changed on disk, snapshot reloaded.")
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Config watcher error: {e}")
+
+
+config_store = ConfigStore(generation=ConfigGeneration(resolve_path(settings.CONFIG_GENERATION_FILE)))
+
+
+def get_current_config() -> AppSettings:
+    """
+    Текущий снимок конфигурации для обработчиков запросов.
+    """
+    return config_store.current()
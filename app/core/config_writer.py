@@ -0,0 +1,207 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import yaml
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+from app.core.config import settings
+from app.core.config_loader import AppSettings, config_etag, get_config, resolve_path
+from app.core.config_watcher import ConfigStore, config_store
+from app.core.logger import logger
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class ConfigConflict(Exception):
+    """If-Match не совпал с текущей версией конфигурации."""
+
+    def __init__(self, current_etag: str) -> None:
+        super().__init__(f"Config was modified, current version is {current_etag}")
+        self.current_etag = current_etag
+
+
+def _fsync_dir(path: Path) -> None:
+    # Переименование становится устойчивым к сбою только после fsync каталога
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def _file_lock(path: Path) -> Iterator[None]:
+    """
+    Межпроцессная блокировка записи конфигурации: settings.yaml пишут все воркеры.
+    Без fcntl (Windows) — только блокировка внутри процесса.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _matches(if_match: Optional[str], etag: str) -> bool:
+    if if_match is None:
+        return True
+    candidates = [value.strip() for value in if_match.split(",")]
+    # Слабые валидаторы (W/"...") для If-Match не годятся, но клиенты их присылают
+    return "*" in candidates or any(value.removeprefix("W/") == etag for value in candidates)
+
+
+class ConfigWriter:
+    """
+    Запись settings.yaml: атомарно и с историей версий.
+
+    Новое содержимое пишется во временный файл в том же каталоге, затем
+    fsync и os.replace: читатель (наблюдатель, другой воркер) видит либо
+    старый файл целиком, либо новый. Проверка If-Match, архивирование и замена
+    выполняются под flock на .settings.yaml.lock, поэтому два воркера с одним
+    и тем же If-Match не перетрут правки друг друга. Предыдущая версия сохраняется в
+    history_dir жёсткой ссылкой на старый inode, без копирования; хранится
+    не больше keep версий. Откат — такая же атомарная запись сохранённых байтов.
+
+    Методы блокирующие: вызывать из пула потоков, не из event loop.
+    """
+
+    def __init__(
+        self,
+        store: ConfigStore,
+        history_dir: str = settings.CONFIG_HISTORY_DIR,
+        keep: int = settings.CONFIG_HISTORY_SIZE
+    ) -> None:
+        self.store = store
+        self.history_dir = resolve_path(history_dir)
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> Path:
+        return resolve_path(self.store.config_path)
+
+    def _current_etag(self) -> Optional[str]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = yaml.safe_load(f)
+            return config_etag(AppSettings(**data).model_dump_json().encode("utf-8"))
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Битый файл на диске: ETag ни с чем не совпадёт, кроме "*"
+            return '"invalid"'
+
+    def write(self, data: Dict[str, Any], if_match: Optional[str] = None) -> str:
+        """
+        Валидирует и записывает конфигурацию. Возвращает ETag новой версии.
+        ValueError — конфигурация не прошла валидацию, ConfigConflict — If-Match устарел.
+        """
+        try:
+            config = AppSettings(**data)
+        except Exception as e:
+            raise ValueError(f"Validation failed: {e}") from e
+        content = yaml.dump(data, allow_unicode=True, sort_keys=False).encode("utf-8")
+        return self._commit(content, config, if_match)
+
+    def rollback(self, version: str, if_match: Optional[str] = None) -> str:
+        """
+        Восстанавливает сохранённую версию (текущая уходит в историю). KeyError — версии нет.
+        """
+        path = self._history_path(version)
+        try:
+            content = path.read_bytes()
+        except FileNotFoundError:
+            raise KeyError(version) from None
+        try:
+            config = AppSettings(**yaml.safe_load(content))
+        except Exception as e:
+            raise ValueError(f"Stored version {version} is invalid: {e}") from e
+        return self._commit(content, config, if_match)
+
+    def _commit(self, content: bytes, config: AppSettings, if_match: Optional[str]) -> str:
+        path = self.path
+        with self._lock, _file_lock(path.with_name(f".{path.name}.lock")):
+            current = self._current_etag()
+            if current is not None and not _matches(if_match, current):
+                raise ConfigConflict(current)
+
+            fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+            try:
+                # mkstemp создаёт файл с правами 0600 — сохраняем права исходного
+                os.chmod(tmp, path.stat().st_mode & 0o777 if current is not None else 0o644)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(content)
+                    f.flush()
+                    os.fsync(f.fileno())
+                if current is not None:
+                    self._archive(path)
+                os.replace(tmp, path)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.unlink(tmp)
+                raise
+            _fsync_dir(path.parent)
+
+        etag = config_etag(config.model_dump_json().encode("utf-8"))
+        # Сбрасываем старый кэш, подменяем снимок и оповещаем остальные воркеры
+        get_config.cache_clear()
+        self.store.publish()
+        logger.info(f"Configuration written to {path} (version {etag})")
+        return etag
+
+    def _archive(self, path: Path) -> None:
+        self.history_dir.mkdir(parents=True, exist_ok=True)
+        target = self.history_dir / f"{time.time_ns():020d}.yaml"
+        try:
+            # Старый inode не меняется: replace подменяет только запись каталога
+            os.link(path, target)
+        except OSError:
+            shutil.copy2(path, target)
+        self._prune()
+
+    def _prune(self) -> None:
+        versions = self._versions()
+        for stale in versions[:max(0, len(versions) - self.keep)]:
+            try:
+                stale.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _versions(self) -> List[Path]:
+        return sorted(path for path in self.history_dir.glob("*.yaml") if path.stem.isdigit())
+
+    def _history_path(self, version: str) -> Path:
+        if not version.isdigit():
+            raise KeyError(version)
+        return self.history_dir / f"{int(version):020d}.yaml"
+
+    def history(self) -> List[Dict[str, Any]]:
+        """Сохранённые версии, новые сверху."""
+        if not self.history_dir.exists():
+            return []
+        entries = []
+        for path in reversed(self._versions()):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append({"version": str(int(path.stem)), "saved_at": int(path.stem) / 1e9, "size": stat.st_size})
+        return entries
+
+
+config_writer = ConfigWriter(config_store)
@@ -0,0 +1,160 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, Optional, Tuple
+from app.core.config import settings
+from app.core.metrics import Histogram
+
+# Готовый ответ 503 при перегрузке: отказ не стоит сериализации
+OVERLOADED_BODY = b'{"error":"Server overloaded"}'
+
+# Вес нового замера в скользящей средней латентности
+_EWMA_ALPHA = 0.2
+# Сколько секунд после последнего замера высокая латентность считается актуальной
+_RISK_WINDOW = 5.0
+
+
+class ClassBudget:
+    """
+    Бюджет одного класса событий: предел одновременных обработок и
+    ограниченная FIFO-очередь ожидающих. Меняется только в event loop.
+    """
+
+    __slots__ = (
+        "name", "limit", "max_queue", "in_flight", "waiters", "admitted", "shed", "wait",
+        "latency_ewma", "latency_at"
+    )
+
+    def __init__(self, name: str, limit: int, max_queue: int) -> None:
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.shed = 0
+        self.wait = Histogram()
+        self.latency_ewma = 0.0
+        self.latency_at = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queued": len(self.waiters),
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "latency_ewma_ms": self.latency_ewma * 1000,
+            "wait_p50_ms": self.wait.quantile(0.5) * 1000,
+            "wait_p99_ms": self.wait.quantile(0.99) * 1000,
+        }
+
+
+class LoadShedder:
+    """
+    Планировщик срочных вебхуков: у каждого класса (тип события и уровень
+    звонящего) свой предел параллельности и своя очередь, поэтому всплеск
+    одного класса не занимает слоты другого, а VIP-звонки не ждут за обычными.
+
+    Критические классы (assistant-request) задают SLO: если их события ждут
+    в очереди или скользящая латентность превысила slo, at_risk() сообщает
+    диспетчеру, что низкоприоритетную телеметрию пора отбрасывать.
+    Когда очередь класса полна, событие отклоняется сразу, без ожидания.
+    """
+
+    def __init__(
+        self,
+        budgets: Dict[str, Tuple[int, int]],
+        critical: Iterable[str] = (),
+        slo: float = 0.5,
+        clock: Callable[[], float] = time.perf_counter
+    ) -> None:
+        self.budgets = {name: ClassBudget(name, limit, max_queue) for name, (limit, max_queue) in budgets.items()}
+        self.critical = [self.budgets[name] for name in critical if name in self.budgets]
+        self.slo = slo
+        self.clock = clock
+
+    def budget_for(self, message_type: str, vip: bool = False) -> Optional[ClassBudget]:
+        """Бюджет класса; VIP-бюджет, если он задан, иначе общий. None — без ограничения."""
+        budgets = self.budgets
+        if vip:
+            budget = budgets.get(f"{message_type}:vip")
+            if budget is not None:
+                return budget
+        return budgets.get(message_type) or budgets.get("*")
+
+    def at_risk(self) -> bool:
+        for budget in self.critical:
+            if budget.waiters:
+                return True
+            # Без свежих замеров старый всплеск не должен вечно держать режим отбрасывания
+            if budget.latency_ewma > self.slo and self.clock() - budget.latency_at < _RISK_WINDOW:
+                return True
+        return False
+
+    async def acquire(self, budget: ClassBudget) -> bool:
+        """
+        Занимает слот класса, при необходимости дожидаясь очереди.
+        False — очередь полна, событие отброшено.
+        """
+        if budget.in_flight < budget.limit and not budget.waiters:
+            budget.in_flight += 1
+            budget.admitted += 1
+            budget.wait.observe(0.0)
+            return True
+        if len(budget.waiters) >= budget.max_queue:
+            budget.shed += 1
+            return False
+
+        start = self.clock()
+        waiter = asyncio.get_running_loop().create_future()
+        budget.waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Слот уже передан нам — возвращаем его следующему
+                self.release(budget)
+            elif waiter in budget.waiters:
+                budget.waiters.remove(waiter)
+            raise
+        budget.admitted += 1
+        budget.wait.observe(self.clock() - start)
+        return True
+
+    def release(self, budget: ClassBudget, elapsed: Optional[float] = None) -> None:
+        """
+        Освобождает слот; elapsed (секунды) обновляет скользящую латентность класса.
+        """
+        if elapsed is not None:
+            budget.latency_ewma += _EWMA_ALPHA * (elapsed - budget.latency_ewma)
+            budget.latency_at = self.clock()
+        # Слот переходит первому ожидающему без уменьшения счётчика
+        while budget.waiters:
+            waiter = budget.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        budget.in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "at_risk": self.at_risk(),
+            "slo_ms": self.slo * 1000,
+            "classes": {name: budget.to_dict() for name, budget in sorted(self.budgets.items())},
+        }
+
+
+inbound_shedder = LoadShedder(
+    budgets={
+        "assistant-request": (settings.INBOUND_ASSISTANT_CONCURRENCY, settings.INBOUND_CLASS_QUEUE),
+        "assistant-request:vip": (settings.INBOUND_VIP_CONCURRENCY, settings.INBOUND_CLASS_QUEUE),
+        "tool-calls": (settings.INBOUND_TOOL_CONCURRENCY, settings.INBOUND_CLASS_QUEUE),
+        "tool-calls:vip": (settings.INBOUND_VIP_CONCURRENCY, settings.INBOUND_CLASS_QUEUE),
+        # Прочие срочные типы (обработчик по умолчанию)
+        "*": (settings.INBOUND_OTHER_CONCURRENCY, settings.INBOUND_CLASS_QUEUE),
+    },
+    critical=("assistant-request", "assistant-request:vip"),
+    slo=settings.INBOUND_LATENCY_SLO
+)
@@ -0,0 +1,190 @@
+import atexit
+import os
+import queue
+import sys
+import threading
+from datetime import datetime
+from typing import Callable, List, Optional, TextIO
+
+# Сколько записей фоновый поток забирает из очереди за одну запись на диск
+MAX_BATCH = 512
+
+_STOP = object()
+
+
+def _byte_len(text: str) -> int:
+    # Размер файла (tell) считается в байтах, а кириллица в UTF-8 занимает два
+    return len(text) if text.isascii() else len(text.encode("utf-8"))
+
+
+class BackgroundLogWriter:
+    """
+    Sink для Loguru, который переносит запись на диск в фоновый поток.
+
+    Вызывающий поток только кладёт готовую строку в очередь; поток-писатель
+    забирает записи пачками и пишет их одним write + flush. В отличие от
+    enqueue=True в Loguru, записи не сериализуются через pickle.
+
+    При записи в файл поддерживается ротация по размеру с тем же именованием,
+    что и у Loguru (app.<дата>.json); on_rotate вызывается с путём закрытого сегмента.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        stream: Optional[TextIO] = None,
+        rotation_bytes: Optional[int] = None,
+        on_rotate: Optional[Callable[[str], None]] = None,
+        max_queue: int = 100_000
+    ) -> None:
+        self.path = path
+        self.stream = stream
+        self.rotation_bytes = rotation_bytes
+        self.on_rotate = on_rotate
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._file: Optional[TextIO] = None
+        self._size = 0
+
+    def __call__(self, message: str) -> None:
+        if self._thread is None:
+            self.start()
+        # При переполнении очереди вызывающий поток ждёт: логи не теряются
+        self._queue.put(message)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Дописывает всё, что накопилось в очереди, и останавливает поток.
+        Следующая запись снова запустит поток.
+        """
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._queue.put(_STOP)
+            thread.join(timeout=timeout)
+            self._thread = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def _open(self) -> TextIO:
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+            self._size = self._file.tell()
+        return self._file
+
+    def _rotate(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._size = 0
+        root, ext = os.path.splitext(self.path)
+        rotated = f"{root}.{datetime.now():%Y-%m-%d_%H-%M-%S_%f}{ext}"
+        os.replace(self.path, rotated)
+        if self.on_rotate is not None:
+            try:
+                self.on_rotate(rotated)
+            except Exception as e:
+                print(f"[Log Writer] Rotation hook failed: {e}", file=sys.stderr)
+
+    def _write(self, batch: List[str]) -> None:
+        if self.path is None:
+            self.stream.write("".join(batch))
+            self.stream.flush()
+            return
+
+        if not self.rotation_bytes:
+            self._append("".join(batch))
+            return
+
+        # Пачка может пересечь границу ротации — делим её по записям
+        chunk: List[str] = []
+        chunk_size = 0
+        for item in batch:
+            size = _byte_len(item)
+            if self._size + chunk_size + size > self.rotation_bytes and (self._size or chunk):
+                if chunk:
+                    self._append("".join(chunk))
+                    chunk, chunk_size = [], 0
+                self._rotate()
+            chunk.append(item)
+            chunk_size += size
+        if chunk:
+            self._append("".join(chunk))
+
+    def _append(self, text: str) -> None:
+        f = self._open()
+        f.write(text)
+        f.flush()
+        self._size += _byte_len(text)
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            while len(batch) < MAX_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if any(item is _STOP for item in batch):
+                # __call__ не берёт _lock, поэтому запись может встать в очередь
+                # после стоп-маркера: дописываем её вместе с остатком очереди
+                stopping = True
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                batch = [item for item in batch if item is not _STOP]
+            try:
+                if batch:
+                    self._write(batch)
+            except Exception as e:
+                # stderr, чтобы не зациклить логирование
+                print(f"[Log Writer] Failed to write {len(batch)} records: {e}", file=sys.stderr)
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+_writers: List[BackgroundLogWriter] = []
+
+
+def register_writer(writer: BackgroundLogWriter) -> BackgroundLogWriter:
+    _writers.append(writer)
+    return writer
+
+
+def flush_log_writers() -> None:
+    """
+    Дописывает очереди всех фоновых писателей (вызывается при остановке приложения).
+    """
+    for writer in list(_writers):
+        writer.stop()
+
+
+def log_queue_depth() -> int:
+    return sum(writer.queue_depth for writer in _writers)
+
+
+def reset_log_writers() -> None:
+    flush_log_writers()
+    _writers.clear()
+
+
+atexit.register(flush_log_writers)
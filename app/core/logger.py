@@ -1,16 +1,19 @@
 import sys
 import json
-import asyncio
-import threading
+from functools import partial
+from typing import Optional
 from loguru import logger
+from app.core.alerting import alert_suppressor
+from app.core.config import settings
+from app.core.log_writer import BackgroundLogWriter, register_writer, reset_log_writers
 
 
 def telegram_sink(message):
     """
     Custom Loguru sink that sends ERROR and CRITICAL logs to Telegram
     
-    This sink runs in a separate thread to avoid blocking the logger
-    and handles the async-to-sync bridge for the Telegram API call.
+    The sink only formats the alert and hands it to the long-lived
+    dispatcher queue, so it never blocks the logger on network I/O.
     """
     record = message.record
     
@@ -18,6 +21,10 @@ def telegram_sink(message):
     if record["level"].name not in ["ERROR", "CRITICAL"]:
         return
     
+    # Repeats of the same error are folded into periodic summaries
+    if not alert_suppressor.should_alert(record):
+        return
+    
     # Format the alert message
     alert_text = (
         f"🚨 <b>{record['level'].name}</b>\n\n"
@@ -31,47 +38,129 @@ def telegram_sink(message):
     if len(alert_text) > 4000:
         alert_text = alert_text[:3997] + "..."
     
-    # Run the async Telegram function in a separate thread
-    def send_in_thread():
-        try:
-            # Import here to avoid circular dependency
-            from app.adapters.telegram import send_telegram_message
-            
-            # Create new event loop for this thread
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                loop.run_until_complete(send_telegram_message(alert_text))
-            finally:
-                loop.close()
-        except Exception as e:
-            # Use stderr to avoid infinite logging loop
-            print(f"[Telegram Sink] Error: {e}", file=sys.stderr)
-    
-    # Start thread and don't wait for it (fire-and-forget)
-    thread = threading.Thread(target=send_in_thread, daemon=True)
-    thread.start()
-
-
-# Удаляем старые кастомные форматы, если они ломают запуск
-logger.remove()
-
-# 1. Консольный вывод (Красивый, для разработчика)
-logger.add(
-    sys.stderr, 
-    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | {message}"
-)
-
-# 2. Файловый вывод (Самый надежный способ для JSON)
-logger.add(
-    "logs/app.json", 
-    rotation="10 MB", 
-    serialize=True
-)
-
-# 3. Telegram sink для ERROR и CRITICAL логов
-logger.add(
-    telegram_sink,
-    level="ERROR",
-    format="{message}"
-)
+    try:
+        # Import here to avoid circular dependency
+        from app.adapters.telegram import telegram_dispatcher
+        telegram_dispatcher.submit(alert_text)
+    except Exception as e:
+        # Use stderr to avoid infinite logging loop
+        print(f"[Telegram Sink] Error: {e}", file=sys.stderr)
+
+
+def stream_sink(message):
+    """
+    Sink для живой трансляции логов: передаёт запись подписчикам /v1/logs/stream.
+    """
+    # Import here to avoid circular dependency
+    from app.services.log_stream import log_broadcaster
+    log_broadcaster.publish(message.record)
+
+
+def index_rotated_segment(path: str, live_file: Optional[str] = None) -> None:
+    """
+    Хук ротации: строит sidecar-индекс для закрытого сегмента лога.
+    Путь активного файла (live_file) пропускается.
+    """
+    # Import here to avoid circular dependency
+    from app.services.log_index import index_rotated_segment as build_index
+    build_index(path, live_file=live_file)
+
+
+# Максимальная длина сообщения в компактном JSON-логе
+MAX_MESSAGE_LENGTH = 8192
+
+
+def compact_json_format(record) -> str:
+    """
+    Компактная JSON-строка вместо serialize=True.
+
+    Loguru при serialize=True дублирует текст и пишет полный record
+    (процесс, поток, файл, elapsed...). Здесь остаются только поля,
+    которые нужны дашборду и индексу логов, поэтому кодирование дешевле,
+    а строки короче.
+    """
+    entry = {
+        "timestamp": str(record["time"]),
+        "ts": round(record["time"].timestamp(), 6),
+        "level": record["level"].name,
+        "message": record["message"][:MAX_MESSAGE_LENGTH],
+        "module": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+    }
+    exception = record["exception"]
+    if exception is not None:
+        entry["exception"] = f"{exception.type.__name__ if exception.type else ''}: {exception.value}"
+    record["extra"]["_json"] = json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=str)
+    return "{extra[_json]}\n"
+
+
+def format_payload(payload, limit: int = 1000) -> str:
+    """
+    Ограниченное по длине представление тела вебхука для логов.
+    Используется с logger.opt(lazy=True), чтобы не форматировать payload зря.
+    """
+    text = repr(payload)
+    if len(text) > limit:
+        return f"{text[:limit]}... ({len(text)} chars)"
+    return text
+
+
+def setup_logging(
+    log_file: str = "logs/app.json",
+    async_mode: bool = True,
+    compact_json: bool = True,
+    console: bool = True
+) -> None:
+    """
+    Настраивает все sink'и логгера.
+
+    async_mode: консоль и файл пишутся фоновым потоком (BackgroundLogWriter),
+    вызывающий поток только форматирует запись и кладёт её в очередь.
+    compact_json: компактная схема JSON вместо полного serialize=True.
+    """
+    # Удаляем старые кастомные форматы, если они ломают запуск
+    logger.remove()
+    reset_log_writers()
+
+    # 1. Консольный вывод (Красивый, для разработчика)
+    if console:
+        logger.add(
+            register_writer(BackgroundLogWriter(stream=sys.stderr)) if async_mode else sys.stderr, 
+            format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | {message}"
+        )
+
+    # 2. Файловый вывод в JSON
+    file_format = {"format": compact_json_format} if compact_json else {"serialize": True}
+    if async_mode:
+        # Ротацию и индексацию закрытых сегментов выполняет сам писатель
+        file_sink = register_writer(BackgroundLogWriter(
+            path=log_file,
+            rotation_bytes=10 * 1024 * 1024,
+            on_rotate=index_rotated_segment
+        ))
+        logger.add(file_sink, **file_format)
+    else:
+        logger.add(
+            log_file, 
+            rotation="10 MB", 
+            # Вместо сжатия индексируем закрытый сегмент для поиска по времени
+            compression=partial(index_rotated_segment, live_file=log_file),
+            **file_format
+        )
+
+    # 3. Живая трансляция логов подключённым дашбордам
+    logger.add(
+        stream_sink,
+        format="{message}"
+    )
+
+    # 4. Telegram sink для ERROR и CRITICAL логов
+    logger.add(
+        telegram_sink,
+        level="ERROR",
+        format="{message}"
+    )
+
+
+setup_logging(async_mode=settings.LOG_ASYNC, compact_json=settings.LOG_COMPACT_JSON)
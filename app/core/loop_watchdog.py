@@ -0,0 +1,157 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import registry
+
+# Корень проекта: место остановки ищется среди его файлов, а не в библиотеках
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+# Ограничение числа мест в счётчике, чтобы не раздувать метки метрик
+MAX_SITES = 256
+OTHER_SITE = "other"
+MAX_STACK_DEPTH = 30
+
+_lag = registry.histogram("app_event_loop_lag_seconds", "Delay of the event loop heartbeat.")
+
+
+def _is_project_frame(filename: str) -> bool:
+    return filename.startswith(str(BASE_DIR)) and "site-packages" not in filename and filename != __file__
+
+
+def _call_site(stack: List[traceback.FrameSummary]) -> str:
+    """
+    Место остановки: самый глубокий кадр из кода проекта (сам блокирующий
+    вызов обычно в библиотеке, а исправлять нужно того, кто его сделал).
+    """
+    for frame in reversed(stack):
+        if _is_project_frame(frame.filename):
+            filename = Path(frame.filename).relative_to(BASE_DIR).as_posix()
+            return f"{filename}:{frame.lineno} in {frame.name}"
+    if not stack:
+        return "unknown"
+    frame = stack[-1]
+    return f"{frame.filename}:{frame.lineno} in {frame.name}"
+
+
+class LoopWatchdog:
+    """
+    Детектор остановок event loop.
+
+    Loop раз в interval отмечает «пульс» таймером. Отдельный поток-сэмплер
+    проверяет, как давно был пульс; если дольше threshold, loop занят
+    синхронной работой — сэмплер снимает стек потока loop
+    (sys._current_frames), считает остановку по месту вызова и пишет стек в
+    лог. Одна остановка учитывается один раз, сколько бы она ни длилась.
+    Задержка каждого пульса попадает в гистограмму app_event_loop_lag_seconds.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.1,
+        interval: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.threshold = threshold
+        self.interval = interval if interval is not None else max(threshold / 4, 0.005)
+        self.clock = clock
+        self.stalls = 0
+        self.max_stall = 0.0
+        self.sites: Counter = Counter()
+        self.last_stack: Optional[str] = None
+        self._last_beat = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        """Запускает наблюдение за текущим event loop (вызывать из него)."""
+        if self._thread is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._last_beat = self.clock()
+        self._handle = self._loop.call_later(self.interval, self._beat, self._last_beat)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"Event loop watchdog started (threshold {self.threshold * 1000:.0f}ms)")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+    def _beat(self, scheduled_at: float) -> None:
+        now = self.clock()
+        lag = now - scheduled_at - self.interval
+        _lag.observe(lag if lag > 0 else 0.0)
+        if lag > self.max_stall and lag >= self.threshold:
+            self.max_stall = lag
+        self._last_beat = now
+        if not self._stop.is_set():
+            self._handle = self._loop.call_later(self.interval, self._beat, now)
+
+    def _run(self) -> None:
+        reported = None
+        while not self._stop.wait(self.interval):
+            beat = self._last_beat
+            if beat == reported or self.clock() - beat < self.threshold + self.interval:
+                continue
+            # Пульс не обновлялся дольше порога: loop стоит прямо сейчас
+            reported = beat
+            self._sample()
+
+    def _sample(self) -> None:
+        frame = sys._current_frames().get(self._loop_thread)
+        if frame is None:
+            return
+        stack = traceback.extract_stack(frame, limit=MAX_STACK_DEPTH)
+        site = _call_site(stack)
+        formatted = "".join(traceback.format_list(stack))
+        with self._lock:
+            self.stalls += 1
+            if site not in self.sites and len(self.sites) >= MAX_SITES:
+                site = OTHER_SITE
+            self.sites[site] += 1
+            self.last_stack = formatted
+        logger.warning(
+            f"Event loop blocked for more than {self.threshold * 1000:.0f}ms at {site}\n{formatted}"
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sites = dict(self.sites.most_common())
+        return {
+            "running": self.running,
+            "threshold_ms": self.threshold * 1000,
+            "stalls": self.stalls,
+            "max_stall_ms": self.max_stall * 1000,
+            "sites": sites,
+        }
+
+
+loop_watchdog = LoopWatchdog(threshold=settings.LOOP_WATCHDOG_THRESHOLD or 0.1)
+
+registry.counter(
+    "app_event_loop_stalls_total",
+    "Event loop stalls longer than the watchdog threshold, by call site.",
+    lambda: loop_watchdog.stats()["sites"],
+    label="site"
+)
@@ -0,0 +1,235 @@
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+Labels = Tuple[Tuple[str, str], ...]
+GaugeValue = Union[float, Dict[str, float]]
+
+# Границы корзин латентности в секундах (как у Prometheus по умолчанию, плюс субмиллисекундные)
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными корзинами. Наблюдение — бинарный поиск
+    и инкремент под блокировкой, без хранения отдельных значений.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        # Последняя ячейка — значения больше верхней границы (+Inf)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def snapshot(self) -> Dict[str, object]:
+        """
+        Накопительные счётчики по верхним границам, как в Prometheus.
+        """
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative, running = {}, 0
+        for bound, value in zip(self.buckets, counts):
+            running += value
+            cumulative[repr(bound)] = running
+        cumulative["+Inf"] = count
+        return {"buckets": cumulative, "sum": total, "count": count}
+
+    def quantile(self, q: float) -> float:
+        """
+        Оценка квантиля по верхней границе корзины (inf, если за пределами).
+        """
+        with self._lock:
+            counts = list(self._counts)
+            count = self._count
+        if not count:
+            return 0.0
+        rank, running = q * count, 0
+        for bound, value in zip(self.buckets, counts):
+            running += value
+            if running >= rank:
+                return bound
+        return float("inf")
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """
+    Именованные гистограммы и gauge-функции с выводом в текстовом формате
+    Prometheus.
+
+    Серия гистограммы создаётся один раз на набор меток, дальше вызывающий
+    держит ссылку и платит только за observe. Gauge — функция, которая
+    вызывается при каждом сборе метрик: очереди и поколения не нужно
+    обновлять на горячем пути.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._gauges: Dict[str, Tuple[Callable[[], GaugeValue], Optional[str]]] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, help: str = "", labels: Labels = ()) -> Histogram:
+        series = self._histograms.get(name)
+        histogram = series.get(labels) if series is not None else None
+        if histogram is None:
+            with self._lock:
+                self._help.setdefault(name, ("histogram", help))
+                series = self._histograms.setdefault(name, {})
+                histogram = series.setdefault(labels, Histogram(self.buckets))
+        return histogram
+
+    def gauge(self, name: str, help: str, fn: Callable[[], GaugeValue], label: Optional[str] = None) -> None:
+        """
+        Регистрирует gauge. С label функция возвращает словарь значение метки -> число.
+        """
+        with self._lock:
+            self._help[name] = ("gauge", help)
+            self._gauges[name] = (fn, label)
+
+    def counter(self, name: str, help: str, fn: Callable[[], GaugeValue], label: Optional[str] = None) -> None:
+        """Как gauge, но для монотонно растущих счётчиков, которые ведёт сам источник."""
+        with self._lock:
+            self._help[name] = ("counter", help)
+            self._gauges[name] = (fn, label)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            histograms = {name: list(series.items()) for name, series in self._histograms.items()}
+            gauges = dict(self._gauges)
+            help = dict(self._help)
+
+        for name in sorted(histograms):
+            lines.append(f"# HELP {name} {help[name][1]}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in sorted(histograms[name]):
+                snapshot = histogram.snapshot()
+                for bound, count in snapshot["buckets"].items():
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(snapshot['sum'])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {snapshot['count']}")
+
+        for name in sorted(gauges):
+            fn, label = gauges[name]
+            try:
+                value = fn()
+            except Exception:
+                # Сломанный источник не должен ронять весь сбор метрик
+                continue
+            lines.append(f"# HELP {name} {help[name][1]}")
+            lines.append(f"# TYPE {name} {help[name][0]}")
+            if label is None:
+                lines.append(f"{name} {_format_value(value)}")
+            else:
+                for key, item in sorted(value.items()):
+                    lines.append(f"{name}{_format_labels(((label, str(key)),))} {_format_value(item)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+OPERATION_METRIC = "app_operation_duration_seconds"
+REQUEST_METRIC = "http_request_duration_seconds"
+# Метод приходит от клиента как есть: всё вне этого списка пишется в method="OTHER",
+# иначе выдуманные методы порождали бы бесконечно новые серии
+KNOWN_METHODS = frozenset({"GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"})
+
+
+def timed(operation: str):
+    """
+    Декоратор: длительность каждого вызова попадает в гистограмму операции.
+    Серия выбирается один раз при декорировании.
+    """
+    histogram = registry.histogram(
+        OPERATION_METRIC, "Duration of instrumented hot-path operations.", (("operation", operation),)
+    )
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+class RouteMetricsMiddleware:
+    """
+    ASGI-middleware латентности по маршрутам. Метка route — шаблон пути
+    (/v1/calls/{call_id}), а не сам путь, поэтому число серий ограничено
+    числом эндпоинтов; запросы мимо маршрутов попадают в route="unmatched",
+    нестандартные методы — в method="OTHER".
+    """
+
+    def __init__(self, app, metrics: MetricsRegistry = registry) -> None:
+        self.app = app
+        self.metrics = metrics
+        self._series: Dict[Tuple[str, str, int], Histogram] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = scope.get("route")
+            method = scope["method"] if scope["method"] in KNOWN_METHODS else "OTHER"
+            key = (method, route.path if route is not None else "unmatched", status)
+            histogram = self._series.get(key)
+            if histogram is None:
+                histogram = self._series[key] = self.metrics.histogram(
+                    REQUEST_METRIC,
+                    "HTTP request latency by route template.",
+                    (("method", key[0]), ("route", key[1]), ("status", str(status)))
+                )
+            histogram.observe(elapsed)
@@ -0,0 +1,220 @@
+import ipaddress
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from app.core.config import settings
+
+# Готовый ответ 429: отказ не должен стоить ни сериализации, ни разбора запроса
+TOO_MANY_REQUESTS_BODY = b'{"error":"Too many requests"}'
+
+
+class _Shard:
+    __slots__ = ("buckets", "lock")
+
+    def __init__(self) -> None:
+        # key -> [токены, время последнего пополнения]; порядок — по последнему обращению
+        self.buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket по произвольному ключу (номер звонящего, IP).
+
+    Ключи разложены по шардам, у каждого своя блокировка и свой лимит
+    размера. Корзины не чистятся по таймеру: корзина, простоявшая дольше
+    burst / rate, уже полна и ничем не отличается от отсутствующей, поэтому
+    такие записи снимаются с головы шарда при вставке новых ключей. Если шард
+    всё равно переполнен, вытесняется давно не использованный ключ — память
+    ограничена при любом числе разных ключей.
+
+    rate <= 0 отключает ограничение.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        max_keys: int = 100_000,
+        shards: int = 16,
+        clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self._shards = [_Shard() for _ in range(shards)]
+        self._max_per_shard = max(1, max_keys // shards)
+        # Через это время простоя корзина гарантированно полна
+        self._idle_ttl = burst / rate if rate > 0 else 0.0
+        self.rejected = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return sum(len(shard.buckets) for shard in self._shards)
+
+    def allow(self, key: str, cost: float = 1.0) -> bool:
+        if self.rate <= 0:
+            return True
+        now = self.clock()
+        shard = self._shards[hash(key) % len(self._shards)]
+        with shard.lock:
+            buckets = shard.buckets
+            bucket = buckets.get(key)
+            if bucket is None:
+                if len(buckets) >= self._max_per_shard:
+                    self._make_room(buckets, now)
+                bucket = buckets[key] = [self.burst, now]
+            else:
+                buckets.move_to_end(key)
+                tokens = bucket[0] + (now - bucket[1]) * self.rate
+                bucket[0] = tokens if tokens < self.burst else self.burst
+                bucket[1] = now
+
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return True
+            self.rejected += 1
+            return False
+
+    def _make_room(self, buckets: "OrderedDict[str, List[float]]", now: float) -> None:
+        while buckets:
+            key, bucket = next(iter(buckets.items()))
+            if now - bucket[1] < self._idle_ttl:
+                break
+            del buckets[key]
+        if len(buckets) >= self._max_per_shard:
+            buckets.popitem(last=False)
+            self.evicted += 1
+
+    def retry_after(self) -> int:
+        """Через сколько секунд появится хотя бы один токен (для заголовка Retry-After)."""
+        return max(1, int(1 / self.rate + 0.999)) if self.rate > 0 else 1
+
+    def stats(self) -> Dict[str, int]:
+        return {"keys": len(self), "rejected": self.rejected, "evicted": self.evicted}
+
+
+def too_many_requests_headers(retry_after: int) -> List[Tuple[bytes, bytes]]:
+    return [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(TOO_MANY_REQUESTS_BODY)).encode("ascii")),
+        (b"retry-after", str(retry_after).encode("ascii")),
+    ]
+
+
+class AdmissionControl:
+    """
+    Состояние допуска вебхуков: глобальный предел одновременных запросов,
+    token bucket по IP и счётчики отказов. Проверки выполняет AdmissionMiddleware.
+
+    Оба отказа происходят до чтения тела, то есть не зависят от типа сообщения:
+    предел параллельности отсекает и tool-calls, и end-of-call-report. Лимит по IP
+    не применяется к trusted_sources (адреса и подсети VAPI, своего прокси).
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = settings.INBOUND_MAX_CONCURRENCY,
+        ip_limiter: Optional[TokenBucketLimiter] = None,
+        trust_proxy: bool = settings.RATE_LIMIT_TRUST_PROXY,
+        trusted_sources: Iterable[str] = settings.INBOUND_TRUSTED_SOURCES
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.ip_limiter = ip_limiter
+        self.trust_proxy = trust_proxy
+        self.trusted_networks = [ipaddress.ip_network(source, strict=False) for source in trusted_sources]
+        self.in_flight = 0
+        self.shed_concurrency = 0
+        self.shed_ip = 0
+
+    def client_ip(self, scope) -> str:
+        if self.trust_proxy:
+            for name, value in scope.get("headers") or ():
+                if name == b"x-real-ip":
+                    return value.decode("latin-1")
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    def is_trusted(self, ip: str) -> bool:
+        if not self.trusted_networks:
+            return False
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+        return any(address in network for network in self.trusted_networks)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "shed_concurrency": self.shed_concurrency,
+            "shed_ip": self.shed_ip,
+        }
+
+
+class AdmissionMiddleware:
+    """
+    ASGI-middleware допуска для вебхуков. Отказ (429) отправляется до чтения
+    тела, до роутинга и до разбора JSON.
+    """
+
+    def __init__(self, app, control: AdmissionControl, paths: Tuple[str, ...] = ("/inbound",)) -> None:
+        self.app = app
+        self.control = control
+        self.paths = paths
+
+    @staticmethod
+    async def _reject(send, retry_after: int) -> None:
+        await send({"type": "http.response.start", "status": 429, "headers": too_many_requests_headers(retry_after)})
+        await send({"type": "http.response.body", "body": TOO_MANY_REQUESTS_BODY})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        control = self.control
+        if control.max_concurrency and control.in_flight >= control.max_concurrency:
+            control.shed_concurrency += 1
+            await self._reject(send, 1)
+            return
+        limiter = control.ip_limiter
+        if limiter is not None and limiter.rate > 0:
+            ip = control.client_ip(scope)
+            allowed = control.is_trusted(ip) or limiter.allow(ip)
+        else:
+            allowed = True
+        if not allowed:
+            control.shed_ip += 1
+            await self._reject(send, limiter.retry_after())
+            return
+
+        # Счётчик меняется только в event loop, блокировка не нужна
+        control.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            control.in_flight -= 1
+
+
+ip_limiter = TokenBucketLimiter(
+    rate=settings.INBOUND_IP_RATE,
+    burst=settings.INBOUND_IP_BURST,
+    max_keys=settings.RATE_LIMIT_MAX_KEYS
+)
+caller_limiter = TokenBucketLimiter(
+    rate=settings.INBOUND_CALLER_RATE,
+    burst=settings.INBOUND_CALLER_BURST,
+    max_keys=settings.RATE_LIMIT_MAX_KEYS
+)
+inbound_admission = AdmissionControl(ip_limiter=ip_limiter)
+
+
+def admission_stats() -> Dict[str, object]:
+    return {
+        **inbound_admission.stats(),
+        "ip": ip_limiter.stats(),
+        "caller": caller_limiter.stats(),
+    }
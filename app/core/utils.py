@@ -1,7 +1,179 @@
 import re
-from typing import Any, Dict, Type
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple, Type
 from pydantic import create_model, Field
 
+
+class LRUCache:
+    """
+    Потокобезопасный LRU-кэш ограниченного размера со счётчиками попаданий/промахов.
+    При переполнении вытесняется давно не использованный элемент,
+    поэтому потребление памяти не растёт с числом уникальных ключей.
+    """
+
+    def __init__(self, maxsize: int = 128) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._data.move_to_end(key)
+                return value
+
+            value = factory()
+            self._data[key] = value
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            return value
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class TTLCache:
+    """
+    Потокобезопасный кэш с временем жизни записей и ограничением размера.
+
+    Истечение отслеживает колесо времени: запись попадает в слот тика, на
+    котором истекает, и при продвижении колеса очищаются только пройденные
+    слоты — без обхода всего кэша и без таймеров. При переполнении
+    вытесняется самая старая запись (словарь упорядочен по вставке).
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        maxsize: int = 10000,
+        resolution: float = 1.0,
+        clock: Callable[[], float] = time.time
+    ) -> None:
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.resolution = resolution
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        # key -> (тик истечения, значение)
+        self._data: "OrderedDict[Hashable, Tuple[int, Any]]" = OrderedDict()
+        self._wheel: List[Set[Hashable]] = [set() for _ in range(int(ttl / resolution) + 2)]
+        self._tick = self._now_tick()
+        self._lock = threading.Lock()
+
+    def _now_tick(self) -> int:
+        return int(self.clock() / self.resolution)
+
+    def _advance(self) -> int:
+        now = self._now_tick()
+        size = len(self._wheel)
+        # Если колесо простояло больше полного оборота, достаточно одного прохода по всем слотам
+        for tick in range(max(self._tick + 1, now - size + 1), now + 1):
+            slot = self._wheel[tick % size]
+            for key in slot:
+                entry = self._data.get(key)
+                # Ключ мог быть перезаписан с более поздним сроком
+                if entry is not None and entry[0] <= now:
+                    del self._data[key]
+                    self.expired += 1
+            slot.clear()
+        self._tick = max(self._tick, now)
+        return now
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            now = self._advance()
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, expires_at: Optional[float] = None) -> None:
+        with self._lock:
+            self._store(key, value, expires_at, self._advance())
+
+    def _store(self, key: Hashable, value: Any, expires_at: Optional[float], now: int) -> None:
+        tick = int(expires_at / self.resolution) if expires_at is not None else now + int(self.ttl / self.resolution) + 1
+        if tick <= now:
+            return
+        # Слот не дальше полного оборота колеса от текущего тика
+        tick = min(tick, now + len(self._wheel) - 1)
+        self._data.pop(key, None)
+        self._data[key] = (tick, value)
+        self._wheel[tick % len(self._wheel)].add(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evicted += 1
+
+    def add(self, key: Hashable, value: Any) -> bool:
+        """Записывает значение, только если живой записи с таким ключом нет."""
+        with self._lock:
+            now = self._advance()
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return False
+            self.misses += 1
+            self._store(key, value, None, now)
+            return True
+
+    def items(self) -> List[Tuple[Hashable, float, Any]]:
+        """Живые записи: (ключ, время истечения, значение)."""
+        with self._lock:
+            now = self._advance()
+            return [(key, tick * self.resolution, value) for key, (tick, value) in self._data.items() if tick > now]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def freeze_fields(fields: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+    """
+    Превращает словарь полей в хэшируемый ключ.
+    Порядок сохраняется, так как он определяет порядок полей в схеме.
+    """
+    return tuple(fields.items())
+
+
+@lru_cache(maxsize=1024)
 def to_snake_case(name: str) -> str:
     """
     Конвертирует строку в snake_case, удаляя лишние пробелы и символы.
@@ -23,11 +195,10 @@ def to_snake_case(name: str) -> str:
         
     return result or "field"
 
-def create_dynamic_model(model_name: str, fields: Dict[str, str]) -> Type:
-    """
-    Динамически создает Pydantic-модель на основе словаря полей.
-    fields: { field_name: description }
-    """
+# Сгенерированные модели, ключ — (имя модели, замороженный набор полей)
+_model_cache = LRUCache(maxsize=256)
+
+def _build_dynamic_model(model_name: str, fields: Dict[str, str]) -> Type:
     pydantic_fields = {}
     for name, description in fields.items():
         snake_name = to_snake_case(name)
@@ -35,3 +206,17 @@ def create_dynamic_model(model_name: str, fields: Dict[str, str]) -> Type:
         pydantic_fields[snake_name] = (str, Field(..., description=description))
     
     return create_model(model_name, **pydantic_fields)
+
+def create_dynamic_model(model_name: str, fields: Dict[str, str]) -> Type:
+    """
+    Динамически создает Pydantic-модель на основе словаря полей.
+    fields: { field_name: description }
+
+    Модели кэшируются по содержимому полей: одинаковый набор полей
+    возвращает один и тот же класс.
+    """
+    key = (model_name, freeze_fields(fields))
+    return _model_cache.get_or_create(key, lambda: _build_dynamic_model(model_name, fields))
+
+def get_model_cache_stats() -> Dict[str, int]:
+    return _model_cache.stats()
@@ -0,0 +1,304 @@
+import itertools
+import json
+import queue
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from fastapi import Response
+from fastapi.concurrency import run_in_threadpool
+from app.core.load_shedding import OVERLOADED_BODY, LoadShedder
+from app.core.logger import format_payload, logger
+from app.core.metrics import Histogram
+from app.services.webhook_dedup import WebhookDeduplicator, dedup_key
+
+InlineHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+BackgroundHandler = Callable[[Dict[str, Any]], None]
+
+ACCEPTED = {"status": "received", "vapi_status": "success"}
+
+# Значения всех ключей "type" в теле; message.type среди них, вложенные объекты тоже
+_TYPE_RE = re.compile(rb'"type"\s*:\s*"([^"\\]{1,64})"')
+
+_STOP = object()
+
+
+def body_has_type(body: bytes, message_type: str) -> bool:
+    """Есть ли среди значений "type" сырого тела указанный тип — без разбора JSON."""
+    return message_type.encode("utf-8") in _TYPE_RE.findall(body)
+
+# Приоритеты фоновой очереди: меньше — раньше
+PRIORITY_VIP = 0
+PRIORITY_DEFAULT = 1
+_PRIORITY_STOP = sys.maxsize
+
+
+@dataclass
+class MessageStats:
+    inline: int = 0
+    background: int = 0
+    overflow: int = 0
+    errors: int = 0
+    duplicates: int = 0
+    shed: int = 0
+    latency: Histogram = field(default_factory=Histogram)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "inline": self.inline,
+            "background": self.background,
+            "overflow": self.overflow,
+            "errors": self.errors,
+            "duplicates": self.duplicates,
+            "shed": self.shed,
+            "p50_ms": self.latency.quantile(0.5) * 1000,
+            "p99_ms": self.latency.quantile(0.99) * 1000,
+            "latency": self.latency.snapshot(),
+        }
+
+
+class MessageDispatcher:
+    """
+    Маршрутизация вебхуков VAPI по message.type.
+
+    Срочные типы (assistant-request, tool-calls) обрабатываются прямо в
+    запросе. Телеметрия (status-update, transcript, ...) ставится в
+    ограниченную очередь пула потоков и подтверждается 202 сразу — до разбора
+    JSON: тип определяется поиском по сырому телу, полный разбор и логирование
+    выполняются уже в фоне. Очередь приоритетная: события VIP-звонков
+    обрабатываются раньше остальных.
+
+    С dedup (WebhookDeduplicator) повторная доставка события не
+    обрабатывается второй раз: срочные типы получают сохранённый ответ,
+    фоновые пропускаются воркером.
+
+    С shedder (LoadShedder) срочные события проходят через бюджеты своих
+    классов, а телеметрия, зарегистрированная как sheddable, отбрасывается,
+    когда под угрозой SLO assistant-request или фоновая очередь полна.
+    Остальные фоновые события при перегрузке только откладываются.
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        max_queue: int = 1000,
+        dedup: Optional[WebhookDeduplicator] = None,
+        shedder: Optional[LoadShedder] = None
+    ) -> None:
+        self.workers = workers
+        self.dedup = dedup
+        self.shedder = shedder
+        self._queue: "queue.PriorityQueue[Any]" = queue.PriorityQueue(maxsize=max_queue)
+        # Порядковый номер сохраняет FIFO внутри приоритета и не даёт сравнивать тела
+        self._seq = itertools.count()
+        self._inline: Dict[str, InlineHandler] = {}
+        self._background: Dict[str, BackgroundHandler] = {}
+        self._background_types: Set[bytes] = set()
+        self._inline_types: Set[bytes] = set()
+        # Фоновые типы, которые нельзя отбрасывать (например, отчёт о звонке с заказом)
+        self._durable_types: Set[bytes] = set()
+        self.queue_wait = Histogram()
+        self._stats: Dict[str, MessageStats] = {}
+        self._stats_lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self.default_handler: Optional[InlineHandler] = None
+
+    def inline(self, *message_types: str):
+        """Регистрирует обработчик, который выполняется в запросе и формирует ответ."""
+        def decorator(handler: InlineHandler) -> InlineHandler:
+            for message_type in message_types:
+                self._inline[message_type] = handler
+                self._inline_types.add(message_type.encode("utf-8"))
+            return handler
+        return decorator
+
+    def background(self, *message_types: str, sheddable: bool = False):
+        """
+        Регистрирует обработчик, который выполняется в пуле потоков после ответа 202.
+        sheddable — событие можно отбросить при перегрузке.
+        """
+        def decorator(handler: BackgroundHandler) -> BackgroundHandler:
+            for message_type in message_types:
+                self._background[message_type] = handler
+                self._background_types.add(message_type.encode("utf-8"))
+                if not sheddable:
+                    self._durable_types.add(message_type.encode("utf-8"))
+            return handler
+        return decorator
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def _stats_for(self, message_type: str) -> MessageStats:
+        stats = self._stats.get(message_type)
+        if stats is None:
+            with self._stats_lock:
+                stats = self._stats.setdefault(message_type, MessageStats())
+        return stats
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self.queue_depth,
+            "queue_wait_p50_ms": self.queue_wait.quantile(0.5) * 1000,
+            "queue_wait_p99_ms": self.queue_wait.quantile(0.99) * 1000,
+            "types": {name: stats.to_dict() for name, stats in sorted(self._stats.items())},
+        }
+
+    def is_background(self, body: bytes) -> bool:
+        """
+        True, если тело можно подтвердить не разбирая: среди значений "type"
+        есть фоновый тип и нет ни одного срочного. Ложных срабатываний в сторону
+        фона не бывает — срочное сообщение всегда разбирается в запросе.
+        """
+        return self._is_background(_TYPE_RE.findall(body))
+
+    def _is_background(self, found: List[bytes]) -> bool:
+        if not found or self._inline_types.intersection(found):
+            return False
+        return not self._background_types.isdisjoint(found)
+
+    async def dispatch(self, body: bytes, priority: int = PRIORITY_DEFAULT) -> Any:
+        """
+        Возвращает ответ для VAPI. None — сообщение принято в фон (ответ 202).
+        """
+        found = _TYPE_RE.findall(body)
+        if self._is_background(found):
+            sheddable = self.shedder is not None and self._durable_types.isdisjoint(found)
+            # Под угрозой SLO телеметрия не занимает ни очередь, ни пул потоков
+            if sheddable and self.shedder.at_risk():
+                self._shed(found)
+                return None
+            if self._submit(body, priority):
+                return None
+            if sheddable:
+                self._shed(found)
+                return None
+            # Очередь полна: обрабатываем сами, замедляя отправителя вместо потери события
+            await run_in_threadpool(self._process, body, True)
+            return None
+
+        start = time.perf_counter()
+        payload = json.loads(body)
+        message = self._log_and_extract(payload)
+        message_type = message.get("type")
+        handler = self._inline.get(message_type)
+        if handler is None:
+            if message_type in self._background:
+                # Фоновый тип, не распознанный по сырому телу, — обрабатываем в пуле
+                await run_in_threadpool(self._run_background, message, time.perf_counter(), False)
+                return None
+            handler = self.default_handler
+        stats = self._stats_for(message_type or "unknown")
+        budget = None
+        if self.shedder is not None:
+            budget = self.shedder.budget_for(message_type or "unknown", vip=priority == PRIORITY_VIP)
+            if budget is not None and not await self.shedder.acquire(budget):
+                stats.shed += 1
+                return Response(
+                    content=OVERLOADED_BODY,
+                    status_code=503,
+                    media_type="application/json",
+                    headers={"Retry-After": "1"}
+                )
+        stats.inline += 1
+        key = dedup_key(message) if self.dedup is not None and handler is not None else None
+        try:
+            if key is None:
+                return await handler(message) if handler else ACCEPTED
+            result, duplicate = await self.dedup.run(key, lambda: handler(message))
+            if duplicate:
+                stats.duplicates += 1
+            return result
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            stats.latency.observe(elapsed)
+            if budget is not None:
+                self.shedder.release(budget, elapsed)
+
+    @staticmethod
+    def _log_and_extract(payload: Any) -> Dict[str, Any]:
+        # Payload форматируется лениво и с ограничением длины
+        logger.opt(lazy=True).info("Received VAPI webhook: {}", lambda: format_payload(payload))
+        message = payload.get("message") if isinstance(payload, dict) else None
+        return message if isinstance(message, dict) else {}
+
+    def _shed(self, found: List[bytes]) -> None:
+        message_type = next(t for t in found if t in self._background_types)
+        self._stats_for(message_type.decode("utf-8", "replace")).shed += 1
+
+    def _submit(self, body: bytes, priority: int) -> bool:
+        if not self._threads:
+            self.start()
+        try:
+            self._queue.put_nowait((priority, next(self._seq), time.perf_counter(), body))
+            return True
+        except queue.Full:
+            return False
+
+    def _process(self, body: bytes, overflow: bool = False) -> None:
+        start = time.perf_counter()
+        try:
+            message = self._log_and_extract(json.loads(body))
+        except ValueError as e:
+            logger.warning(f"Dropping malformed VAPI webhook: {e}")
+            return
+        self._run_background(message, start, overflow)
+
+    def _run_background(self, message: Dict[str, Any], start: float, overflow: bool) -> None:
+        message_type = message.get("type") or "unknown"
+        handler = self._background.get(message_type)
+        stats = self._stats_for(message_type)
+        stats.background += 1
+        if overflow:
+            stats.overflow += 1
+        if self.dedup is not None:
+            key = dedup_key(message)
+            if key is not None and not self.dedup.mark(key, ACCEPTED):
+                stats.duplicates += 1
+                return
+        try:
+            if handler is not None:
+                handler(message)
+        except Exception as e:
+            stats.errors += 1
+            logger.exception(f"Background handler for {message_type} failed: {e}")
+        finally:
+            stats.latency.observe(time.perf_counter() - start)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"inbound-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _worker(self) -> None:
+        while True:
+            _, _, enqueued_at, item = self._queue.get()
+            if item is _STOP:
+                return
+            self.queue_wait.observe(time.perf_counter() - enqueued_at)
+            self._process(item)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """
+        Дорабатывает очередь и останавливает потоки.
+        """
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            try:
+                self._queue.put((_PRIORITY_STOP, next(self._seq), 0.0, _STOP), timeout=timeout)
+            except queue.Full:
+                pass
+        for thread in threads:
+            thread.join(timeout)
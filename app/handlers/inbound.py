@@ -1,32 +1,123 @@
-from fastapi import Request
-from app.services.tools_registry import get_dynamic_tool_schema
-from app.core.config_loader import get_config
+from typing import Any, Dict
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from app.services.assistant_payload import assistant_response_cache
+from app.core.config_watcher import get_current_config
 from app.core.logger import logger
+from app.services.agent_registry import agent_registry, config_for_message
+from app.handlers.dispatcher import ACCEPTED, PRIORITY_DEFAULT, PRIORITY_VIP, MessageDispatcher, body_has_type
+from app.core.load_shedding import inbound_shedder
+from app.core.rate_limit import TOO_MANY_REQUESTS_BODY, caller_limiter
+from app.services.caller_routing import BLOCKED, VIP, caller_from_body, caller_from_message, caller_router, normalize_e164
+from app.services.call_sessions import call_sessions, message_session, message_timestamp
+from app.services.order_writer import collect_tool_results, order_from_end_of_call, record_orders, write_orders
+from app.services.webhook_dedup import webhook_dedup
+
+inbound_dispatcher = MessageDispatcher(dedup=webhook_dedup, shedder=inbound_shedder)
+
+# VAPI завершает звонок, если в ответе на assistant-request пришло поле error
+BLOCKED_RESPONSE = {"error": "This number is not allowed to call."}
+
+
+@inbound_dispatcher.inline("assistant-request")
+async def handle_assistant_request(message: Dict[str, Any]) -> Any:
+    # Номер не нашёлся в сыром теле — проверяем его по разобранному сообщению
+    if caller_router.classify(caller_from_message(message)) == BLOCKED:
+        caller_router.record(BLOCKED)
+        return BLOCKED_RESPONSE
+    message_session(message)
+    # Ответ собран и сериализован заранее, на звонок подставляются только его данные
+    agent = agent_registry.resolve(message)
+    if agent is not None:
+        body = agent.response(get_current_config(), message)
+    else:
+        body = assistant_response_cache.get(get_current_config(), message)
+    return Response(content=body, media_type="application/json")
+
+
+@inbound_dispatcher.inline("tool-calls")
+async def handle_tool_calls(message: Dict[str, Any]) -> Dict[str, Any]:
+    # Собранные данные клиента пишутся в фоне, вебхук подтверждается сразу
+    fields = config_for_message(message).voice_settings.dynamic_fields
+    results, orders = collect_tool_results(message, fields)
+    session = message_session(message)
+    if session is not None:
+        for order in orders:
+            session.update_fields(order.details)
+    if orders:
+        await record_orders(orders)
+    return {"results": results}
+
+
+@inbound_dispatcher.background("end-of-call-report")
+def handle_end_of_call(message: Dict[str, Any]) -> None:
+    call_id = (message.get("call") or {}).get("id")
+    if call_id:
+        call_sessions.end(str(call_id))
+    order = order_from_end_of_call(message, config_for_message(message).voice_settings.dynamic_fields)
+    if order is not None:
+        write_orders([order])
+
+
+@inbound_dispatcher.background("transcript", sheddable=True)
+def handle_transcript(message: Dict[str, Any]) -> None:
+    # Промежуточные (partial) расшифровки не храним, только итоговые реплики
+    if message.get("transcriptType", "final") != "final":
+        return
+    session = message_session(message)
+    if session is not None and message.get("transcript"):
+        at = message_timestamp(message, default=session.last_seen)
+        session.add_turn(str(message.get("role") or "unknown"), str(message["transcript"]), at)
+
+
+@inbound_dispatcher.background("status-update", sheddable=True)
+def handle_status_update(message: Dict[str, Any]) -> None:
+    session = message_session(message)
+    if session is not None and message.get("status"):
+        session.status = str(message["status"])
+
+
+@inbound_dispatcher.background("speech-update", "conversation-update", "hang", "user-interrupted", sheddable=True)
+def handle_telemetry(message: Dict[str, Any]) -> None:
+    # Продлеваем сессию; остальное покрывает запись в лог, которую делает диспетчер
+    message_session(message)
+
 
 async def vapi_inbound_handler(request: Request):
     """
     Inbound handler for VAPI webhooks.
-    Injects dynamic tools based on configuration.
+    Routes messages by type: assistant config and tool calls are answered
+    inline, telemetry is acknowledged with 202 and processed in the background.
+    Assistant requests from blacklisted callers are rejected first; VIP telemetry is processed first.
+    Under overload telemetry is shed before assistant requests are delayed.
     """
-    payload = await request.json()
-    logger.info(f"Received VAPI webhook: {payload}")
-    
-    config = get_config()
-    dynamic_fields = config.voice_settings.dynamic_fields
-    
-    # Генерация динамической схемы инструментов
-    tools = [get_dynamic_tool_schema(dynamic_fields)] if dynamic_fields else []
-    
-    # Если VAPI запрашивает конфигурацию ассистента
-    if payload.get("message", {}).get("type") == "assistant-request":
-        return {
-            "assistant": {
-                "model": {
-                    "provider": "openai",
-                    "model": "gpt-4-turbo",
-                    "tools": tools
-                }
-            }
-        }
-
-    return {"status": "received", "vapi_status": "success"}
+    body = await request.body()
+    caller = caller_from_body(body)
+    tier = caller_router.classify(caller)
+    caller_router.record(tier)
+    # Заблокированных отсекаем до разбора JSON и любой другой работы. Отказ понимает
+    # только assistant-request; события уже идущего звонка (номер мог попасть в
+    # чёрный список во время разговора) обрабатываются как обычно
+    if tier == BLOCKED and body_has_type(body, "assistant-request"):
+        logger.info(f"Rejected blacklisted caller {caller}")
+        return BLOCKED_RESPONSE
+    # Лимит на звонящего — тоже до разбора JSON и только для assistant-request:
+    # tool-calls и отчёт о завершении уже принятого звонка не отклоняем, иначе
+    # теряются заказы. VIP не ограничиваем
+    if (
+        caller
+        and tier != VIP
+        and body_has_type(body, "assistant-request")
+        and not caller_limiter.allow(normalize_e164(caller) or caller)
+    ):
+        return Response(
+            content=TOO_MANY_REQUESTS_BODY,
+            status_code=429,
+            media_type="application/json",
+            headers={"Retry-After": str(caller_limiter.retry_after())}
+        )
+    priority = PRIORITY_VIP if tier == VIP else PRIORITY_DEFAULT
+    response = await inbound_dispatcher.dispatch(body, priority=priority)
+    if response is None:
+        return JSONResponse(status_code=202, content=ACCEPTED)
+    return response
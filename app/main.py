@@ -1,15 +1,62 @@
-from fastapi import FastAPI, Request
+import hashlib
+from datetime import datetime
+from typing import Optional
+from fastapi import FastAPI, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from contextlib import asynccontextmanager
+from app.adapters.telegram import telegram_dispatcher
 from app.core.config import settings
 from app.core.logger import logger
-from app.core.config_loader import get_config
+from app.core.log_writer import flush_log_writers, log_queue_depth
+from app.core.load_shedding import inbound_shedder
+from app.core.loop_watchdog import loop_watchdog
+from app.core.metrics import RouteMetricsMiddleware, registry
+from app.core.compression import CompressionMiddleware, etag_matches
+from app.core.rate_limit import AdmissionMiddleware, admission_stats, inbound_admission
+from app.core.config_loader import config_fingerprint, get_config
+from app.core.config_watcher import ConfigWatcher, config_store, get_current_config
+from app.core.config_writer import ConfigConflict, config_writer
+from app.services.knowledge_base import get_knowledge_base
+from app.services.order_store import DEFAULT_PAGE_SIZE, close_order_store, export_orders_json, get_order_store
+from app.services.order_writer import order_writer
+from app.services.call_sessions import call_sessions
+from app.services.agent_registry import agent_registry
+from app.services.caller_routing import caller_router
+from app.services.webhook_dedup import webhook_dedup
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Starting Omnicore AI Backend...")
+    watchers = []
+    if settings.CONFIG_WATCH_INTERVAL > 0:
+        # Агенты и списки номеров отслеживаются отдельно: их правка не трогает основной снимок
+        watchers = [
+            ConfigWatcher(config_store, interval=settings.CONFIG_WATCH_INTERVAL),
+            ConfigWatcher(agent_registry, interval=settings.CONFIG_WATCH_INTERVAL),
+            ConfigWatcher(caller_router, interval=settings.CONFIG_WATCH_INTERVAL),
+        ]
+        for watcher in watchers:
+            await run_in_threadpool(watcher.start)
+    # Индекс базы знаний строится в фоне, запросы не ждут его готовности
+    config = get_current_config()
+    if config.knowledge_base_file:
+        get_knowledge_base(config.knowledge_base_file).refresh()
+    if settings.LOOP_WATCHDOG_THRESHOLD > 0:
+        loop_watchdog.start()
     yield
+    loop_watchdog.stop()
+    for watcher in watchers:
+        await run_in_threadpool(watcher.stop)
     logger.info("Shutting down Omnicore AI Backend...")
+    # Дописываем очередь логов на диск, затем досылаем накопленные алерты
+    await run_in_threadpool(inbound_dispatcher.stop)
+    await run_in_threadpool(webhook_dedup.save)
+    await run_in_threadpool(order_writer.stop)
+    await run_in_threadpool(close_order_store)
+    await run_in_threadpool(flush_log_writers)
+    await run_in_threadpool(telegram_dispatcher.stop)
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -24,116 +71,292 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Сжатие и 304 для опросов дашборда; время сжатия входит в латентность маршрута
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(RouteMetricsMiddleware)
+# Добавлен последним, поэтому внешний: лишние вебхуки отсекаются раньше всего остального
+app.add_middleware(AdmissionMiddleware, control=inbound_admission)
 
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
 
+def _config_generation() -> int:
+    return config_store.generation.read() if config_store.generation is not None else 0
+
+def _queue_depths() -> dict:
+    return {
+        "inbound": inbound_dispatcher.queue_depth,
+        "orders": order_writer.queue_depth,
+        "telegram": telegram_dispatcher.queue_depth,
+        "logs": log_queue_depth(),
+    }
+
+@app.get("/ready")
+async def readiness_check():
+    """
+    Готовность принимать трафик: конфигурация загружена. Поколение конфига
+    и глубина очередей помогают увидеть отставший воркер или затор.
+    """
+    try:
+        config = get_current_config()
+    except Exception as e:
+        return JSONResponse(status_code=503, content={"status": "not_ready", "error": str(e)})
+    return {
+        "status": "ready",
+        "config_generation": _config_generation(),
+        "config_fingerprint": config_fingerprint(config),
+        "queues": _queue_depths(),
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Метрики в текстовом формате Prometheus."""
+    return Response(content=registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.post("/config/reload")
 async def reload_config():
     """
-    Очищает кэш lru_cache для обновления настроек без перезапуска сервера.
+    Перечитывает конфигурацию без перезапуска сервера.
+    Обычно это делает наблюдатель за файлами; эндпоинт оставлен для ручного форса.
     """
     get_config.cache_clear()
+    await run_in_threadpool(config_store.publish)
     logger.info("Configuration cache cleared successfully.")
     return {"status": "success", "message": "Configuration reloaded"}
 
+def _version_etag(*parts) -> str:
+    """ETag из дешёвой версии данных и параметров запроса — без вызова обработчика."""
+    return '"' + hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest() + '"'
+
+def _not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    return bool(if_none_match) and etag_matches(if_none_match, etag)
+
 @app.get("/v1/config")
-async def fetch_current_config():
-    config = get_config()
-    return config
+async def fetch_current_config(request: Request):
+    """
+    Текущая конфигурация. JSON и ETag готовятся один раз на снимок,
+    опрос с If-None-Match получает 304 без тела.
+    """
+    body, etag = config_store.rendered()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def _config_written(etag: str, message: str) -> JSONResponse:
+    return JSONResponse(content={"status": "success", "message": message, "version": etag}, headers={"ETag": etag})
+
+def _config_conflict(e: ConfigConflict) -> JSONResponse:
+    return JSONResponse(
+        status_code=412,
+        content={"status": "error", "message": str(e)},
+        headers={"ETag": e.current_etag}
+    )
 
 @app.post("/v1/config")
-async def update_current_config(new_config: dict):
-    import yaml
-    from pathlib import Path
-    from app.core.config_loader import AppSettings
-    
-    # Валидация данных перед сохранением
+async def update_current_config(new_config: dict, request: Request):
+    """
+    Сохраняет конфигурацию атомарно, предыдущая версия уходит в историю.
+    If-Match с ETag из GET защищает от перезаписи чужих изменений (412).
+    """
     try:
-        AppSettings(**new_config)
-    except Exception as e:
+        # Валидация, запись с fsync и перезагрузка снимка — в пуле потоков
+        etag = await run_in_threadpool(config_writer.write, new_config, request.headers.get("if-match"))
+    except ValueError as e:
         logger.error(f"Invalid config submitted: {e}")
-        return {"status": "error", "message": f"Validation failed: {e}"}
-
-    # Путь к конфигу (аналогично config_loader.py)
-    BASE_DIR = Path(__file__).resolve().parent.parent
-    config_path = BASE_DIR / "config" / "settings.yaml"
-    
-    # Сохраняем новый YAML
-    with open(config_path, "w", encoding="utf-8") as f:
-        yaml.dump(new_config, f, allow_unicode=True, sort_keys=False)
-    
-    # Сбрасываем кэш
-    get_config.cache_clear()
-    logger.info(f"Configuration updated and written to {config_path}")
-    
-    return {"status": "success", "message": "Config updated"}
+        return {"status": "error", "message": str(e)}
+    except ConfigConflict as e:
+        return _config_conflict(e)
+    return _config_written(etag, "Config updated")
 
-@app.get("/v1/logs")
-async def fetch_logs():
-    import os
-    import json
-    from pathlib import Path
-    
-    log_file = Path("logs/app.json")
-    if not log_file.exists():
+@app.get("/v1/config/history")
+async def config_history():
+    return await run_in_threadpool(config_writer.history)
+
+@app.post("/v1/config/rollback/{version}")
+async def rollback_config(version: str, request: Request):
+    try:
+        etag = await run_in_threadpool(config_writer.rollback, version, request.headers.get("if-match"))
+    except KeyError:
+        return JSONResponse(status_code=404, content={"status": "error", "message": f"No config version {version}"})
+    except ValueError as e:
+        return JSONResponse(status_code=422, content={"status": "error", "message": str(e)})
+    except ConfigConflict as e:
+        return _config_conflict(e)
+    return _config_written(etag, f"Config rolled back to version {version}")
+
+@app.get("/v1/knowledge/search")
+async def search_knowledge_base(q: str, k: int = 3):
+    """
+    Top-k релевантных фрагментов базы знаний (BM25).
+    """
+    config = get_current_config()
+    if not config.knowledge_base_file:
         return []
-        
+    kb = get_knowledge_base(config.knowledge_base_file)
+    results = await run_in_threadpool(kb.search, q, max(1, min(k, 20)))
+    return [{"score": round(chunk.score, 4), "text": chunk.text} for chunk in results]
+
+@app.get("/v1/logs")
+async def fetch_logs(
+    request: Request,
+    response: Response,
+    limit: int = 50,
+    before: Optional[int] = None,
+    after: Optional[int] = None,
+    level: Optional[str] = None,
+    module: Optional[str] = None
+):
+    """
+    Последние записи лога. Курсоры для пагинации и опроса новых записей
+    возвращаются в заголовках X-Next-Before и X-Next-After.
+    Пока файл лога не менялся, опрос с If-None-Match получает 304 без чтения файла.
+    """
+    from app.services.log_reader import log_version, read_log_page
+
+    etag = _version_etag("logs", log_version(), limit, before, after, level, module)
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
     try:
-        with open(log_file, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-            # Берем последние 50 строк
-            last_lines = lines[-50:]
-            logs = []
-            for line in last_lines:
-                try:
-                    entry = json.loads(line.strip())
-                    # Loguru с serialize=True кладет данные в "record"
-                    if isinstance(entry, dict) and "record" in entry:
-                        record = entry["record"]
-                        logs.append({
-                            "timestamp": record["time"].get("repr"),
-                            "level": record["level"].get("name"),
-                            "message": record["message"],
-                            "module": record["name"],
-                            "function": record["function"],
-                            "line": record["line"]
-                        })
-                    elif isinstance(entry, dict) and "message" in entry:
-                        # Поддержка старого плоского формата
-                        logs.append(entry)
-                except Exception as e:
-                    continue
-            return logs
+        # Чтение файла — блокирующая операция, уводим её с event loop
+        page = await run_in_threadpool(
+            read_log_page,
+            limit=limit,
+            before=before,
+            after=after,
+            level=level,
+            module=module
+        )
     except Exception as e:
         logger.error(f"Error reading logs: {e}")
         return {"error": str(e)}
 
+    if page.next_before is not None:
+        response.headers["X-Next-Before"] = str(page.next_before)
+    if page.next_after is not None:
+        response.headers["X-Next-After"] = str(page.next_after)
+    response.headers["ETag"] = etag
+    return page.records
+
+@app.get("/v1/logs/stream")
+async def stream_logs(level: Optional[str] = None, module: Optional[str] = None):
+    """
+    Живая трансляция новых записей лога (Server-Sent Events) вместо опроса /v1/logs.
+    """
+    from app.services.log_stream import log_broadcaster, stream_events
+
+    subscriber = log_broadcaster.subscribe(level=level, module=module)
+
+    async def events():
+        try:
+            async for event in stream_events(subscriber):
+                yield event
+        finally:
+            log_broadcaster.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Отключаем буферизацию в nginx, иначе события приходят пачками
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/v1/logs/search")
+async def search_logs(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    level: Optional[str] = None,
+    limit: int = 200
+):
+    """
+    Поиск по времени и уровню во всех сохранённых сегментах лога, включая ротированные.
+    """
+    from app.services.log_index import log_index
+
+    try:
+        return await run_in_threadpool(
+            log_index.query,
+            start=start.timestamp() if start else None,
+            end=end.timestamp() if end else None,
+            level=level,
+            limit=max(1, min(limit, 1000))
+        )
+    except Exception as e:
+        logger.error(f"Error searching logs: {e}")
+        return {"error": str(e)}
+
 @app.get("/v1/orders")
-async def fetch_orders():
-    import random
-    from datetime import datetime, timedelta
-    from app.schemas.orders import Order
-    
-    names = ["Алексей Петров", "Мария Сидорова", "Иван Иванов", "Елена Кузнецова", "Дмитрий Волков", "Татьяна Соколова", "Сергей Морозов"]
-    statuses = ["new", "completed", "failed"]
-    
-    mock_orders = []
-    for i in range(10):
-        mock_orders.append(Order(
-            id=f"ord-{1000 + i}",
-            customer_name=random.choice(names),
-            phone=f"+7 900 {random.randint(100, 999)}-{random.randint(10, 99)}-{random.randint(10, 99)}",
-            status=random.choice(statuses),
-            created_at=datetime.now() - timedelta(hours=random.randint(1, 48))
-        ))
-    
-    # Сортируем: новые сверху
-    mock_orders.sort(key=lambda x: x.created_at, reverse=True)
-    return mock_orders
-
-from app.handlers.inbound import vapi_inbound_handler
+async def fetch_orders(
+    request: Request,
+    response: Response,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None
+):
+    """
+    Заказы, новые сверху. Тело ответа — список (как ожидает фронтенд),
+    курсор следующей страницы передаётся в заголовке X-Next-Cursor.
+    ETag строится по PRAGMA data_version: пока база не менялась, опрос
+    с If-None-Match получает 304 без чтения страницы.
+    """
+    store = get_order_store()
+    etag = _version_etag("orders", await store.run(store.version), limit, cursor, status)
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    try:
+        orders, next_cursor = await store.run(store.list_orders, limit=limit, cursor=cursor, status=status)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    response.headers["ETag"] = etag
+    return orders
+
+@app.get("/v1/orders/export")
+async def export_orders(status: Optional[str] = None):
+    return StreamingResponse(
+        export_orders_json(get_order_store(), status=status),
+        media_type="application/json",
+        headers={"Content-Disposition": "attachment; filename=orders.json"}
+    )
+
+from app.handlers.inbound import inbound_dispatcher, vapi_inbound_handler
+
+registry.gauge("app_queue_depth", "Items waiting in background queues.", _queue_depths, label="queue")
+registry.gauge("app_config_generation", "Config generation seen by this worker.", _config_generation)
+registry.gauge("app_inbound_in_flight", "Webhook requests being processed.", lambda: inbound_admission.in_flight)
+registry.gauge("app_call_sessions_active", "Active call sessions.", lambda: len(call_sessions))
+registry.gauge("app_webhook_dedup_entries", "Entries in the webhook dedup cache.", lambda: len(webhook_dedup.cache))
+
+@app.get("/v1/inbound/stats")
+async def inbound_stats():
+    """Счётчики и латентность по типам сообщений VAPI (inline и фон)."""
+    return {
+        **inbound_dispatcher.stats(),
+        "admission": admission_stats(),
+        "dedup": webhook_dedup.stats(),
+        "scheduler": inbound_shedder.stats(),
+        "event_loop": loop_watchdog.stats(),
+    }
+
+@app.get("/v1/agents")
+async def list_agents():
+    index = agent_registry.current()
+    # routable: false — у агента нет своих маршрутов, звонки на него не попадут
+    return [
+        {**entry.agent.model_dump(), "routable": agent_id not in index.unreachable}
+        for agent_id, entry in index.by_id.items()
+    ]
+
+@app.get("/v1/calls/{call_id}")
+async def get_call_session(call_id: str):
+    session = call_sessions.get(call_id)
+    if session is None:
+        return JSONResponse(status_code=404, content={"error": f"No active call {call_id}"})
+    return session.to_dict()
 
 @app.post("/inbound")
 async def vapi_inbound(request: Request):
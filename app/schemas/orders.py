@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from typing import Any, Dict
+from pydantic import BaseModel, Field
 from datetime import datetime
 
 class Order(BaseModel):
@@ -7,3 +8,5 @@ class Order(BaseModel):
     phone: str
     status: str
     created_at: datetime
+    # Собранные ассистентом поля (dynamic_fields), как есть
+    details: Dict[str, Any] = Field(default_factory=dict)
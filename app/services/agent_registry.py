@@ -0,0 +1,221 @@
+import hashlib
+import re
+import threading
+import yaml
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+from app.core.config import settings
+from app.core.config_loader import AppSettings, VoiceSettings, resolve_path
+from app.core.config_watcher import get_current_config
+from app.core.logger import logger
+from app.services.assistant_payload import AssistantResponseCache
+
+
+class AgentConfig(BaseModel):
+    """
+    Описание агента из config/agents.yaml. Незаданные поля наследуются
+    из основной конфигурации (settings.yaml).
+    """
+    model_config = ConfigDict(frozen=True)
+
+    id: str = Field(..., min_length=1)
+    name: str = ""
+    voice: str = Field(..., min_length=1)
+    prompt: str
+    provider: Optional[str] = None
+    knowledge_base_file: Optional[str] = None
+    dynamic_fields: Optional[Dict[str, str]] = None
+    # Номера, на которые звонят агенту, и id ассистентов VAPI
+    phone_numbers: List[str] = Field(default_factory=list)
+    assistant_ids: List[str] = Field(default_factory=list)
+
+    def to_app_settings(self, base: AppSettings) -> AppSettings:
+        voice = base.voice_settings
+        return AppSettings(
+            system_prompt=self.prompt,
+            knowledge_base_file=self.knowledge_base_file or base.knowledge_base_file,
+            voice_settings=VoiceSettings(
+                provider=self.provider or voice.provider,
+                voice_id=self.voice,
+                stability=voice.stability,
+                similarity_boost=voice.similarity_boost,
+                dynamic_fields=voice.dynamic_fields if self.dynamic_fields is None else self.dynamic_fields
+            ),
+            tools_enabled=base.tools_enabled
+        )
+
+
+def normalize_number(number: str) -> str:
+    """Оставляет в номере только цифры и ведущий +."""
+    digits = re.sub(r"\D", "", number)
+    return f"+{digits}" if digits else ""
+
+
+class AgentEntry:
+    """
+    Агент вместе с производной конфигурацией и собственным кэшем ответа.
+    Запись переиспользуется между перезагрузками, пока агент не изменился.
+    """
+
+    __slots__ = ("agent", "fingerprint", "base", "settings", "cache")
+
+    def __init__(self, agent: AgentConfig, fingerprint: str) -> None:
+        self.agent = agent
+        self.fingerprint = fingerprint
+        self.base: Optional[AppSettings] = None
+        self.settings: Optional[AppSettings] = None
+        self.cache = AssistantResponseCache()
+
+    def settings_for(self, base: AppSettings) -> AppSettings:
+        # Снимок основной конфигурации сменился — пересчитываем наследуемые поля;
+        # ответ пересоберётся, только если итоговые настройки агента изменились
+        if self.base is not base:
+            self.settings = self.agent.to_app_settings(base)
+            self.base = base
+        return self.settings
+
+    def response(self, base: AppSettings, message: Optional[Dict[str, Any]] = None) -> bytes:
+        return self.cache.get(self.settings_for(base), message)
+
+
+class AgentIndex(NamedTuple):
+    by_id: Dict[str, AgentEntry]
+    by_phone: Dict[str, AgentEntry]
+    by_assistant: Dict[str, AgentEntry]
+    # id агентов, на которых не ведёт ни один маршрут
+    unreachable: FrozenSet[str] = frozenset()
+
+
+_EMPTY_INDEX = AgentIndex({}, {}, {})
+
+
+def _agent_fingerprint(agent: AgentConfig) -> str:
+    return hashlib.sha256(agent.model_dump_json().encode("utf-8")).hexdigest()
+
+
+class AgentRegistry:
+    """
+    Реестр агентов из config/agents.yaml.
+
+    Индексы по id, номеру телефона и id ассистента — обычные словари,
+    поэтому выбор агента стоит один-два поиска независимо от числа агентов.
+    Индекс заменяется целиком; при перезагрузке записи неизменённых агентов
+    (вместе с их готовыми ответами) переносятся как есть, пересобираются
+    только новые и изменённые.
+
+    Поддерживает тот же интерфейс, что ConfigStore (current/reload/watched_paths),
+    поэтому файл агентов отслеживается обычным ConfigWatcher.
+    """
+
+    def __init__(self, path: str = settings.AGENTS_CONFIG_PATH) -> None:
+        self.path = path
+        self._index: Optional[AgentIndex] = None
+        self._lock = threading.Lock()
+        self.builds = 0
+
+    def current(self) -> AgentIndex:
+        index = self._index
+        if index is None:
+            index = self.reload()
+        return index
+
+    def watched_paths(self) -> Tuple[str, ...]:
+        return (str(resolve_path(self.path)),)
+
+    def _read_agents(self) -> List[AgentConfig]:
+        path = resolve_path(self.path)
+        if not path.exists():
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            data = yaml.safe_load(f) or {}
+
+        agents = []
+        for raw in data.get("agents") or []:
+            try:
+                agents.append(AgentConfig(**raw))
+            except (TypeError, ValidationError) as e:
+                # Ошибка в одном агенте не должна отключать остальных
+                logger.error(f"Invalid agent definition {raw!r} in {path}: {e}")
+        return agents
+
+    def reload(self) -> AgentIndex:
+        with self._lock:
+            try:
+                agents = self._read_agents()
+            except Exception as e:
+                if self._index is None:
+                    self._index = _EMPTY_INDEX
+                logger.error(f"Agents reload failed, keeping last good registry: {e}")
+                return self._index
+
+            previous = self._index.by_id if self._index is not None else {}
+            by_id: Dict[str, AgentEntry] = {}
+            by_phone: Dict[str, AgentEntry] = {}
+            by_assistant: Dict[str, AgentEntry] = {}
+            fresh = []
+            for agent in agents:
+                if agent.id in by_id:
+                    logger.error(f"Duplicate agent id {agent.id}, keeping the first definition")
+                    continue
+                fingerprint = _agent_fingerprint(agent)
+                entry = previous.get(agent.id)
+                if entry is None or entry.fingerprint != fingerprint:
+                    entry = AgentEntry(agent, fingerprint)
+                    fresh.append(entry)
+                by_id[agent.id] = entry
+                routes = [(by_phone, normalize_number(number)) for number in agent.phone_numbers]
+                routes += [(by_assistant, assistant_id) for assistant_id in agent.assistant_ids]
+                for index, key in routes:
+                    if key and index.setdefault(key, entry) is not entry:
+                        logger.error(f"Route {key} of agent {agent.id} is already taken by {index[key].agent.id}")
+
+            routed = {entry.agent.id for entry in (*by_phone.values(), *by_assistant.values())}
+            unreachable = frozenset(by_id) - routed
+            for agent_id in sorted(unreachable):
+                logger.warning(f"Agent {agent_id} has no phone_numbers or assistant_ids of its own and will never be selected")
+
+            # Ответы новых и изменённых агентов собираем заранее, а не на первом звонке
+            base = get_current_config()
+            for entry in fresh:
+                try:
+                    entry.response(base)
+                except Exception as e:
+                    logger.error(f"Failed to precompile agent {entry.agent.id}: {e}")
+            self.builds += len(fresh)
+
+            self._index = AgentIndex(by_id, by_phone, by_assistant, unreachable)
+            logger.info(f"Agents loaded: {len(by_id)} total, {len(fresh)} rebuilt")
+            return self._index
+
+    def resolve(self, message: Dict[str, Any]) -> Optional[AgentEntry]:
+        """
+        Агент для сообщения VAPI: по id ассистента, затем по номеру, на который звонят.
+        """
+        index = self.current()
+        if not index.by_id:
+            return None
+        call = message.get("call") or {}
+        assistant_id = call.get("assistantId") or (message.get("assistant") or {}).get("id")
+        if assistant_id:
+            entry = index.by_assistant.get(assistant_id)
+            if entry is not None:
+                return entry
+        number = (message.get("phoneNumber") or {}).get("number") or (call.get("phoneNumber") or {}).get("number")
+        if number:
+            return index.by_phone.get(normalize_number(number))
+        return None
+
+    def get(self, agent_id: str) -> Optional[AgentEntry]:
+        return self.current().by_id.get(agent_id)
+
+
+agent_registry = AgentRegistry()
+
+
+def config_for_message(message: Dict[str, Any]) -> AppSettings:
+    """
+    Конфигурация, по которой обслуживается звонок: агента или основная.
+    """
+    base = get_current_config()
+    entry = agent_registry.resolve(message)
+    return entry.settings_for(base) if entry is not None else base
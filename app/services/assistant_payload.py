@@ -0,0 +1,116 @@
+import json
+import threading
+import uuid
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+from app.core.config import settings
+from app.core.config_loader import AppSettings, config_fingerprint
+from app.services.knowledge_base import KnowledgeBase, get_knowledge_base
+from app.services.prompt_builder import CompiledPrompt, call_values, compile_prompt
+from app.services.tools_registry import get_dynamic_tool_schema
+
+
+def build_assistant_payload(config: AppSettings, system_prompt: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Собирает ответ на assistant-request для VAPI на основе текущей конфигурации.
+    """
+    dynamic_fields = config.voice_settings.dynamic_fields
+    tools = [get_dynamic_tool_schema(dynamic_fields)] if dynamic_fields else []
+
+    model: Dict[str, Any] = {
+        "provider": "openai",
+        "model": "gpt-4-turbo",
+        "tools": tools
+    }
+    if system_prompt is not None:
+        model["messages"] = [{"role": "system", "content": system_prompt}]
+
+    return {"assistant": {"model": model}}
+
+
+class _Entry(NamedTuple):
+    config: AppSettings
+    key: Tuple[str, Any]
+    kb: Optional[KnowledgeBase]
+    kb_version: Any
+    head: bytes
+    prompt: CompiledPrompt
+    tail: bytes
+    # Готовое тело, если в промпте нет плейсхолдеров звонка
+    body: Optional[bytes]
+
+
+class AssistantResponseCache:
+    """
+    Кэш готового (уже сериализованного в JSON) ответа на assistant-request.
+
+    Ответ пересобирается только при смене конфигурации или версии индекса
+    базы знаний. Пока снимок конфигурации не заменён, проверка сводится
+    к сравнению ссылок; новый объект с тем же содержимым определяется по хэшу
+    и не вызывает пересборку.
+
+    Системный промпт хранится предкомпилированным: JSON до и после него
+    уже сериализован, на звонок подставляются только значения вроде номера звонящего.
+    """
+
+    def __init__(self, token_budget: Optional[int] = None) -> None:
+        # Запись заменяется целиком, чтобы читатели никогда не видели
+        # частично обновлённое состояние
+        self._entry: Optional[_Entry] = None
+        self._lock = threading.Lock()
+        self.token_budget = token_budget or settings.PROMPT_TOKEN_BUDGET
+        self.rebuilds = 0
+
+    def get(self, config: AppSettings, message: Optional[Dict[str, Any]] = None) -> bytes:
+        entry = self._entry
+        if entry is None or entry.config is not config or self._kb_changed(entry):
+            entry = self._refresh(config)
+
+        if entry.body is not None:
+            return entry.body
+        return entry.head + entry.prompt.render_json(call_values(message or {})) + entry.tail
+
+    @staticmethod
+    def _kb_changed(entry: _Entry) -> bool:
+        if entry.kb is None:
+            return False
+        entry.kb.refresh()
+        return entry.kb.version != entry.kb_version
+
+    def _refresh(self, config: AppSettings) -> _Entry:
+        kb = get_knowledge_base(config.knowledge_base_file) if config.knowledge_base_file else None
+        if kb is not None:
+            kb.refresh()
+        kb_version = kb.version if kb is not None else None
+        key = (config_fingerprint(config), kb_version)
+
+        with self._lock:
+            entry = self._entry
+            if entry is not None and entry.key == key:
+                entry = entry._replace(config=config)
+            else:
+                entry = self._build(config, key, kb, kb_version)
+                self.rebuilds += 1
+            self._entry = entry
+        return entry
+
+    def _build(self, config: AppSettings, key, kb: Optional[KnowledgeBase], kb_version) -> _Entry:
+        prompt = compile_prompt(config, kb if kb_version is not None else None, self.token_budget)
+
+        # Сериализуем ответ с уникальной меткой вместо промпта и режем по ней
+        sentinel = f"@@prompt-{uuid.uuid4().hex}@@"
+        serialized = json.dumps(
+            build_assistant_payload(config, system_prompt=sentinel),
+            ensure_ascii=False,
+            separators=(",", ":")
+        ).encode("utf-8")
+        head, tail = serialized.split(sentinel.encode("utf-8"))
+
+        body = head + prompt.render_json({}) + tail if prompt.is_static else None
+        return _Entry(config, key, kb, kb_version, head, prompt, tail, body)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entry = None
+
+
+assistant_response_cache = AssistantResponseCache()
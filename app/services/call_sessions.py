@@ -0,0 +1,215 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+from app.core.config import settings
+from app.services.caller_routing import caller_router
+
+# Ограничения на размер одной сессии: вместе с лимитом числа сессий они
+# задают жёсткий потолок памяти хранилища
+MAX_TURN_CHARS = 1000
+MAX_FIELDS = 64
+MAX_FIELD_CHARS = 500
+
+
+class CallSession:
+    """
+    Состояние одного звонка между вебхуками: последние реплики (кольцевой
+    буфер), собранные поля и тайминги.
+
+    touched — монотонное время последнего обращения, только для TTL.
+    started_at, last_seen, ended_at и время реплик — unix-время, их видит API.
+    """
+
+    __slots__ = (
+        "call_id", "customer_number", "tier", "status", "touched", "started_at", "last_seen",
+        "ended_at", "messages", "turns", "fields"
+    )
+
+    # Реплики одного звонка добавляют разные фоновые воркеры
+    _turns_lock = threading.Lock()
+
+    def __init__(self, call_id: str, now: float, max_turns: int, wall_time: Optional[float] = None) -> None:
+        self.call_id = call_id
+        self.customer_number: Optional[str] = None
+        self.tier: Optional[str] = None
+        self.status: Optional[str] = None
+        self.touched = now
+        self.started_at = time.time() if wall_time is None else wall_time
+        self.last_seen = self.started_at
+        self.ended_at: Optional[float] = None
+        self.messages = 0
+        # (время, роль, текст) по возрастанию времени; старые реплики вытесняются автоматически
+        self.turns: Deque[Tuple[float, str, str]] = deque(maxlen=max_turns)
+        self.fields: Dict[str, str] = {}
+
+    def add_turn(self, role: str, text: str, at: float) -> None:
+        """
+        Добавляет реплику с её собственным временем. Воркеры могут обработать
+        вебхуки не по порядку, поэтому опоздавшая реплика встаёт на своё место.
+        """
+        turn = (at, role, text[:MAX_TURN_CHARS])
+        with self._turns_lock:
+            turns = self.turns
+            if not turns or turns[-1][0] <= at:
+                turns.append(turn)
+                return
+            full = len(turns) == turns.maxlen
+            if full and at < turns[0][0]:
+                # Старше всего, что хранится в буфере: она и так была бы вытеснена
+                return
+            index = len(turns)
+            while index and turns[index - 1][0] > at:
+                index -= 1
+            if full:
+                turns.popleft()
+                index -= 1
+            turns.insert(index, turn)
+
+    def update_fields(self, values: Dict[str, Any]) -> None:
+        for name, value in values.items():
+            if name not in self.fields and len(self.fields) >= MAX_FIELDS:
+                continue
+            self.fields[name] = str(value)[:MAX_FIELD_CHARS]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "call_id": self.call_id,
+            "customer_number": self.customer_number,
+            "tier": self.tier,
+            "status": self.status,
+            "started_at": self.started_at,
+            "last_seen": self.last_seen,
+            "ended_at": self.ended_at,
+            "messages": self.messages,
+            "turns": [{"time": t, "role": role, "text": text} for t, role, text in self.turns],
+            "fields": dict(self.fields),
+        }
+
+
+class CallSessionStore:
+    """
+    Сессии звонков по call id.
+
+    Словарь упорядочен по последнему обращению: доступ O(1), а простаивающие
+    сессии всегда в начале, поэтому вытеснение по TTL снимает их с головы без
+    обхода. При превышении max_sessions вытесняется самая давняя сессия.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 5000,
+        ttl: float = 900.0,
+        max_turns: int = 20,
+        clock: Callable[[], float] = time.monotonic,
+        wall_clock: Callable[[], float] = time.time
+    ) -> None:
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_turns = max_turns
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self._sessions: "OrderedDict[str, CallSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted_ttl = 0
+        self.evicted_capacity = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _evict_expired(self, now: float) -> None:
+        sessions = self._sessions
+        while sessions:
+            call_id, session = next(iter(sessions.items()))
+            if now - session.touched < self.ttl:
+                return
+            del sessions[call_id]
+            self.evicted_ttl += 1
+
+    def get(self, call_id: str) -> Optional[CallSession]:
+        """Сессия без продления; None, если её нет или она истекла."""
+        with self._lock:
+            session = self._sessions.get(call_id)
+            if session is not None and self.clock() - session.touched >= self.ttl:
+                del self._sessions[call_id]
+                self.evicted_ttl += 1
+                return None
+            return session
+
+    def touch(self, call_id: str) -> CallSession:
+        """
+        Возвращает сессию звонка (создаёт при необходимости) и отмечает активность.
+        """
+        now = self.clock()
+        with self._lock:
+            self._evict_expired(now)
+            session = self._sessions.get(call_id)
+            if session is None:
+                session = CallSession(call_id, now, self.max_turns, self.wall_clock())
+                self._sessions[call_id] = session
+                if len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.evicted_capacity += 1
+            else:
+                self._sessions.move_to_end(call_id)
+            session.touched = now
+            session.last_seen = self.wall_clock()
+            session.messages += 1
+            return session
+
+    def end(self, call_id: str) -> Optional[CallSession]:
+        """Завершает звонок и убирает его сессию из хранилища."""
+        with self._lock:
+            session = self._sessions.pop(call_id, None)
+        if session is not None:
+            session.ended_at = self.wall_clock()
+        return session
+
+    def evict_expired(self) -> None:
+        with self._lock:
+            self._evict_expired(self.clock())
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "evicted_ttl": self.evicted_ttl,
+            "evicted_capacity": self.evicted_capacity,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sessions.clear()
+
+
+def message_timestamp(message: Dict[str, Any], default: float) -> float:
+    """
+    Время события из поля timestamp сообщения VAPI (unix-время в миллисекундах).
+    """
+    value = message.get("timestamp")
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0:
+        # Секунды тоже принимаем: в миллисекундах любое время после 1973 года больше 1e11
+        return value / 1000 if value > 1e11 else float(value)
+    return default
+
+
+def message_session(message: Dict[str, Any]) -> Optional[CallSession]:
+    """
+    Сессия звонка, к которому относится сообщение VAPI (None без call id).
+    """
+    call = message.get("call") or {}
+    call_id = call.get("id")
+    if not call_id:
+        return None
+    session = call_sessions.touch(str(call_id))
+    if session.customer_number is None:
+        session.customer_number = (call.get("customer") or {}).get("number")
+        session.tier = caller_router.classify(session.customer_number)
+    return session
+
+
+call_sessions = CallSessionStore(
+    max_sessions=settings.CALL_SESSION_MAX,
+    ttl=settings.CALL_SESSION_TTL,
+    max_turns=settings.CALL_SESSION_TURNS
+)
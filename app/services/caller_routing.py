@@ -0,0 +1,221 @@
+import re
+import threading
+from functools import lru_cache
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Tuple
+from app.core.config import settings
+from app.core.config_loader import resolve_path
+from app.core.logger import logger
+
+BLOCKED = "blocked"
+VIP = "vip"
+REGULAR = "regular"
+
+_NON_DIGITS = re.compile(r"\D")
+# Номер звонящего прямо из сырого тела вебхука (объект customer плоский)
+_CUSTOMER_NUMBER_RE = re.compile(rb'"customer"\s*:\s*\{[^{}]*?"number"\s*:\s*"([^"\\]{1,32})"')
+
+# Национальный префикс выхода на междугороднюю связь для кода страны; по умолчанию 0
+_TRUNK_PREFIXES = {"7": "8"}
+# Длина национального номера, к которому дописывается код страны
+_NATIONAL_LENGTH = 10
+
+_TERMINAL = ""
+
+
+def _normalize(raw: str, country_code: str, partial: bool = False) -> Optional[str]:
+    raw = raw.strip()
+    digits = _NON_DIGITS.sub("", raw)
+    if not digits:
+        return None
+    if raw.startswith("+"):
+        pass
+    elif raw.startswith("00"):
+        digits = digits[2:]
+    else:
+        trunk = _TRUNK_PREFIXES.get(country_code, "0")
+        if digits.startswith(trunk) and (partial or len(digits) == _NATIONAL_LENGTH + len(trunk)):
+            digits = country_code + digits[len(trunk):]
+        elif partial or len(digits) <= _NATIONAL_LENGTH:
+            digits = country_code + digits
+    # E.164: не больше 15 цифр; слишком короткие номера считаем мусором
+    if len(digits) > 15 or (not partial and len(digits) < 7):
+        return None
+    return f"+{digits}"
+
+
+@lru_cache(maxsize=65536)
+def normalize_e164(number: str, country_code: str = settings.DEFAULT_COUNTRY_CODE) -> Optional[str]:
+    """
+    Приводит номер к E.164 (+<код страны><номер>). None, если это не номер.
+    Результат кэшируется: одни и те же номера звонят снова и снова.
+    """
+    return _normalize(number, country_code)
+
+
+class NumberList:
+    """
+    Список номеров: точные номера в хэш-множестве и диапазоны (префиксы)
+    в префиксном дереве. Проверка — один поиск в множестве и проход по дереву
+    не глубже самого длинного совпадающего префикса.
+    """
+
+    __slots__ = ("exact", "trie", "prefixes")
+
+    def __init__(self, exact: Iterable[str] = (), prefixes: Iterable[str] = ()) -> None:
+        self.exact = frozenset(exact)
+        self.trie: Dict[str, Any] = {}
+        self.prefixes = 0
+        for prefix in prefixes:
+            node = self.trie
+            for ch in prefix:
+                node = node.setdefault(ch, {})
+            node[_TERMINAL] = True
+            self.prefixes += 1
+
+    def __contains__(self, number: str) -> bool:
+        if number in self.exact:
+            return True
+        node = self.trie
+        for ch in number:
+            node = node.get(ch)
+            if node is None:
+                return False
+            if _TERMINAL in node:
+                return True
+        return False
+
+    def __len__(self) -> int:
+        return len(self.exact) + self.prefixes
+
+    @classmethod
+    def parse(cls, lines: Iterable[str], country_code: str) -> "NumberList":
+        """
+        Строки вида «номер» или «префикс*»; пустые строки и # комментарии пропускаются.
+        """
+        exact, prefixes = set(), []
+        for line in lines:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            is_prefix = line.endswith("*")
+            number = _normalize(line.rstrip("*"), country_code, partial=is_prefix)
+            if number is None:
+                logger.warning(f"Skipping invalid number rule: {line}")
+            elif is_prefix:
+                prefixes.append(number)
+            else:
+                exact.add(number)
+        return cls(exact, prefixes)
+
+
+class RoutingTables(NamedTuple):
+    vip: NumberList
+    blacklist: NumberList
+
+
+def _read_lines(file_path: str) -> Tuple[str, ...]:
+    path = resolve_path(file_path)
+    if not path.exists():
+        return ()
+    return tuple(path.read_text(encoding="utf-8").splitlines())
+
+
+class CallerRouter:
+    """
+    Классификация звонящих: заблокированные, VIP и обычные.
+
+    Таблицы строятся из списков в окружении и файлов и заменяются целиком;
+    чтение идёт без блокировок. Реализует интерфейс ConfigStore
+    (current/reload/watched_paths), поэтому файлы перечитываются ConfigWatcher
+    в его потоке, не задерживая запросы.
+    """
+
+    def __init__(
+        self,
+        vip_file: Optional[str] = settings.VIP_NUMBERS_FILE,
+        blacklist_file: Optional[str] = settings.BLACKLIST_NUMBERS_FILE,
+        vip_numbers: Iterable[str] = settings.VIP_NUMBERS,
+        blacklist_numbers: Iterable[str] = settings.BLACKLIST_NUMBERS,
+        country_code: str = settings.DEFAULT_COUNTRY_CODE
+    ) -> None:
+        self.vip_file = vip_file
+        self.blacklist_file = blacklist_file
+        self.vip_numbers = tuple(vip_numbers)
+        self.blacklist_numbers = tuple(blacklist_numbers)
+        self.country_code = country_code
+        self._tables: Optional[RoutingTables] = None
+        self._lock = threading.Lock()
+        self.blocked = 0
+        self.vip_messages = 0
+
+    def current(self) -> RoutingTables:
+        tables = self._tables
+        if tables is None:
+            tables = self.reload()
+        return tables
+
+    def watched_paths(self) -> Tuple[str, ...]:
+        return tuple(str(resolve_path(f)) for f in (self.vip_file, self.blacklist_file) if f)
+
+    def reload(self) -> RoutingTables:
+        with self._lock:
+            try:
+                vip_lines = self.vip_numbers + (_read_lines(self.vip_file) if self.vip_file else ())
+                blacklist_lines = self.blacklist_numbers + (_read_lines(self.blacklist_file) if self.blacklist_file else ())
+                tables = RoutingTables(
+                    vip=NumberList.parse(vip_lines, self.country_code),
+                    blacklist=NumberList.parse(blacklist_lines, self.country_code)
+                )
+            except Exception as e:
+                if self._tables is None:
+                    self._tables = RoutingTables(NumberList(), NumberList())
+                logger.error(f"Caller lists reload failed, keeping last good lists: {e}")
+                return self._tables
+
+            self._tables = tables
+            logger.info(f"Caller lists loaded: {len(tables.vip)} VIP rules, {len(tables.blacklist)} blacklist rules")
+            return tables
+
+    def classify(self, number: Optional[str]) -> str:
+        """BLOCKED, VIP или REGULAR."""
+        if not number:
+            return REGULAR
+        normalized = normalize_e164(number, self.country_code)
+        if normalized is None:
+            return REGULAR
+        tables = self.current()
+        if normalized in tables.blacklist:
+            return BLOCKED
+        if normalized in tables.vip:
+            return VIP
+        return REGULAR
+
+    def record(self, tier: str) -> None:
+        """Учитывает в статистике результат классификации входящего вебхука."""
+        if tier == BLOCKED:
+            self.blocked += 1
+        elif tier == VIP:
+            self.vip_messages += 1
+
+    def stats(self) -> Dict[str, int]:
+        tables = self.current()
+        return {
+            "vip_rules": len(tables.vip),
+            "blacklist_rules": len(tables.blacklist),
+            "blocked": self.blocked,
+            "vip_messages": self.vip_messages,
+        }
+
+
+def caller_from_body(body: bytes) -> Optional[str]:
+    """Номер звонящего без разбора JSON; None, если его не удалось найти."""
+    match = _CUSTOMER_NUMBER_RE.search(body)
+    return match.group(1).decode("utf-8", "replace") if match else None
+
+
+def caller_from_message(message: Dict[str, Any]) -> Optional[str]:
+    customer = (message.get("call") or {}).get("customer") or message.get("customer") or {}
+    return customer.get("number")
+
+
+caller_router = CallerRouter()
@@ -0,0 +1,471 @@
+import hashlib
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from app.core.config import settings
+from app.core.config_loader import resolve_path
+from app.core.logger import logger
+from app.core.metrics import timed
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+FORMAT_VERSION = 1
+SEGMENT_MAGIC = b"KBS1"
+
+# Чанк — абзац; слишком длинные абзацы режутся по пробелам
+MAX_CHUNK_CHARS = 1200
+# Границы сегментов определяются содержимым чанков (content-defined),
+# поэтому правка в начале файла не сдвигает все последующие сегменты
+MIN_SEGMENT_CHUNKS = 256
+AVG_SEGMENT_CHUNKS = 1024
+MAX_SEGMENT_CHUNKS = 4096
+
+# Параметры BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_TOKEN_RE = re.compile(r"\w+")
+
+_HEADER = struct.Struct("<4sIIII")   # magic, chunks, terms, blob_len, postings
+_CHUNK = struct.Struct("<III")       # text_offset, text_length, token_count
+_TERM = struct.Struct("<IIII")       # blob_offset, blob_length, postings_start, df
+_POSTING = struct.Struct("<II")      # chunk_index, tf
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def split_chunks(text: str) -> List[str]:
+    """
+    Делит текст на чанки по абзацам. Границы зависят только от содержимого
+    абзацев, а не от их позиции в файле.
+    """
+    chunks = []
+    for paragraph in _PARAGRAPH_RE.split(text):
+        paragraph = paragraph.strip()
+        while len(paragraph) > MAX_CHUNK_CHARS:
+            cut = paragraph.rfind(" ", 0, MAX_CHUNK_CHARS)
+            if cut <= 0:
+                cut = MAX_CHUNK_CHARS
+            chunks.append(paragraph[:cut].strip())
+            paragraph = paragraph[cut:].strip()
+        if paragraph:
+            chunks.append(paragraph)
+    return chunks
+
+
+def _group_segments(chunks: List[str]) -> List[List[str]]:
+    segments: List[List[str]] = []
+    current: List[str] = []
+    for chunk in chunks:
+        current.append(chunk)
+        if len(current) < MIN_SEGMENT_CHUNKS:
+            continue
+        fingerprint = int.from_bytes(hashlib.blake2b(chunk.encode("utf-8"), digest_size=4).digest(), "little")
+        if fingerprint % AVG_SEGMENT_CHUNKS == 0 or len(current) >= MAX_SEGMENT_CHUNKS:
+            segments.append(current)
+            current = []
+    if current:
+        segments.append(current)
+    return segments
+
+
+def _segment_digest(chunks: List[str]) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"v{FORMAT_VERSION}".encode())
+    for chunk in chunks:
+        digest.update(chunk.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def _encode_segment(chunks: List[str]) -> bytes:
+    """
+    Сериализует сегмент: заголовок, таблица чанков, таблица терминов
+    (отсортированы по байтам для бинарного поиска), блоб терминов, постинги и тексты чанков.
+    """
+    postings: Dict[bytes, List[Tuple[int, int]]] = {}
+    chunk_table = array("I")
+    texts = []
+    text_offset = 0
+    for index, chunk in enumerate(chunks):
+        tokens = tokenize(chunk)
+        for term, tf in Counter(tokens).items():
+            postings.setdefault(term.encode("utf-8"), []).append((index, tf))
+        encoded = chunk.encode("utf-8")
+        texts.append(encoded)
+        chunk_table.extend((text_offset, len(encoded), len(tokens)))
+        text_offset += len(encoded)
+
+    term_table = array("I")
+    blob = bytearray()
+    posting_data = array("I")
+    for term in sorted(postings):
+        entries = postings[term]
+        term_table.extend((len(blob), len(term), len(posting_data) // 2, len(entries)))
+        blob += term
+        for chunk_index, tf in entries:
+            posting_data.extend((chunk_index, tf))
+
+    header = _HEADER.pack(SEGMENT_MAGIC, len(chunks), len(postings), len(blob), len(posting_data) // 2)
+    return b"".join([
+        header,
+        chunk_table.tobytes(),
+        term_table.tobytes(),
+        bytes(blob),
+        posting_data.tobytes(),
+        *texts,
+    ])
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    # Уникальное временное имя: несколько воркеров могут писать в один каталог индекса
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+@contextmanager
+def _index_lock(index_dir: Path) -> Iterator[None]:
+    """
+    Межпроцессная блокировка каталога индекса: сборку и удаление сегментов
+    одновременно выполняет только один воркер. Без fcntl (Windows) — без блокировки.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(index_dir / ".lock", "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class Segment:
+    """
+    Неизменяемый сегмент индекса, отображённый в память.
+    Все таблицы читаются прямо из mmap без копирования в кучу Python.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.n_chunks, self.n_terms, blob_len, n_postings = _HEADER.unpack_from(self._mm, 0)
+        if magic != SEGMENT_MAGIC:
+            raise ValueError(f"Not a knowledge base segment: {path}")
+
+        view = memoryview(self._mm)
+        offset = _HEADER.size
+        self._chunks = view[offset:offset + self.n_chunks * _CHUNK.size].cast("I")
+        offset += self.n_chunks * _CHUNK.size
+        self._terms = view[offset:offset + self.n_terms * _TERM.size].cast("I")
+        offset += self.n_terms * _TERM.size
+        self._blob_offset = offset
+        offset += blob_len
+        self._postings = view[offset:offset + n_postings * _POSTING.size].cast("I")
+        offset += n_postings * _POSTING.size
+        self._text_offset = offset
+        self.total_tokens = sum(self._chunks[i * 3 + 2] for i in range(self.n_chunks))
+
+    def _term_at(self, index: int) -> bytes:
+        start = self._blob_offset + self._terms[index * 4]
+        return self._mm[start:start + self._terms[index * 4 + 1]]
+
+    def lookup(self, term: bytes) -> Optional[Tuple[int, int]]:
+        """
+        Бинарный поиск термина. Возвращает (начало постингов, df) или None.
+        """
+        lo, hi = 0, self.n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term_at(mid) < term:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.n_terms and self._term_at(lo) == term:
+            return self._terms[lo * 4 + 2], self._terms[lo * 4 + 3]
+        return None
+
+    def postings(self, start: int, df: int):
+        return self._postings[start * 2:(start + df) * 2]
+
+    @property
+    def chunk_table(self):
+        """Плоская таблица чанков: [text_offset, text_length, token_count] * n_chunks."""
+        return self._chunks
+
+    def chunk_text(self, index: int) -> str:
+        start = self._text_offset + self._chunks[index * 3]
+        return self._mm[start:start + self._chunks[index * 3 + 1]].decode("utf-8")
+
+    def close(self) -> None:
+        self._chunks.release()
+        self._terms.release()
+        self._postings.release()
+        try:
+            self._mm.close()
+        except BufferError:
+            # На сегмент ещё ссылается выполняющийся запрос — закроется сборщиком мусора
+            pass
+
+
+@dataclass
+class KnowledgeChunk:
+    score: float
+    text: str
+
+
+class _IndexSnapshot:
+    """
+    Набор сегментов, из которых состоит текущая версия индекса.
+    Заменяется целиком при пересборке, поэтому запросы читают его без блокировок.
+    """
+
+    def __init__(self, segments: List[Segment], signature: Tuple[int, int]) -> None:
+        self.segments = segments
+        self.signature = signature
+        self.n_chunks = sum(segment.n_chunks for segment in segments)
+        total_tokens = sum(segment.total_tokens for segment in segments)
+        self.avgdl = total_tokens / self.n_chunks if self.n_chunks else 0.0
+
+
+class KnowledgeBase:
+    """
+    Поиск по базе знаний с on-disk инвертированным индексом (BM25).
+
+    Файл делится на чанки-абзацы, чанки — на сегменты с границами, зависящими
+    от содержимого. Каждый сегмент — отдельный неизменяемый файл, названный
+    по хэшу содержимого, поэтому при изменении базы знаний пересобираются
+    только затронутые сегменты. Сегменты читаются через mmap.
+    """
+
+    def __init__(self, source: Path, index_dir: Path, check_interval: float = 1.0) -> None:
+        self.source = Path(source)
+        self.index_dir = Path(index_dir)
+        self.check_interval = check_interval
+        self._snapshot: Optional[_IndexSnapshot] = None
+        self._build_lock = threading.Lock()
+        self._rebuilding = False
+        self._last_check = 0.0
+        self.segments_built = 0
+        self.segments_reused = 0
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.index_dir / "manifest.json"
+
+    def _source_signature(self) -> Tuple[int, int]:
+        st = os.stat(self.source)
+        return st.st_mtime_ns, st.st_size
+
+    def _load_manifest(self, signature: Tuple[int, int]) -> Optional[_IndexSnapshot]:
+        try:
+            manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+            if manifest.get("version") != FORMAT_VERSION or tuple(manifest["signature"]) != signature:
+                return None
+            return _IndexSnapshot([Segment(self.index_dir / name) for name in manifest["segments"]], signature)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def build(self) -> bool:
+        """
+        Приводит индекс в соответствие с файлом. Возвращает True, если индекс изменился.
+        Несменившиеся сегменты переиспользуются с диска.
+        """
+        with self._build_lock:
+            signature = self._source_signature()
+            if self._snapshot is not None and self._snapshot.signature == signature:
+                return False
+
+            self.index_dir.mkdir(parents=True, exist_ok=True)
+            with _index_lock(self.index_dir):
+                # Пока ждали блокировку, индекс мог собрать другой воркер
+                snapshot = self._load_manifest(signature)
+                if snapshot is None:
+                    snapshot = self._rebuild(signature)
+
+            # Старые сегменты не закрываем явно: их может дочитывать идущий запрос,
+            # mmap освободится вместе с последней ссылкой на снимок
+            self._snapshot = snapshot
+            return True
+
+    @timed("knowledge_build")
+    def _rebuild(self, signature: Tuple[int, int]) -> _IndexSnapshot:
+        started = time.perf_counter()
+        text = self.source.read_text(encoding="utf-8", errors="replace")
+
+        names = []
+        built = reused = 0
+        for chunks in _group_segments(split_chunks(text)):
+            name = f"seg-{_segment_digest(chunks)}.bin"
+            path = self.index_dir / name
+            if path.exists():
+                reused += 1
+            else:
+                _write_atomic(path, _encode_segment(chunks))
+                built += 1
+            names.append(name)
+
+        manifest = {"version": FORMAT_VERSION, "signature": list(signature), "segments": names}
+        _write_atomic(self.manifest_path, json.dumps(manifest).encode("utf-8"))
+
+        # Удаляем сегменты, на которые больше не ссылается манифест. Это безопасно
+        # под блокировкой каталога: другие воркеры открывают сегменты только под ней,
+        # а уже отображённые в память файлы переживают unlink
+        live = set(names)
+        for path in self.index_dir.glob("seg-*.bin"):
+            if path.name not in live:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+        self.segments_built += built
+        self.segments_reused += reused
+        logger.info(
+            f"Knowledge base index updated for {self.source.name}: "
+            f"{built} segments built, {reused} reused in {time.perf_counter() - started:.2f}s"
+        )
+        return _IndexSnapshot([Segment(self.index_dir / name) for name in names], signature)
+
+    def refresh(self) -> None:
+        """
+        Дешёвая проверка изменений файла (не чаще check_interval).
+        Пересборка идёт в фоновом потоке; до её окончания запросы обслуживает старый индекс.
+        """
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval or self._rebuilding:
+            return
+        self._last_check = now
+
+        try:
+            signature = self._source_signature()
+        except OSError:
+            return
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.signature == signature:
+            return
+
+        self._rebuilding = True
+
+        def rebuild():
+            try:
+                self.build()
+            except Exception as e:
+                logger.error(f"Knowledge base rebuild failed for {self.source}: {e}")
+            finally:
+                self._rebuilding = False
+
+        threading.Thread(target=rebuild, name="kb-indexer", daemon=True).start()
+
+    @property
+    def ready(self) -> bool:
+        return self._snapshot is not None
+
+    @property
+    def version(self) -> Optional[Tuple[int, int]]:
+        """Версия индекса (сигнатура исходного файла) или None, пока индекс не готов."""
+        snapshot = self._snapshot
+        return snapshot.signature if snapshot is not None else None
+
+    @timed("knowledge_search")
+    def search(self, query: str, k: int = 3) -> List[KnowledgeChunk]:
+        """
+        Top-k чанков по BM25. Пока индекс не построен, возвращает пустой список.
+        """
+        self.refresh()
+        snapshot = self._snapshot
+        if snapshot is None or not snapshot.avgdl:
+            return []
+
+        terms = {term.encode("utf-8") for term in tokenize(query)}
+        if not terms:
+            return []
+
+        # Глобальный df термина — сумма по сегментам
+        hits: Dict[bytes, List[Tuple[Segment, int, int]]] = {}
+        for term in terms:
+            for segment in snapshot.segments:
+                found = segment.lookup(term)
+                if found is not None:
+                    hits.setdefault(term, []).append((segment, found[0], found[1]))
+
+        n, avgdl = snapshot.n_chunks, snapshot.avgdl
+        # BM25: tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl)), константы вынесены из цикла
+        k1_plus_1 = BM25_K1 + 1
+        norm_base = BM25_K1 * (1 - BM25_B)
+        norm_scale = BM25_K1 * BM25_B / avgdl
+        scores: Dict[Tuple[int, int], float] = {}
+        for term, locations in hits.items():
+            df = sum(location[2] for location in locations)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for segment, start, count in locations:
+                postings = segment.postings(start, count)
+                chunk_table = segment.chunk_table
+                seg_id = id(segment)
+                for i in range(0, len(postings), 2):
+                    chunk_index, tf = postings[i], postings[i + 1]
+                    dl = chunk_table[chunk_index * 3 + 2]
+                    key = (seg_id, chunk_index)
+                    scores[key] = scores.get(key, 0.0) + idf * tf * k1_plus_1 / (tf + norm_base + norm_scale * dl)
+                postings.release()
+
+        segments_by_id = {id(segment): segment for segment in snapshot.segments}
+        top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [
+            KnowledgeChunk(score=score, text=segments_by_id[seg_id].chunk_text(chunk_index))
+            for (seg_id, chunk_index), score in top
+        ]
+
+    def close(self) -> None:
+        snapshot, self._snapshot = self._snapshot, None
+        if snapshot is not None:
+            for segment in snapshot.segments:
+                segment.close()
+
+
+_engines: Dict[Path, KnowledgeBase] = {}
+_engines_lock = threading.Lock()
+
+
+def get_knowledge_base(file_path: str) -> KnowledgeBase:
+    """
+    Движок базы знаний для файла из конфигурации (один на файл).
+    Первое обращение запускает построение индекса в фоне.
+    """
+    source = resolve_path(file_path)
+    engine = _engines.get(source)
+    if engine is None:
+        with _engines_lock:
+            engine = _engines.get(source)
+            if engine is None:
+                key = hashlib.sha1(str(source).encode("utf-8")).hexdigest()[:16]
+                engine = KnowledgeBase(source, resolve_path(settings.KB_INDEX_DIR) / key)
+                _engines[source] = engine
+    return engine
@@ -0,0 +1,269 @@
+import json
+import os
+import sys
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from app.services import log_reader
+from app.services.log_reader import parse_log_entry
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".idx"
+BUCKET_SECONDS = 60
+DEFAULT_LIMIT = 200
+
+
+@dataclass
+class BucketRun:
+    """
+    Непрерывный участок сегмента, все записи которого попадают в один временной бакет.
+    end — смещение сразу за последней строкой участка.
+    """
+    bucket: int
+    start: int
+    end: int
+    levels: Dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class SegmentIndex:
+    """
+    Разреженный индекс одного сегмента лога: бакеты времени -> байтовые смещения
+    и количество записей каждого уровня в бакете.
+    """
+    path: Path
+    size: int = 0
+    mtime_ns: int = 0
+    runs: List[BucketRun] = field(default_factory=list)
+
+    @property
+    def first_ts(self) -> Optional[int]:
+        return min((run.bucket for run in self.runs), default=None)
+
+    @property
+    def last_ts(self) -> Optional[int]:
+        last = max((run.bucket for run in self.runs), default=None)
+        return None if last is None else last + BUCKET_SECONDS
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "version": INDEX_VERSION,
+            "bucket_seconds": BUCKET_SECONDS,
+            "size": self.size,
+            "mtime_ns": self.mtime_ns,
+            "runs": [[run.bucket, run.start, run.end, run.levels] for run in self.runs],
+        }
+
+    @classmethod
+    def from_json(cls, path: Path, data: Dict[str, Any]) -> Optional["SegmentIndex"]:
+        if data.get("version") != INDEX_VERSION or data.get("bucket_seconds") != BUCKET_SECONDS:
+            return None
+        return cls(
+            path=path,
+            size=data["size"],
+            mtime_ns=data["mtime_ns"],
+            runs=[BucketRun(bucket, start, end, levels) for bucket, start, end, levels in data["runs"]],
+        )
+
+
+def _record_meta(line: bytes) -> Optional[Tuple[float, str]]:
+    try:
+        entry = json.loads(line)
+        if "record" in entry:
+            record = entry["record"]
+            return record["time"]["timestamp"], record["level"]["name"]
+        # Компактная схема
+        return entry["ts"], entry["level"]
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def _extend_index(index: SegmentIndex) -> None:
+    """
+    Дочитывает сегмент от уже проиндексированного смещения до конца.
+    Используется и для полной сборки закрытого сегмента, и для инкрементального
+    обновления активного файла.
+    """
+    with open(index.path, "rb") as f:
+        f.seek(index.size)
+        position = index.size
+        current = index.runs[-1] if index.runs else None
+        for line in f:
+            if not line.endswith(b"\n"):
+                # Строка ещё дописывается — вернёмся к ней в следующий раз
+                break
+            line_start = position
+            position += len(line)
+            meta = _record_meta(line)
+            if meta is None:
+                continue
+            ts, level = meta
+            bucket = int(ts) // BUCKET_SECONDS * BUCKET_SECONDS
+            if current is None or current.bucket != bucket:
+                current = BucketRun(bucket=bucket, start=line_start, end=position)
+                index.runs.append(current)
+            current.end = position
+            current.levels[level] = current.levels.get(level, 0) + 1
+        index.size = position
+
+
+def index_path_for(segment: Path) -> Path:
+    return segment.with_name(segment.name + INDEX_SUFFIX)
+
+
+def build_segment_index(segment: Path) -> SegmentIndex:
+    """
+    Строит индекс закрытого сегмента и сохраняет его рядом с ним (<segment>.idx).
+    """
+    segment = Path(segment)
+    index = SegmentIndex(path=segment, mtime_ns=segment.stat().st_mtime_ns)
+    _extend_index(index)
+
+    sidecar = index_path_for(segment)
+    tmp = sidecar.with_name(sidecar.name + ".tmp")
+    tmp.write_text(json.dumps(index.to_json(), separators=(",", ":")), encoding="utf-8")
+    os.replace(tmp, sidecar)
+    return index
+
+
+def index_rotated_segment(path: str, live_file: Optional[str] = None) -> None:
+    """
+    Хук ротации Loguru (параметр compression): индексирует только что закрытый сегмент
+    в фоновом потоке, чтобы не задерживать запись лога.
+
+    Loguru вызывает compression и при закрытии sink'а (logger.remove()) — с путём
+    активного файла. Его не индексируем: файл продолжит расти.
+    """
+    if live_file is not None and os.path.abspath(path) == os.path.abspath(live_file):
+        return
+
+    def build():
+        try:
+            build_segment_index(Path(path))
+        except Exception as e:
+            # stderr, чтобы не зациклить логирование
+            print(f"[Log Index] Failed to index {path}: {e}", file=sys.stderr)
+
+    threading.Thread(target=build, name="log-indexer", daemon=True).start()
+
+
+class LogIndex:
+    """
+    Индекс по всем сохранённым сегментам лога: закрытым (app.<дата>.json)
+    и активному (app.json).
+
+    Индексы закрытых сегментов читаются из sidecar-файлов (и строятся, если их нет),
+    индекс активного сегмента держится в памяти и дочитывается по мере роста файла.
+    """
+
+    def __init__(self, log_file: Optional[Path] = None) -> None:
+        self._log_file = log_file
+        self._segments: Dict[Path, SegmentIndex] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def log_file(self) -> Path:
+        return self._log_file or log_reader.LOG_FILE
+
+    def segment_paths(self) -> List[Path]:
+        log_file = self.log_file
+        pattern = f"{log_file.stem}.*{log_file.suffix}"
+        closed = [p for p in log_file.parent.glob(pattern) if p != log_file]
+        if log_file.exists():
+            closed.append(log_file)
+        return closed
+
+    def _load_closed(self, segment: Path) -> SegmentIndex:
+        stat = segment.stat()
+        sidecar = index_path_for(segment)
+        try:
+            index = SegmentIndex.from_json(segment, json.loads(sidecar.read_text(encoding="utf-8")))
+            if index is not None and index.size == stat.st_size and index.mtime_ns == stat.st_mtime_ns:
+                return index
+        except (OSError, ValueError, KeyError):
+            pass
+        return build_segment_index(segment)
+
+    def _refresh(self) -> List[SegmentIndex]:
+        with self._lock:
+            indexes = []
+            active = self.log_file
+            for segment in self.segment_paths():
+                try:
+                    stat = segment.stat()
+                except OSError:
+                    continue
+                index = self._segments.get(segment)
+                if segment == active:
+                    # Активный файл ротировали (стал меньше) — начинаем заново
+                    if index is None or stat.st_size < index.size:
+                        index = SegmentIndex(path=segment)
+                    if stat.st_size > index.size:
+                        _extend_index(index)
+                    index.mtime_ns = stat.st_mtime_ns
+                elif index is None or index.size != stat.st_size:
+                    index = self._load_closed(segment)
+                self._segments[segment] = index
+                indexes.append(index)
+
+            # Забываем сегменты, удалённые ретеншеном
+            live = {index.path for index in indexes}
+            for path in list(self._segments):
+                if path not in live:
+                    del self._segments[path]
+
+        indexes.sort(key=lambda index: index.first_ts if index.first_ts is not None else float("inf"))
+        return indexes
+
+    def query(
+        self,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        level: Optional[str] = None,
+        limit: int = DEFAULT_LIMIT
+    ) -> List[Dict[str, Any]]:
+        """
+        Записи в диапазоне времени [start, end) с опциональным фильтром уровня.
+        Читаются только участки сегментов, чьи бакеты пересекают диапазон
+        и содержат записи нужного уровня.
+        """
+        level = level.upper() if level else None
+        results: List[Dict[str, Any]] = []
+
+        for index in self._refresh():
+            if start is not None and index.last_ts is not None and index.last_ts <= start:
+                continue
+            if end is not None and index.first_ts is not None and index.first_ts >= end:
+                continue
+
+            with open(index.path, "rb") as f:
+                for run in index.runs:
+                    if start is not None and run.bucket + BUCKET_SECONDS <= start:
+                        continue
+                    if end is not None and run.bucket >= end:
+                        continue
+                    if level and level not in run.levels:
+                        continue
+
+                    f.seek(run.start)
+                    for line in f.read(run.end - run.start).splitlines():
+                        meta = _record_meta(line)
+                        if meta is None:
+                            continue
+                        ts, record_level = meta
+                        if start is not None and ts < start:
+                            continue
+                        if end is not None and ts >= end:
+                            continue
+                        if level and record_level != level:
+                            continue
+                        entry = parse_log_entry(line)
+                        if entry is not None:
+                            results.append(entry)
+                            if len(results) >= limit:
+                                return results
+        return results
+
+
+log_index = LogIndex()
@@ -0,0 +1,192 @@
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from app.core.metrics import timed
+
+LOG_FILE = Path("logs/app.json")
+BLOCK_SIZE = 64 * 1024
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+
+
+@dataclass
+class LogPage:
+    """
+    Страница записей лога в хронологическом порядке.
+    next_before — курсор для следующей (более старой) страницы,
+    next_after — курсор для опроса новых записей.
+    """
+    records: List[Dict[str, Any]] = field(default_factory=list)
+    next_before: Optional[int] = None
+    next_after: Optional[int] = None
+
+
+def parse_log_entry(line: bytes) -> Optional[Dict[str, Any]]:
+    """
+    Разбирает строку JSON-лога в плоскую запись для дашборда.
+    Возвращает None для битых или неизвестных строк.
+    """
+    try:
+        entry = json.loads(line)
+    except ValueError:
+        return None
+
+    # Loguru с serialize=True кладет данные в "record"
+    if isinstance(entry, dict) and "record" in entry:
+        record = entry["record"]
+        return {
+            "timestamp": record["time"].get("repr"),
+            "level": record["level"].get("name"),
+            "message": record["message"],
+            "module": record["name"],
+            "function": record["function"],
+            "line": record["line"]
+        }
+    if isinstance(entry, dict) and "message" in entry:
+        # Плоский формат (компактная схема logger.compact_json_format и старые логи)
+        return entry
+    return None
+
+
+def matches_filters(entry: Dict[str, Any], level: Optional[str], module: Optional[str]) -> bool:
+    if level and str(entry.get("level", "")).upper() != level:
+        return False
+    if module:
+        name = str(entry.get("module", ""))
+        # Фильтр по пакету: "app.core" совпадает и с "app.core.logger"
+        if name != module and not name.startswith(module + "."):
+            return False
+    return True
+
+
+def _iter_lines_backward(f, end: int) -> Iterator[Tuple[int, bytes]]:
+    """
+    Читает файл блоками от позиции end к началу.
+    Отдаёт пары (смещение начала строки, строка) от новых к старым.
+    """
+    pos = end
+    carry = b""
+    while pos > 0:
+        read_size = min(BLOCK_SIZE, pos)
+        pos -= read_size
+        f.seek(pos)
+        chunk = f.read(read_size) + carry
+        lines = chunk.split(b"\n")
+        # Первая строка блока может начинаться в предыдущем блоке
+        carry = lines[0]
+        line_end = pos + len(chunk)
+        for line in reversed(lines[1:]):
+            start = line_end - len(line)
+            if line:
+                yield start, line
+            line_end = start - 1
+    if carry:
+        yield 0, carry
+
+
+def _complete_end(f, size: int) -> int:
+    """
+    Позиция сразу после последней полной строки.
+    Строка, которую логгер ещё дописывает, в выдачу не попадает.
+    """
+    if size == 0:
+        return 0
+    f.seek(size - 1)
+    if f.read(1) == b"\n":
+        return size
+    for start, _ in _iter_lines_backward(f, size):
+        return start
+    return 0
+
+
+def _read_backward(f, end: int, limit: int, level, module) -> LogPage:
+    page = LogPage()
+    oldest = end
+    for start, line in _iter_lines_backward(f, end):
+        entry = parse_log_entry(line)
+        if entry is None or not matches_filters(entry, level, module):
+            continue
+        page.records.append(entry)
+        oldest = start
+        if len(page.records) >= limit:
+            break
+    page.records.reverse()
+    page.next_before = oldest if page.records and oldest > 0 else None
+    return page
+
+
+def _read_forward(f, start: int, end: int, limit: int, level, module) -> LogPage:
+    page = LogPage()
+    f.seek(start)
+    position = start
+    while position < end and len(page.records) < limit:
+        line = f.readline()
+        if not line:
+            break
+        line_start = position
+        position += len(line)
+        entry = parse_log_entry(line.rstrip(b"\n"))
+        if entry is None or not matches_filters(entry, level, module):
+            continue
+        page.records.append(entry)
+        if page.next_before is None:
+            page.next_before = line_start or None
+    page.next_after = position
+    return page
+
+
+def log_version(path: Optional[Path] = None) -> str:
+    """
+    Версия файла лога по inode, размеру и mtime — без чтения содержимого.
+    Лог только дописывается, а ротация меняет inode, так что любые новые
+    записи меняют версию.
+    """
+    path = path or LOG_FILE
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return "missing"
+    return f"{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}"
+
+
+@timed("log_tail_read")
+def read_log_page(
+    path: Optional[Path] = None,
+    limit: int = DEFAULT_LIMIT,
+    before: Optional[int] = None,
+    after: Optional[int] = None,
+    level: Optional[str] = None,
+    module: Optional[str] = None
+) -> LogPage:
+    """
+    Возвращает страницу записей лога, не читая файл целиком.
+
+    Без курсоров — последние limit записей (чтение блоками с конца файла).
+    before — записи старше указанного смещения, after — новее.
+    Курсоры — байтовые смещения начала строк, фильтры применяются по ходу чтения,
+    поэтому стоимость запроса пропорциональна числу просмотренных записей, а не размеру файла.
+    """
+    path = path or LOG_FILE
+    limit = max(1, min(limit, MAX_LIMIT))
+    level = level.upper() if level else None
+
+    if not path.exists():
+        return LogPage()
+
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        end = _complete_end(f, size)
+
+        if after is not None:
+            # Файл ротировали — курсор указывает за конец, читаем новый сегмент с начала
+            if after > end:
+                after = 0
+            return _read_forward(f, after, end, limit, level, module)
+
+        if before is not None:
+            end = min(before, end)
+        page = _read_backward(f, end, limit, level, module)
+        page.next_after = _complete_end(f, size)
+        return page
@@ -0,0 +1,116 @@
+import asyncio
+import json
+import threading
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Set
+from app.services.log_reader import matches_filters
+
+DEFAULT_BUFFER_SIZE = 500
+HEARTBEAT_SECONDS = 15.0
+
+
+class LogSubscriber:
+    """
+    Один подключённый клиент: ограниченный буфер записей и фильтры.
+    При переполнении буфера вытесняются самые старые записи.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        level: Optional[str] = None,
+        module: Optional[str] = None,
+        buffer_size: int = DEFAULT_BUFFER_SIZE
+    ) -> None:
+        self.loop = loop
+        self.level = level.upper() if level else None
+        self.module = module
+        self.buffer: Deque[str] = deque(maxlen=buffer_size)
+        self.dropped = 0
+        self.event = asyncio.Event()
+
+    def push(self, entry: Dict[str, Any], encoded: str) -> None:
+        if not matches_filters(entry, self.level, self.module):
+            return
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(encoded)
+        if not self.event.is_set():
+            self.loop.call_soon_threadsafe(self.event.set)
+
+
+class LogBroadcaster:
+    """
+    Раздаёт новые записи лога всем подписчикам.
+
+    Работает как sink Loguru: запись форматируется и сериализуется один раз,
+    затем раскладывается по буферам клиентов. Файл лога не перечитывается,
+    поэтому стоимость не зависит от числа открытых дашбордов.
+    """
+
+    def __init__(self) -> None:
+        self._subscribers: Set[LogSubscriber] = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, **kwargs) -> LogSubscriber:
+        subscriber = LogSubscriber(asyncio.get_running_loop(), **kwargs)
+        with self._lock:
+            self._subscribers = self._subscribers | {subscriber}
+        return subscriber
+
+    def unsubscribe(self, subscriber: LogSubscriber) -> None:
+        with self._lock:
+            self._subscribers = self._subscribers - {subscriber}
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, record: Dict[str, Any]) -> None:
+        # Множество подписчиков заменяется целиком, поэтому читаем без блокировки
+        subscribers = self._subscribers
+        if not subscribers:
+            return
+
+        entry = {
+            "timestamp": str(record["time"]),
+            "level": record["level"].name,
+            "message": record["message"],
+            "module": record["name"],
+            "function": record["function"],
+            "line": record["line"]
+        }
+        encoded = json.dumps(entry, ensure_ascii=False)
+        for subscriber in subscribers:
+            try:
+                subscriber.push(entry, encoded)
+            except RuntimeError:
+                # Цикл событий клиента уже закрыт
+                self.unsubscribe(subscriber)
+
+
+async def stream_events(
+    subscriber: LogSubscriber,
+    heartbeat: float = HEARTBEAT_SECONDS
+) -> AsyncIterator[str]:
+    """
+    Генератор событий Server-Sent Events для подписчика.
+    """
+    reported_drops = 0
+    while True:
+        try:
+            await asyncio.wait_for(subscriber.event.wait(), timeout=heartbeat)
+        except asyncio.TimeoutError:
+            # Комментарий держит соединение открытым через прокси
+            yield ": keep-alive\n\n"
+            continue
+
+        subscriber.event.clear()
+        if subscriber.dropped != reported_drops:
+            yield f"event: dropped\ndata: {json.dumps({'count': subscriber.dropped - reported_drops})}\n\n"
+            reported_drops = subscriber.dropped
+        while subscriber.buffer:
+            yield f"data: {subscriber.buffer.popleft()}\n\n"
+
+
+log_broadcaster = LogBroadcaster()
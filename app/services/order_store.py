@@ -0,0 +1,284 @@
+import asyncio
+import base64
+import json
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from app.core.config import settings
+from app.core.config_loader import resolve_path
+from app.schemas.orders import Order
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+EXPORT_BATCH_SIZE = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    id TEXT PRIMARY KEY,
+    customer_name TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    details TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS idx_orders_created ON orders (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_orders_status_created ON orders (status, created_at DESC, id DESC);
+"""
+
+_COLUMNS = "id, customer_name, phone, status, created_at, details"
+
+# Повтор по id обновляет заказ; неизменившаяся строка не переписывается
+_UPSERT = f"""
+INSERT INTO orders ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT(id) DO UPDATE SET
+    customer_name = excluded.customer_name,
+    phone = excluded.phone,
+    status = excluded.status,
+    details = excluded.details
+WHERE (customer_name, phone, status, details)
+    IS NOT (excluded.customer_name, excluded.phone, excluded.status, excluded.details)
+"""
+
+
+def _to_micros(value: datetime) -> int:
+    if value.tzinfo is None:
+        value = value.astimezone()
+    return int(value.timestamp() * 1_000_000)
+
+
+def _from_micros(value: int) -> datetime:
+    return datetime.fromtimestamp(value / 1_000_000, tz=timezone.utc)
+
+
+def encode_cursor(created_at: int, order_id: str) -> str:
+    raw = json.dumps([created_at, order_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, str]:
+    """
+    Курсор — позиция последнего выданного заказа (created_at, id).
+    ValueError для битого курсора.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, order_id = json.loads(base64.urlsafe_b64decode(padded))
+        return int(created_at), str(order_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+    return {
+        "id": row["id"],
+        "customer_name": row["customer_name"],
+        "phone": row["phone"],
+        "status": row["status"],
+        "created_at": _from_micros(row["created_at"]).isoformat(),
+        "details": json.loads(row["details"]),
+    }
+
+
+class OrderStore:
+    """
+    Хранилище заказов во встроенной SQLite (режим WAL).
+
+    Все обращения к базе выполняются в собственном пуле потоков; у каждого
+    потока своё соединение, поэтому event loop не блокируется, а читатели
+    не мешают писателю. Список заказов отдаётся keyset-пагинацией по
+    (created_at, id): стоимость страницы не зависит от глубины и размера таблицы.
+
+    version() — дешёвая версия данных для ETag: меняется после любой записи
+    в базу, в том числе из другого процесса.
+    """
+
+    def __init__(self, path: Path, max_workers: int = 4) -> None:
+        self.path = Path(path)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="order-store")
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        # Отдельное соединение только для PRAGMA data_version: само оно ничего
+        # не пишет, поэтому видит коммиты всех остальных соединений
+        self._version_conn: Optional[sqlite3.Connection] = None
+        self._version_lock = threading.Lock()
+        # data_version нумеруется заново для каждого соединения — префикс
+        # не даёт версиям после перезапуска совпасть со старыми
+        self._version_prefix = os.urandom(6).hex()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            # В WAL synchronous=NORMAL сохраняет целостность и не делает fsync на каждую транзакцию
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.executescript(_SCHEMA)
+                    self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Выполняет синхронный метод хранилища в пуле потоков хранилища."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+
+    def version(self) -> str:
+        """
+        Версия содержимого базы: PRAGMA data_version без чтения страниц таблицы.
+        """
+        with self._version_lock:
+            if self._version_conn is None:
+                self._connection()  # схема и режим WAL
+                self._version_conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None, check_same_thread=False)
+            row = self._version_conn.execute("PRAGMA data_version").fetchone()
+        return f"{self._version_prefix}-{row[0]}"
+
+    def add_orders(self, orders: Iterable[Order]) -> int:
+        """
+        Сохраняет пачку заказов одной транзакцией. Заказ с уже известным id
+        обновляется (исправленные данные, статус из отчёта о завершении звонка),
+        время создания сохраняется. Возвращает число вставленных или изменённых строк.
+        """
+        rows = [
+            (
+                order.id,
+                order.customer_name,
+                order.phone,
+                order.status,
+                _to_micros(order.created_at),
+                json.dumps(order.details, ensure_ascii=False),
+            )
+            for order in orders
+        ]
+        if not rows:
+            return 0
+
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = conn.executemany(
+                _UPSERT,
+                rows
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return cursor.rowcount
+
+    def _page(
+        self,
+        limit: int,
+        after: Optional[Tuple[int, str]],
+        status: Optional[str]
+    ) -> List[sqlite3.Row]:
+        clauses, params = [], []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if after is not None:
+            clauses.append("(created_at, id) < (?, ?)")
+            params.extend(after)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        params.append(limit)
+        return self._connection().execute(
+            f"SELECT {_COLUMNS} FROM orders {where} ORDER BY created_at DESC, id DESC LIMIT ?",
+            params
+        ).fetchall()
+
+    def list_orders(
+        self,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        status: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Страница заказов (новые сверху) и курсор следующей страницы.
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        after = decode_cursor(cursor) if cursor else None
+        # Берём на одну строку больше, чтобы понять, есть ли следующая страница
+        rows = self._page(limit + 1, after, status)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+        return [_row_to_dict(row) for row in rows], next_cursor
+
+    def export_batch(
+        self,
+        after: Optional[Tuple[int, str]] = None,
+        status: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[int, str]]]:
+        """
+        Очередная пачка для экспорта и позиция для следующей (None — конец).
+        """
+        rows = self._page(EXPORT_BATCH_SIZE, after, status)
+        if not rows:
+            return [], None
+        last = rows[-1]
+        position = (last["created_at"], last["id"]) if len(rows) == EXPORT_BATCH_SIZE else None
+        return [_row_to_dict(row) for row in rows], position
+
+    def count(self, status: Optional[str] = None) -> int:
+        if status:
+            row = self._connection().execute("SELECT COUNT(*) FROM orders WHERE status = ?", (status,)).fetchone()
+        else:
+            row = self._connection().execute("SELECT COUNT(*) FROM orders").fetchone()
+        return row[0]
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        with self._version_lock:
+            if self._version_conn is not None:
+                self._version_conn.close()
+                self._version_conn = None
+
+
+async def export_orders_json(store: OrderStore, status: Optional[str] = None):
+    """
+    Потоковый экспорт в виде JSON-массива: таблица читается пачками,
+    и в памяти никогда не оказывается больше одной пачки.
+    """
+    yield b"["
+    first = True
+    after = None
+    while True:
+        batch, after = await store.run(store.export_batch, after, status)
+        for item in batch:
+            yield (b"" if first else b",") + json.dumps(item, ensure_ascii=False).encode("utf-8")
+            first = False
+        if after is None:
+            break
+    yield b"]"
+
+
+_store: Optional[OrderStore] = None
+_store_lock = threading.Lock()
+
+
+def get_order_store() -> OrderStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = OrderStore(resolve_path(settings.ORDERS_DB_PATH))
+    return _store
+
+
+def close_order_store() -> None:
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+            _store = None
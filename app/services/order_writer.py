@@ -0,0 +1,247 @@
+import json
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from pydantic import ValidationError
+from app.core.logger import logger
+from app.core.utils import create_dynamic_model
+from app.schemas.orders import Order
+from app.services.order_store import OrderStore, get_order_store
+from app.services.tools_registry import TOOL_NAME
+
+_STOP = object()
+
+
+class OrderWriter:
+    """
+    Отложенная запись заказов (write-behind).
+
+    Вебхук только кладёт заказ в ограниченную очередь и сразу отвечает VAPI;
+    фоновый поток забирает всё накопившееся и пишет одной транзакцией.
+    Под нагрузкой пачки растут сами собой, и число fsync растёт не с числом
+    звонков, а с числом пачек.
+    """
+
+    def __init__(
+        self,
+        store_factory: Callable[[], OrderStore] = get_order_store,
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        max_retries: int = 3,
+        retry_delay: float = 0.5
+    ) -> None:
+        self.store_factory = store_factory
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="order-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, order: Order) -> bool:
+        """
+        Ставит заказ в очередь. Не блокирует: False, если очередь переполнена.
+        """
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait(order)
+            return True
+        except queue.Full:
+            return False
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """
+        Ждёт, пока будут записаны все заказы, поставленные до вызова.
+        """
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done, timeout=timeout)
+        return done.wait(timeout)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """
+        Дописывает очередь и останавливает поток.
+        """
+        thread = self._thread
+        if thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        thread.join(timeout)
+        self._thread = None
+
+    def _next_batch(self) -> Tuple[List[Order], List[threading.Event], bool]:
+        """
+        Ждёт первый заказ и забирает всё, что уже лежит в очереди, до batch_size.
+        """
+        orders: List[Order] = []
+        markers: List[threading.Event] = []
+        item = self._queue.get()
+        while True:
+            if item is _STOP:
+                return orders, markers, True
+            if isinstance(item, threading.Event):
+                markers.append(item)
+            else:
+                orders.append(item)
+            if len(orders) >= self.batch_size:
+                return orders, markers, False
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return orders, markers, False
+
+    def _write(self, orders: List[Order]) -> None:
+        for attempt in range(self.max_retries):
+            try:
+                self.store_factory().add_orders(orders)
+                self.written += len(orders)
+                self.batches += 1
+                return
+            except Exception as e:
+                if attempt + 1 == self.max_retries:
+                    self.failed += len(orders)
+                    # Уровень ERROR уходит в Telegram; заказы остаются хотя бы в логе
+                    logger.error(
+                        f"Failed to write {len(orders)} orders: {e}; "
+                        f"ids={[order.id for order in orders]}"
+                    )
+                    return
+                time.sleep(self.retry_delay * (attempt + 1))
+
+    def _run(self) -> None:
+        while True:
+            orders, markers, stopping = self._next_batch()
+            if orders:
+                self._write(orders)
+            for marker in markers:
+                marker.set()
+            if stopping:
+                return
+
+
+def _parse_arguments(arguments: Any) -> Dict[str, Any]:
+    if isinstance(arguments, dict):
+        return arguments
+    if isinstance(arguments, str) and arguments.strip():
+        parsed = json.loads(arguments)
+        if isinstance(parsed, dict):
+            return parsed
+        raise ValueError("tool arguments must be a JSON object")
+    return {}
+
+
+def validate_collected_data(fields: Dict[str, str], data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Проверяет собранные данные той же моделью, из которой построена схема
+    инструмента (модель берётся из кэша). ValidationError при несовпадении.
+    """
+    model = create_dynamic_model("CollectedData", fields)
+    return model.model_validate(data).model_dump()
+
+
+def build_order(message: Dict[str, Any], details: Dict[str, Any], status: str) -> Order:
+    """
+    Заказ из данных звонка. id привязан к звонку, поэтому повторный вызов
+    инструмента или отчёт о завершении того же звонка не создают второй заказ,
+    а обновляют данные и статус первого.
+    """
+    call = message.get("call") or {}
+    customer = call.get("customer") or {}
+    call_id = call.get("id")
+    return Order(
+        id=f"call-{call_id}" if call_id else f"ord-{uuid.uuid4().hex}",
+        customer_name=str(details.get("customer_name") or details.get("name") or customer.get("name") or ""),
+        phone=str(customer.get("number") or details.get("phone") or ""),
+        status=status,
+        created_at=datetime.now(timezone.utc),
+        details=details
+    )
+
+
+def collect_tool_results(
+    message: Dict[str, Any],
+    fields: Dict[str, str]
+) -> Tuple[List[Dict[str, str]], List[Order]]:
+    """
+    Разбирает сообщение tool-calls: ответы для VAPI по каждому вызову
+    collect_customer_data и заказы из успешно проверенных вызовов.
+    """
+    results: List[Dict[str, str]] = []
+    orders: List[Order] = []
+    for tool_call in message.get("toolCallList") or []:
+        function = tool_call.get("function") or {}
+        if function.get("name") != TOOL_NAME:
+            continue
+        try:
+            details = validate_collected_data(fields, _parse_arguments(function.get("arguments")))
+        except (ValueError, ValidationError) as e:
+            # Ответ уходит модели: она переспросит клиента недостающие поля
+            logger.warning(f"Invalid {TOOL_NAME} arguments: {e}")
+            results.append({"toolCallId": tool_call.get("id"), "result": f"Invalid data, please re-check the fields: {e}"})
+            continue
+        orders.append(build_order(message, details, status="new"))
+        results.append({"toolCallId": tool_call.get("id"), "result": "Data saved"})
+    return results, orders
+
+
+def order_from_end_of_call(message: Dict[str, Any], fields: Dict[str, str]) -> Optional[Order]:
+    """
+    Заказ из structuredData отчёта о завершении звонка, если данные полные.
+    """
+    data = (message.get("analysis") or {}).get("structuredData")
+    if not fields or not isinstance(data, dict):
+        return None
+    try:
+        details = validate_collected_data(fields, data)
+    except ValidationError as e:
+        logger.warning(f"Incomplete structured data in end-of-call report: {e}")
+        return None
+    return build_order(message, details, status="completed")
+
+
+def write_orders(orders: List[Order]) -> None:
+    """
+    Синхронный вариант record_orders для фоновых потоков.
+    """
+    overflow = [order for order in orders if not order_writer.submit(order)]
+    if overflow:
+        logger.warning(f"Order write queue is full, writing {len(overflow)} orders directly")
+        get_order_store().add_orders(overflow)
+
+
+async def record_orders(orders: List[Order]) -> None:
+    """
+    Ставит заказы в очередь записи. Если очередь переполнена, пишет
+    напрямую в пуле хранилища: заказ не теряется, а вызывающий получает
+    естественное обратное давление.
+    """
+    overflow = [order for order in orders if not order_writer.submit(order)]
+    if overflow:
+        logger.warning(f"Order write queue is full, writing {len(overflow)} orders directly")
+        store = get_order_store()
+        await store.run(store.add_orders, overflow)
+
+
+order_writer = OrderWriter()
@@ -0,0 +1,167 @@
+import json
+import re
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple, Union
+from app.core.config_loader import AppSettings
+from app.services.knowledge_base import KnowledgeBase
+
+# Плейсхолдеры, которые подставляются на каждый звонок
+CALL_PLACEHOLDERS = ("caller_number", "current_time")
+# Плейсхолдер, который заполняется один раз на версию конфига и базы знаний
+KNOWLEDGE_BASE_PLACEHOLDER = "knowledge_base"
+
+# Только известные имена считаются плейсхолдерами: фигурные скобки
+# в самом промпте (например, примеры JSON) остаются текстом
+_PLACEHOLDER_RE = re.compile(r"\{(%s)\}" % "|".join(CALL_PLACEHOLDERS + (KNOWLEDGE_BASE_PLACEHOLDER,)))
+
+KNOWLEDGE_BASE_SECTION = "\n\n### Knowledge base\n{knowledge_base}"
+# Запас бюджета под значения, подставляемые на каждый звонок
+CALL_VALUES_RESERVE = 32
+KB_CANDIDATES = 20
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Грубая оценка числа токенов: ~4 байта UTF-8 на токен.
+    Для кириллицы (2 байта на символ) это ~2 символа на токен, что близко к реальности.
+    """
+    return (len(text.encode("utf-8")) + 3) // 4
+
+
+def _trim_to_tokens(text: str, tokens: int) -> str:
+    encoded = text.encode("utf-8")[:tokens * 4]
+    return encoded.decode("utf-8", errors="ignore").rstrip()
+
+
+def _json_escape(text: str) -> bytes:
+    """Содержимое JSON-строки без кавычек."""
+    return json.dumps(text, ensure_ascii=False)[1:-1].encode("utf-8")
+
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    """
+    Предкомпилированный промпт: статичные куски уже экранированы для JSON,
+    на звонок остаётся подставить только значения плейсхолдеров.
+    """
+    parts: Tuple[Union[bytes, str], ...]
+    static_tokens: int
+    knowledge_tokens: int
+
+    @property
+    def is_static(self) -> bool:
+        return all(isinstance(part, bytes) for part in self.parts)
+
+    def render_json(self, values: Dict[str, str]) -> bytes:
+        """Промпт как содержимое JSON-строки (без кавычек)."""
+        if len(self.parts) == 1 and isinstance(self.parts[0], bytes):
+            return self.parts[0]
+        return b"".join(
+            part if isinstance(part, bytes) else _json_escape(values.get(part, ""))
+            for part in self.parts
+        )
+
+    def render(self, values: Dict[str, str]) -> str:
+        return json.loads(b'"' + self.render_json(values) + b'"')
+
+
+def _knowledge_context(
+    config: AppSettings,
+    kb: Optional[KnowledgeBase],
+    budget: int
+) -> str:
+    """
+    Самые релевантные фрагменты базы знаний, уложенные в бюджет токенов.
+    Запрос строится из системного промпта и описаний собираемых полей.
+    """
+    if kb is None or budget <= 0:
+        return ""
+
+    query = " ".join([config.system_prompt, *config.voice_settings.dynamic_fields.values()])
+    selected: List[str] = []
+    used = 0
+    for chunk in kb.search(query, k=KB_CANDIDATES):
+        cost = estimate_tokens(chunk.text) + 1
+        if used + cost > budget:
+            remaining = budget - used
+            # Последний фрагмент обрезаем, если в бюджете осталось заметное место
+            if remaining > 32:
+                selected.append(_trim_to_tokens(chunk.text, remaining - 1))
+            break
+        selected.append(chunk.text)
+        used += cost
+    return "\n\n".join(selected)
+
+
+def _split_template(template: str) -> List[Union[str, Tuple[str]]]:
+    """Текст шаблона и плейсхолдеры (кортежи из одного имени) по порядку."""
+    pieces: List[Union[str, Tuple[str]]] = []
+    position = 0
+    for match in _PLACEHOLDER_RE.finditer(template):
+        pieces.append(template[position:match.start()])
+        pieces.append((match.group(1),))
+        position = match.end()
+    pieces.append(template[position:])
+    return pieces
+
+
+def compile_prompt(
+    config: AppSettings,
+    kb: Optional[KnowledgeBase] = None,
+    token_budget: int = 3000
+) -> CompiledPrompt:
+    """
+    Компилирует системный промпт для версии конфигурации.
+
+    Статичный текст и контекст базы знаний собираются один раз; контекст
+    обрезается так, чтобы весь промпт уложился в token_budget.
+    Если в промпте нет {knowledge_base}, контекст добавляется отдельной секцией в конце.
+    """
+    template = config.system_prompt
+    if "{%s}" % KNOWLEDGE_BASE_PLACEHOLDER not in template:
+        template += KNOWLEDGE_BASE_SECTION
+    pieces = _split_template(template)
+
+    literal_tokens = sum(estimate_tokens(piece) for piece in pieces if isinstance(piece, str))
+    call_slots = sum(1 for piece in pieces if isinstance(piece, tuple) and piece[0] in CALL_PLACEHOLDERS)
+    knowledge = _knowledge_context(config, kb, token_budget - literal_tokens - call_slots * CALL_VALUES_RESERVE)
+
+    if not knowledge and template != config.system_prompt:
+        # Контекста нет — не добавляем пустую секцию
+        pieces = _split_template(config.system_prompt)
+        literal_tokens = sum(estimate_tokens(piece) for piece in pieces if isinstance(piece, str))
+
+    # Склеиваем соседние статичные куски, чтобы на звонок оставалось минимум работы
+    parts: List[Union[bytes, str]] = []
+    buffer = ""
+    for piece in pieces:
+        if isinstance(piece, str):
+            buffer += piece
+        elif piece[0] == KNOWLEDGE_BASE_PLACEHOLDER:
+            buffer += knowledge
+        else:
+            if buffer:
+                parts.append(_json_escape(buffer))
+                buffer = ""
+            parts.append(piece[0])
+    if buffer or not parts:
+        parts.append(_json_escape(buffer))
+
+    return CompiledPrompt(
+        parts=tuple(parts),
+        static_tokens=literal_tokens,
+        knowledge_tokens=estimate_tokens(knowledge) if knowledge else 0
+    )
+
+
+def call_values(message: Dict) -> Dict[str, str]:
+    """
+    Значения плейсхолдеров для конкретного звонка из тела вебхука VAPI.
+    """
+    call = message.get("call") or {}
+    customer = call.get("customer") or message.get("customer") or {}
+    return {
+        "caller_number": str(customer.get("number") or ""),
+        "current_time": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC"),
+    }
@@ -1,19 +1,23 @@
 from typing import Any, Dict
-from app.core.config_loader import get_config
-from app.core.utils import create_dynamic_model
+from app.core.config_watcher import get_current_config
+from app.core.metrics import timed
+from app.core.utils import LRUCache, create_dynamic_model, freeze_fields, get_model_cache_stats, to_snake_case
 
-def get_dynamic_tool_schema(fields: Dict[str, str]) -> Dict[str, Any]:
-    """
-    Генерирует схему инструмента OpenAI-совместимого формата 
-    на основе словаря полей.
-    """
+TOOL_NAME = "collect_customer_data"
+TOOL_DESCRIPTION = "Call this function only when ALL requested fields are gathered from the user."
+
+# Готовые схемы инструментов, ключ — замороженный набор полей
+_schema_cache = LRUCache(maxsize=256)
+
+@timed("tool_schema_build")
+def _build_tool_schema(fields: Dict[str, str]) -> Dict[str, Any]:
     if not fields:
         # Возвращаем структуру с пустыми параметрами, если полей нет
         return {
             "type": "function",
             "function": {
-                "name": "collect_customer_data",
-                "description": "Call this function only when ALL requested fields are gathered from the user.",
+                "name": TOOL_NAME,
+                "description": TOOL_DESCRIPTION,
                 "parameters": {
                     "type": "object",
                     "properties": {},
@@ -28,8 +32,8 @@ def get_dynamic_tool_schema(fields: Dict[str, str]) -> Dict[str, Any]:
     return {
         "type": "function",
         "function": {
-            "name": "collect_customer_data",
-            "description": "Call this function only when ALL requested fields are gathered from the user.",
+            "name": TOOL_NAME,
+            "description": TOOL_DESCRIPTION,
             "parameters": {
                 "type": "object",
                 "properties": schema.get("properties", {}),
@@ -38,11 +42,36 @@ def get_dynamic_tool_schema(fields: Dict[str, str]) -> Dict[str, Any]:
         }
     }
 
+def get_dynamic_tool_schema(fields: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Генерирует схему инструмента OpenAI-совместимого формата 
+    на основе словаря полей.
+
+    Результат кэшируется и разделяется между вызовами — не изменяйте его.
+    """
+    return _schema_cache.get_or_create(freeze_fields(fields), lambda: _build_tool_schema(fields))
+
+def get_cache_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Статистика кэшей генерации схем: схемы, модели и snake_case-преобразования.
+    """
+    snake_info = to_snake_case.cache_info()
+    return {
+        "schemas": _schema_cache.stats(),
+        "models": get_model_cache_stats(),
+        "snake_case": {
+            "hits": snake_info.hits,
+            "misses": snake_info.misses,
+            "size": snake_info.currsize,
+            "maxsize": snake_info.maxsize,
+        },
+    }
+
 def generate_vapi_tool_schema() -> Dict[str, Any]:
     """
     Генерирует схему на основе полей из текущей конфигурации.
     """
-    settings = get_config()
+    settings = get_current_config()
     fields = settings.voice_settings.dynamic_fields
     
     if not fields:
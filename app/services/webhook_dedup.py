@@ -0,0 +1,198 @@
+import asyncio
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+from fastapi import Response
+from app.core.config import settings
+from app.core.config_loader import resolve_path
+from app.core.logger import logger
+from app.core.utils import TTLCache
+
+
+class CachedResponse(NamedTuple):
+    status_code: int
+    body: bytes
+    media_type: str
+
+    def to_response(self) -> Response:
+        return Response(content=self.body, status_code=self.status_code, media_type=self.media_type)
+
+
+def _to_cached(result: Any) -> CachedResponse:
+    if isinstance(result, Response):
+        return CachedResponse(result.status_code, bytes(result.body), result.media_type or "application/json")
+    body = json.dumps(result, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return CachedResponse(200, body, "application/json")
+
+
+def dedup_key(message: Dict[str, Any]) -> Optional[str]:
+    """
+    Ключ события: call id, тип и id события (id сообщения или вызовов
+    инструментов), а если его нет — timestamp. None, если событие не опознать.
+    """
+    message_type = message.get("type")
+    event = message.get("id")
+    if not event:
+        tool_calls = message.get("toolCallList") or ()
+        event = ",".join(str(call.get("id")) for call in tool_calls if call.get("id"))
+    if not event:
+        event = message.get("timestamp")
+    if not message_type or not event:
+        return None
+    call_id = (message.get("call") or {}).get("id") or "-"
+    return f"{call_id}:{message_type}:{event}"
+
+
+class WebhookDeduplicator:
+    """
+    Идемпотентная обработка повторных доставок вебхуков VAPI.
+
+    Ответ на событие хранится в TTL-кэше; повторная доставка получает его без
+    повторной обработки. Повтор, пришедший, пока первый запрос ещё выполняется
+    (типичный ретрай по таймауту), ждёт его результата, а не запускает обработку
+    второй раз. Кэш можно сохранять в файл, чтобы рестарт не открывал окно для дублей.
+
+    Кэш у каждого процесса свой: повтор, попавший на другой воркер, не распознаётся
+    (для этого нужно общее хранилище). Файлы всех воркеров объединяются только при запуске.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 600.0,
+        maxsize: int = 50000,
+        path: Optional[Path] = None,
+        clock: Callable[[], float] = None
+    ) -> None:
+        kwargs = {"clock": clock} if clock is not None else {}
+        self.cache = TTLCache(ttl=ttl, maxsize=maxsize, **kwargs)
+        self.path = path
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.duplicates = 0
+        self.coalesced = 0
+        if path is not None:
+            self.load()
+
+    async def run(self, key: str, handler: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Выполняет обработчик один раз на ключ; повторы получают сохранённый ответ.
+        Возвращает (ответ, был ли это повтор).
+        """
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.duplicates += 1
+            return cached.to_response(), True
+
+        loop = asyncio.get_running_loop()
+        pending = self._pending.get(key)
+        if pending is not None and pending.get_loop() is loop:
+            self.coalesced += 1
+            return (await asyncio.shield(pending)).to_response(), True
+
+        future = loop.create_future()
+        self._pending[key] = future
+        try:
+            result = await handler()
+            cached = _to_cached(result)
+            self.cache.set(key, cached)
+            future.set_result(cached)
+            return result, False
+        except BaseException as e:
+            future.set_exception(e)
+            # Исключение уже обработано вызывающим; помечаем, чтобы asyncio не ругался
+            future.exception()
+            raise
+        finally:
+            self._pending.pop(key, None)
+
+    def mark(self, key: str, result: Any) -> bool:
+        """
+        Отмечает событие, обработанное в фоне. False — событие уже было.
+        """
+        if self.cache.add(key, _to_cached(result)):
+            return True
+        self.duplicates += 1
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        cache = self.cache.stats()
+        lookups = cache["hits"] + cache["misses"]
+        return {
+            **cache,
+            "duplicates": self.duplicates,
+            "coalesced": self.coalesced,
+            "hit_rate": round(cache["hits"] / lookups, 4) if lookups else 0.0,
+        }
+
+    @property
+    def process_path(self) -> Path:
+        """
+        Файл этого процесса: <имя>.<pid>.json. Каждый воркер пишет только свой файл,
+        поэтому сохранения воркеров не перетирают друг друга.
+        """
+        return self.path.with_name(f"{self.path.stem}.{os.getpid()}{self.path.suffix}")
+
+    def _persisted_files(self) -> List[Path]:
+        pattern = f"{self.path.stem}.*{self.path.suffix}"
+        return [self.path] + sorted(p for p in self.path.parent.glob(pattern) if p != self.path)
+
+    def load(self) -> None:
+        """
+        Объединяет записи из файлов всех воркеров (и общего файла прежнего формата).
+        Файлы, в которых не осталось живых записей, удаляются.
+        """
+        now = self.cache.clock()
+        merged: Dict[str, list] = {}
+        for path in self._persisted_files():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entries = json.load(f)
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                logger.error(f"Failed to load webhook dedup cache from {path}: {e}")
+                continue
+            live = [entry for entry in entries if entry[1] > now]
+            for entry in live:
+                known = merged.get(entry[0])
+                if known is None or known[1] < entry[1]:
+                    merged[entry[0]] = entry
+            if not live and path != self.process_path:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+        for key, expires_at, status_code, media_type, body in merged.values():
+            self.cache.set(key, CachedResponse(status_code, body.encode("utf-8"), media_type), expires_at=expires_at)
+        if merged:
+            logger.info(f"Webhook dedup cache restored: {len(self.cache)} entries")
+
+    def save(self) -> None:
+        """Сохраняет живые записи в файл процесса атомарно: временный файл и rename."""
+        if self.path is None:
+            return
+        entries = [
+            [key, expires_at, value.status_code, value.media_type, value.body.decode("utf-8", "replace")]
+            for key, expires_at, value in self.cache.items()
+        ]
+        target = self.process_path
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(entries, f, ensure_ascii=False, separators=(",", ":"))
+                os.replace(tmp, target)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.unlink(tmp)
+                raise
+        except Exception as e:
+            logger.error(f"Failed to save webhook dedup cache to {target}: {e}")
+
+webhook_dedup = WebhookDeduplicator(
+    ttl=settings.WEBHOOK_DEDUP_TTL,
+    maxsize=settings.WEBHOOK_DEDUP_MAX,
+    path=resolve_path(settings.WEBHOOK_DEDUP_FILE) if settings.WEBHOOK_DEDUP_FILE else None
+)
@@ -0,0 +1,82 @@
+"""
+Бенчмарк накладных расходов допуска /inbound: стоимость проверки token
+bucket (горячий ключ и миллион разных ключей), латентность /inbound с
+лимитами и без, и стоимость отказа 429.
+
+Запуск: python -m benchmarks.bench_admission
+"""
+import asyncio
+import statistics
+import time
+from httpx import AsyncClient, ASGITransport
+from loguru import logger
+from app.core import rate_limit
+from app.core.rate_limit import TokenBucketLimiter
+from app.main import app
+
+CHECKS = 1_000_000
+REQUESTS = 3000
+
+PAYLOAD = {
+    "message": {
+        "type": "status-update",
+        "status": "in-progress",
+        "call": {"id": "call-123", "customer": {"number": "+15555550100"}},
+    }
+}
+
+
+def _bench_limiter() -> None:
+    limiter = TokenBucketLimiter(rate=1e9, burst=1e9)
+    start = time.perf_counter()
+    for _ in range(CHECKS):
+        limiter.allow("+15555550100")
+    print(f"allow() hot key        {(time.perf_counter() - start) / CHECKS * 1e9:7.0f} ns/op")
+
+    limiter = TokenBucketLimiter(rate=1e9, burst=1e9, max_keys=100_000)
+    keys = [f"+1555{i:07d}" for i in range(CHECKS)]
+    start = time.perf_counter()
+    for key in keys:
+        limiter.allow(key)
+    print(f"allow() unique keys    {(time.perf_counter() - start) / CHECKS * 1e9:7.0f} ns/op  "
+          f"(keys kept: {len(limiter)}, evicted: {limiter.evicted})")
+
+
+async def _measure(payload) -> list[float]:
+    samples = []
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(REQUESTS):
+            start = time.perf_counter_ns()
+            await client.post("/inbound", json=payload)
+            samples.append((time.perf_counter_ns() - start) / 1000)
+    return samples
+
+
+def _report(name: str, samples: list[float]) -> None:
+    samples = sorted(samples)
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    print(f"{name:<22} p50={statistics.median(samples):8.1f}us  p99={p99:8.1f}us")
+
+
+def main() -> None:
+    logger.remove()
+    _bench_limiter()
+
+    control = rate_limit.inbound_admission
+    ip_limiter, caller_limiter = rate_limit.ip_limiter, rate_limit.caller_limiter
+
+    control.max_concurrency, ip_limiter.rate, caller_limiter.rate = 0, 0, 0
+    _report("/inbound no limits", asyncio.run(_measure(PAYLOAD)))
+
+    control.max_concurrency = 1000
+    ip_limiter.rate = caller_limiter.rate = 1e9
+    ip_limiter.burst = caller_limiter.burst = 1e9
+    _report("/inbound with limits", asyncio.run(_measure(PAYLOAD)))
+
+    ip_limiter.rate, ip_limiter.burst = 1e-9, 1
+    _report("/inbound shed (429)", asyncio.run(_measure(PAYLOAD)))
+
+
+if __name__ == "__main__":
+    main()
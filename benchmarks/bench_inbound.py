@@ -0,0 +1,51 @@
+"""
+Микро-бенчмарк ответа на assistant-request.
+
+Сравнивает старый путь (генерация схемы инструментов + сериализация через
+JSONResponse на каждый вебхук) с закэшированным готовым телом ответа.
+
+Запуск: python -m benchmarks.bench_inbound
+"""
+import statistics
+import time
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from app.core.config_loader import get_config
+from app.services.assistant_payload import AssistantResponseCache, build_assistant_payload
+
+ITERATIONS = 5000
+
+
+def _measure(fn, iterations: int = ITERATIONS) -> list[float]:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter_ns()
+        fn()
+        samples.append((time.perf_counter_ns() - start) / 1000)
+    return samples
+
+
+def _report(name: str, samples: list[float]) -> None:
+    samples = sorted(samples)
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    print(f"{name:<10} mean={statistics.mean(samples):8.2f}us  p50={statistics.median(samples):8.2f}us  p99={p99:8.2f}us")
+
+
+def main() -> None:
+    config = get_config()
+    cache = AssistantResponseCache()
+
+    def legacy():
+        # Так работал обработчик: схема строится заново, затем FastAPI сериализует dict
+        JSONResponse(content=jsonable_encoder(build_assistant_payload(config)))
+
+    def cached():
+        cache.get(config)
+
+    cached()  # прогрев
+    _report("legacy", _measure(legacy))
+    _report("cached", _measure(cached))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Бенчмарк базы знаний на синтетическом корпусе (по умолчанию 50 МБ):
+полная сборка индекса, инкрементальная пересборка после правки и латентность запросов.
+
+Запуск: python -m benchmarks.bench_knowledge_base [размер_в_МБ]
+"""
+import itertools
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from app.services.knowledge_base import KnowledgeBase
+
+QUERIES = 500
+
+
+def _vocabulary(size: int, rng: random.Random) -> list[str]:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(3, 10))) for _ in range(size)]
+
+
+def _generate_corpus(path: Path, megabytes: int, rng: random.Random) -> list[str]:
+    vocabulary = _vocabulary(50_000, rng)
+    # Распределение, близкое к закону Ципфа: немного частых слов и длинный хвост
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+    target = megabytes * 1024 * 1024
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        while written < target:
+            words = rng.choices(vocabulary, cum_weights=cum_weights, k=rng.randint(40, 160))
+            paragraph = " ".join(words) + ".\n\n"
+            f.write(paragraph)
+            written += len(paragraph)
+    return vocabulary
+
+
+def _percentile(samples: list[float], q: float) -> float:
+    samples = sorted(samples)
+    return samples[max(0, int(len(samples) * q) - 1)]
+
+
+def main() -> None:
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    rng = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "kb.txt"
+        started = time.perf_counter()
+        vocabulary = _generate_corpus(source, megabytes, rng)
+        print(f"corpus: {source.stat().st_size / 1024 / 1024:.1f} MB generated in {time.perf_counter() - started:.1f}s")
+
+        kb = KnowledgeBase(source, Path(tmp) / "index")
+        started = time.perf_counter()
+        kb.build()
+        print(f"full build: {time.perf_counter() - started:.1f}s, {kb.segments_built} segments")
+
+        # Правка в середине файла
+        text = source.read_text(encoding="utf-8")
+        middle = text.index("\n\n", len(text) // 2)
+        source.write_text(text[:middle] + "\n\nunique inserted paragraph about refunds" + text[middle:], encoding="utf-8")
+        built_before = kb.segments_built
+        started = time.perf_counter()
+        kb.build()
+        print(
+            f"incremental rebuild: {time.perf_counter() - started:.1f}s, "
+            f"{kb.segments_built - built_before} segments rebuilt, {kb.segments_reused} reused"
+        )
+
+        # Запросы из 2-4 слов среднечастотной и редкой лексики
+        samples = []
+        for _ in range(QUERIES):
+            query = " ".join(rng.choice(vocabulary[200:]) for _ in range(rng.randint(2, 4)))
+            started = time.perf_counter()
+            kb.search(query, k=5)
+            samples.append((time.perf_counter() - started) * 1000)
+        print(
+            f"query top-5: p50={statistics.median(samples):.2f}ms "
+            f"p99={_percentile(samples, 0.99):.2f}ms max={max(samples):.2f}ms"
+        )
+        kb.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Бенчмарк p99 латентности /inbound при разных режимах логирования:
+без логов, прежний синхронный serialize=True и фоновый компактный JSON.
+
+Запуск: python -m benchmarks.bench_logging
+"""
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from httpx import AsyncClient, ASGITransport
+from loguru import logger
+from app.core.log_writer import flush_log_writers
+from app.core.logger import setup_logging
+from app.core.rate_limit import caller_limiter, inbound_admission, ip_limiter
+from app.main import app
+
+REQUESTS = 2000
+
+PAYLOAD = {
+    "message": {
+        "type": "transcript",
+        "role": "user",
+        "transcript": "Здравствуйте, я хотел бы записаться на стрижку в пятницу. " * 20,
+        "call": {"id": "call-123", "customer": {"number": "+15555550100"}},
+    }
+}
+
+
+async def _measure() -> list[float]:
+    samples = []
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(REQUESTS):
+            start = time.perf_counter_ns()
+            await client.post("/inbound", json=PAYLOAD)
+            samples.append((time.perf_counter_ns() - start) / 1000)
+    return samples
+
+
+def _report(name: str, samples: list[float]) -> None:
+    samples = sorted(samples)
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    print(f"{name:<14} mean={statistics.mean(samples):8.1f}us  p50={statistics.median(samples):8.1f}us  p99={p99:8.1f}us")
+
+
+def main() -> None:
+    # Все запросы идут от одного адреса и одного звонящего — лимиты допуска исказили бы замер
+    inbound_admission.max_concurrency = 0
+    ip_limiter.rate = caller_limiter.rate = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        modes = [
+            ("off", None),
+            ("sync-serialize", {"async_mode": False, "compact_json": False}),
+            ("async-compact", {"async_mode": True, "compact_json": True}),
+        ]
+        for name, options in modes:
+            if options is None:
+                logger.remove()
+            else:
+                # Консольный вывод искажает замеры, поэтому отключаем его во всех режимах
+                setup_logging(log_file=str(Path(tmp) / f"{name}.json"), console=False, **options)
+            _report(name, asyncio.run(_measure()))
+            flush_log_writers()
+    setup_logging()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Бенчмарк накладных расходов метрик: RouteMetricsMiddleware вокруг
+пустого ASGI-приложения, декоратор timed() вокруг пустой функции и
+стоимость сбора /metrics.
+
+Запуск: python -m benchmarks.bench_metrics
+"""
+import asyncio
+import time
+from app.core.metrics import MetricsRegistry, RouteMetricsMiddleware, timed
+
+REQUESTS = 200_000
+CALLS = 1_000_000
+
+
+class _Route:
+    path = "/v1/calls/{call_id}"
+
+
+async def _app(scope, receive, send):
+    scope["route"] = _Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def _noop(message):
+    pass
+
+
+async def _receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def _measure(app) -> float:
+    scope = {"type": "http", "method": "GET", "path": "/v1/calls/abc"}
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        await app(dict(scope), _receive, _noop)
+    return (time.perf_counter() - start) / REQUESTS
+
+
+def _bench_middleware() -> None:
+    bare = asyncio.run(_measure(_app))
+    wrapped = asyncio.run(_measure(RouteMetricsMiddleware(_app, MetricsRegistry())))
+    print(f"request bare           {bare * 1e6:7.2f} us")
+    print(f"request with metrics   {wrapped * 1e6:7.2f} us  (overhead {(wrapped - bare) * 1e6:.2f} us)")
+
+
+def _bench_timer() -> None:
+    def plain():
+        return None
+
+    instrumented = timed("bench_noop")(plain)
+    for name, fn in (("call bare", plain), ("call with timed()", instrumented)):
+        start = time.perf_counter()
+        for _ in range(CALLS):
+            fn()
+        print(f"{name:<22} {(time.perf_counter() - start) / CALLS * 1e9:7.0f} ns")
+
+
+def _bench_render() -> None:
+    registry = MetricsRegistry()
+    for route in range(30):
+        for status in (200, 404, 500):
+            registry.histogram("http_request_duration_seconds", "", (("route", f"/r{route}"), ("status", str(status))))
+    start = time.perf_counter()
+    for _ in range(100):
+        registry.render()
+    print(f"render 90 series       {(time.perf_counter() - start) / 100 * 1000:7.2f} ms")
+
+
+def main() -> None:
+    _bench_middleware()
+    _bench_timer()
+    _bench_render()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Бенчмарк записи заказов: одна транзакция на заказ против write-behind
+очереди с пачками разного размера.
+
+Запуск: python -m benchmarks.bench_orders
+"""
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from app.schemas.orders import Order
+from app.services.order_store import OrderStore
+from app.services.order_writer import OrderWriter
+
+ORDERS = 5000
+
+
+def _orders(prefix: str) -> list[Order]:
+    now = datetime.now(timezone.utc)
+    return [
+        Order(id=f"{prefix}-{i}", customer_name="Client", phone="+79000000000", status="new", created_at=now,
+              details={"customer_name": "Client", "preferred_time": "10:00"})
+        for i in range(ORDERS)
+    ]
+
+
+def _report(name: str, elapsed: float, batches: int) -> None:
+    print(f"{name:<16} {ORDERS / elapsed:9.0f} orders/s  batches={batches}")
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        store = OrderStore(Path(tmp) / "orders.db", max_workers=1)
+
+        orders = _orders("single")
+        start = time.perf_counter()
+        for order in orders:
+            store.add_orders([order])
+        _report("per-order", time.perf_counter() - start, ORDERS)
+
+        for batch_size in (10, 100, 1000):
+            writer = OrderWriter(store_factory=lambda: store, max_queue=ORDERS, batch_size=batch_size)
+            orders = _orders(f"batch{batch_size}")
+            start = time.perf_counter()
+            for order in orders:
+                writer.submit(order)
+            writer.flush(60)
+            _report(f"write-behind/{batch_size}", time.perf_counter() - start, writer.batches)
+            writer.stop()
+
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
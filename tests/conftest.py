@@ -0,0 +1,25 @@
+import json
+import pytest
+
+
+class FakeClock:
+    """Часы, которые двигает сам тест: clock.now += 10."""
+
+    def __init__(self, now: float = 1000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+@pytest.fixture
+def webhook_body():
+    """Сырое тело вебхука VAPI для сообщения, как его получает /inbound."""
+    def build(message) -> bytes:
+        return json.dumps({"message": message}).encode("utf-8")
+    return build
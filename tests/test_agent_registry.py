@@ -0,0 +1,136 @@
+import json
+import pytest
+import yaml
+from httpx import AsyncClient, ASGITransport
+from app.handlers import inbound
+from app.services import agent_registry as agent_registry_module
+from app.services.agent_registry import AgentRegistry, normalize_number
+
+
+def _agent(agent_id, prompt, **extra):
+    return {"id": agent_id, "name": agent_id.title(), "voice": "en-US-Neural2-F", "prompt": prompt, **extra}
+
+
+def _write(path, agents):
+    path.write_text(yaml.safe_dump({"agents": agents}, allow_unicode=True), encoding="utf-8")
+
+
+@pytest.fixture
+def agents_file(tmp_path):
+    path = tmp_path / "agents.yaml"
+    _write(path, [
+        _agent("support-agent", "Support prompt", phone_numbers=["+1 (555) 010-0001"], assistant_ids=["asst-support"]),
+        _agent("sales-agent", "Sales prompt", phone_numbers=["+15550100002"], dynamic_fields={"budget": "Budget"}),
+    ])
+    return path
+
+
+def _prompt(body):
+    return json.loads(body)["assistant"]["model"]["messages"][0]["content"]
+
+
+def test_repo_agents_file_loads():
+    index = AgentRegistry().current()
+    assert {"support-agent", "sales-agent"} <= set(index.by_id)
+    # Агенты из поставляемого файла достижимы
+    assert not index.unreachable & {"support-agent", "sales-agent"}
+
+
+@pytest.mark.asyncio
+async def test_agent_without_routes_is_flagged(tmp_path, monkeypatch):
+    from app.main import app
+
+    path = tmp_path / "agents.yaml"
+    _write(path, [
+        _agent("routed", "Routed", phone_numbers=["+15550100001"]),
+        _agent("orphan", "Orphan"),
+        _agent("shadowed", "Shadowed", phone_numbers=["+15550100001"]),
+    ])
+    registry = AgentRegistry(str(path))
+    assert registry.current().unreachable == {"orphan", "shadowed"}
+
+    monkeypatch.setattr("app.main.agent_registry", registry)
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        agents = (await ac.get("/v1/agents")).json()
+    assert {a["id"]: a["routable"] for a in agents} == {"routed": True, "orphan": False, "shadowed": False}
+
+
+def test_routes_by_assistant_id_and_number(agents_file):
+    registry = AgentRegistry(str(agents_file))
+
+    by_assistant = registry.resolve({"call": {"assistantId": "asst-support"}})
+    by_number = registry.resolve({"phoneNumber": {"number": "+1-555-010-0002"}})
+
+    assert by_assistant.agent.id == "support-agent"
+    assert by_number.agent.id == "sales-agent"
+    assert registry.resolve({"phoneNumber": {"number": "+10000000000"}}) is None
+    assert registry.resolve({}) is None
+    assert normalize_number("+1 (555) 010-0001") == "+15550100001"
+
+
+def test_agents_are_precompiled_and_inherit_base(agents_file):
+    registry = AgentRegistry(str(agents_file))
+    index = registry.current()
+    assert registry.builds == 2
+
+    sales = index.by_id["sales-agent"]
+    assert sales.cache.rebuilds == 1
+    assert _prompt(sales.response(sales.base)).startswith("Sales prompt")
+    assert sales.cache.rebuilds == 1
+    assert sales.settings.voice_settings.dynamic_fields == {"budget": "Budget"}
+    # Поля, не заданные агенту, берутся из основной конфигурации
+    support = index.by_id["support-agent"]
+    assert support.settings.voice_settings.dynamic_fields == support.base.voice_settings.dynamic_fields
+
+
+def test_reload_rebuilds_only_changed_agents(agents_file):
+    registry = AgentRegistry(str(agents_file))
+    before = registry.current()
+    support_body = before.by_id["support-agent"].response(before.by_id["support-agent"].base)
+
+    _write(agents_file, [
+        _agent("support-agent", "Support prompt", phone_numbers=["+1 (555) 010-0001"], assistant_ids=["asst-support"]),
+        _agent("sales-agent", "New sales prompt", phone_numbers=["+15550100002"]),
+        _agent("billing-agent", "Billing prompt"),
+    ])
+    after = registry.reload()
+
+    assert registry.builds == 4
+    assert after.by_id["support-agent"] is before.by_id["support-agent"]
+    support = after.by_id["support-agent"]
+    assert support.response(support.base) is support_body
+    assert after.by_id["sales-agent"] is not before.by_id["sales-agent"]
+    sales = after.by_id["sales-agent"]
+    assert _prompt(sales.response(sales.base)).startswith("New sales prompt")
+
+
+def test_invalid_agent_is_skipped_and_broken_file_keeps_registry(agents_file):
+    registry = AgentRegistry(str(agents_file))
+    registry.current()
+
+    _write(agents_file, [_agent("ok-agent", "OK"), {"id": "broken"}])
+    assert set(registry.reload().by_id) == {"ok-agent"}
+
+    agents_file.write_text("agents: [unclosed", encoding="utf-8")
+    assert set(registry.reload().by_id) == {"ok-agent"}
+
+
+@pytest.mark.asyncio
+async def test_inbound_uses_agent_payload(agents_file, monkeypatch):
+    from app.main import app
+
+    registry = AgentRegistry(str(agents_file))
+    monkeypatch.setattr(inbound, "agent_registry", registry)
+    monkeypatch.setattr(agent_registry_module, "agent_registry", registry)
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        routed = await ac.post("/inbound", json={"message": {
+            "type": "assistant-request", "call": {"assistantId": "asst-support"}
+        }})
+        default = await ac.post("/inbound", json={"message": {"type": "assistant-request"}})
+
+    assert _prompt(routed.content).startswith("Support prompt")
+    assert "messages" not in default.json()["assistant"]["model"] or \
+        not _prompt(default.content).startswith("Support prompt")
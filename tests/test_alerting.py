@@ -0,0 +1,88 @@
+from app.core.alerting import AlertSuppressor, normalize_message
+
+
+def _record(message, line=10):
+    return {"module": "inbound", "function": "handler", "line": line, "message": message}
+
+
+def test_normalize_message_masks_variable_parts():
+    a = normalize_message("Timeout after 5.2s for call 'abc' id=550e8400-e29b-41d4-a716-446655440000")
+    b = normalize_message("Timeout after 7s for call 'xyz' id=123e4567-e89b-12d3-a456-426614174000")
+    assert a == b
+    assert "<uuid>" in a and "<str>" in a and "<n>" in a
+
+
+def test_first_occurrence_alerts_and_repeats_are_summarized(clock):
+    suppressor = AlertSuppressor(window=60, clock=clock)
+
+    assert suppressor.should_alert(_record("DB error on attempt 1"))
+    for attempt in range(2, 50):
+        clock.now += 0.5
+        assert not suppressor.should_alert(_record(f"DB error on attempt {attempt}"))
+
+    assert suppressor.collect_summaries() == []
+
+    clock.now += 37
+    summaries = suppressor.collect_summaries()
+    assert len(summaries) == 1
+    # Сводка называет реальный охваченный промежуток
+    assert "<b>x48</b> in last 61s" in summaries[0]
+
+    # Следующее окно без повторов — отпечаток забывается и снова алертит сразу
+    clock.now += 61
+    assert suppressor.collect_summaries() == []
+    assert suppressor.should_alert(_record("DB error on attempt 99"))
+
+
+def test_window_slides_from_last_occurrence(clock):
+    suppressor = AlertSuppressor(window=60, clock=clock)
+    assert suppressor.should_alert(_record("boom"))
+    clock.now += 1
+    assert not suppressor.should_alert(_record("boom"))
+    clock.now += 59
+    [summary] = suppressor.collect_summaries()
+    assert "<b>x1</b> in last 60s" in summary
+
+    # Ошибка молчала больше окна — новое появление уходит сразу, а не в сводку
+    clock.now += 40
+    assert suppressor.should_alert(_record("boom"))
+    # Повторы с паузами короче окна подавляются; сводка — не чаще раза в окно
+    summaries = []
+    for _ in range(12):
+        clock.now += 10
+        assert not suppressor.should_alert(_record("boom"))
+        summaries.extend(suppressor.collect_summaries())
+    assert len(summaries) == 2
+    assert all("<b>x6</b> in last 60s" in summary for summary in summaries)
+
+    # Целое окно без повторов — отпечаток забыт
+    clock.now += 60
+    assert suppressor.collect_summaries() == []
+    assert len(suppressor) == 0
+
+
+def test_distinct_call_sites_alert_independently(clock):
+    suppressor = AlertSuppressor(clock=clock)
+    assert suppressor.should_alert(_record("boom", line=10))
+    assert suppressor.should_alert(_record("boom", line=20))
+    assert not suppressor.should_alert(_record("boom", line=10))
+
+
+def test_fingerprint_table_is_bounded(clock):
+    suppressor = AlertSuppressor(max_fingerprints=100, clock=clock)
+    for i in range(10_000):
+        suppressor.should_alert(_record("flood", line=i))
+
+    assert len(suppressor) == 100
+    assert suppressor.evicted == 9_900
+
+
+def test_flush_summarizes_before_window_ends(clock):
+    suppressor = AlertSuppressor(window=60, clock=clock)
+    suppressor.should_alert(_record("boom"))
+    suppressor.should_alert(_record("boom"))
+
+    clock.now += 5
+    assert suppressor.collect_summaries() == []
+    [summary] = suppressor.collect_summaries(flush=True)
+    assert "<b>x1</b>" in summary
@@ -0,0 +1,113 @@
+import pytest
+from app.handlers import inbound
+from app.services import call_sessions as call_sessions_module
+from app.services.call_sessions import MAX_TURN_CHARS, CallSession, CallSessionStore
+
+
+def test_session_is_created_once_and_keeps_recent_turns(clock):
+    store = CallSessionStore(max_turns=3, clock=clock)
+
+    session = store.touch("c1")
+    for i in range(5):
+        clock.now += 1
+        store.touch("c1").add_turn("user", f"turn {i}", clock.now)
+
+    assert store.touch("c1") is session
+    assert [text for _, _, text in session.turns] == ["turn 2", "turn 3", "turn 4"]
+    assert session.messages == 7
+    session.add_turn("user", "x" * (MAX_TURN_CHARS * 2), clock.now)
+    assert len(session.turns[-1][2]) == MAX_TURN_CHARS
+
+
+def test_idle_sessions_expire_by_ttl(clock):
+    store = CallSessionStore(ttl=60, clock=clock)
+
+    store.touch("idle")
+    clock.now += 30
+    store.touch("active")
+    clock.now += 40
+
+    # "idle" простаивал 70 секунд, "active" — 40
+    assert store.get("idle") is None
+    assert store.get("active") is not None
+
+    clock.now += 60
+    store.touch("new")
+    assert len(store) == 1
+    assert store.stats()["evicted_ttl"] == 2
+
+
+def test_capacity_evicts_least_recently_seen(clock):
+    store = CallSessionStore(max_sessions=3, clock=clock)
+
+    for call_id in ("a", "b", "c"):
+        clock.now += 1
+        store.touch(call_id)
+    store.touch("a")
+    store.touch("d")
+
+    assert len(store) == 3
+    assert store.get("b") is None
+    assert store.get("a") is not None
+    assert store.stats()["evicted_capacity"] == 1
+
+
+def test_end_removes_session():
+    store = CallSessionStore()
+    store.touch("c1")
+
+    session = store.end("c1")
+    assert session.ended_at is not None
+    assert store.get("c1") is None
+    assert store.end("c1") is None
+
+
+def test_sessions_use_slots():
+    session = CallSession("c1", 0.0, 5)
+    assert not hasattr(session, "__dict__")
+    with pytest.raises(AttributeError):
+        session.extra = 1
+
+
+def test_handlers_record_transcript_status_and_end(monkeypatch):
+    store = CallSessionStore()
+    monkeypatch.setattr(call_sessions_module, "call_sessions", store)
+    monkeypatch.setattr(inbound, "call_sessions", store)
+    call = {"id": "call-9", "customer": {"number": "+79001234567"}}
+
+    inbound.handle_transcript({"type": "transcript", "call": call, "role": "user",
+                               "transcriptType": "partial", "transcript": "Здрав"})
+    inbound.handle_transcript({"type": "transcript", "call": call, "role": "user",
+                               "transcriptType": "final", "transcript": "Здравствуйте"})
+    inbound.handle_status_update({"type": "status-update", "call": call, "status": "in-progress"})
+
+    session = store.get("call-9").to_dict()
+    assert session["customer_number"] == "+79001234567"
+    assert session["status"] == "in-progress"
+    assert [t["text"] for t in session["turns"]] == ["Здравствуйте"]
+
+    inbound.handle_end_of_call({"type": "end-of-call-report", "call": call})
+    assert store.get("call-9") is None
+
+
+def test_exposed_times_are_wall_clock(clock):
+    store = CallSessionStore(ttl=60, clock=clock, wall_clock=lambda: 1767225600.0 + clock.now)
+
+    store.touch("c1")
+    clock.now += 10
+    session = store.touch("c1").to_dict()
+    assert session["started_at"] == 1767226600.0
+    assert session["last_seen"] == 1767226610.0
+    assert store.end("c1").ended_at == 1767226610.0
+
+
+def test_turns_use_message_time_and_stay_ordered():
+    session = CallSession("c1", 0.0, 3)
+    for at, text in ((10.0, "a"), (30.0, "c"), (20.0, "b"), (5.0, "old"), (40.0, "d"), (25.0, "late")):
+        session.add_turn("user", text, at)
+    # Буфер хранит три последние по времени реплики независимо от порядка обработки
+    assert [text for _, _, text in session.turns] == ["late", "c", "d"]
+
+    message = {"timestamp": 1767225600123}
+    assert call_sessions_module.message_timestamp(message, default=0.0) == 1767225600.123
+    assert call_sessions_module.message_timestamp({}, default=7.0) == 7.0
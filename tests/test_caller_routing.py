@@ -0,0 +1,142 @@
+import json
+import threading
+import pytest
+from httpx import AsyncClient, ASGITransport
+from app.handlers import inbound
+from app.handlers.dispatcher import PRIORITY_DEFAULT, PRIORITY_VIP, MessageDispatcher
+from app.services.caller_routing import (
+    BLOCKED, REGULAR, VIP, CallerRouter, NumberList, caller_from_body, normalize_e164
+)
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("+7 (900) 123-45-67", "+79001234567"),
+    ("8 900 123 45 67", "+79001234567"),
+    ("9001234567", "+79001234567"),
+    ("0015550100001", "+15550100001"),
+    ("+1 555 010 0001", "+15550100001"),
+    ("12345", None),
+    ("not a number", None),
+])
+def test_normalize_e164(raw, expected):
+    assert normalize_e164(raw, "7") == expected
+
+
+def test_number_list_exact_and_prefix_rules():
+    numbers = NumberList.parse([
+        "# спам-диапазоны",
+        "+7 800 *",
+        "8 (495) 111-22-33  # один номер",
+        "+1555*",
+        "",
+        "garbage",
+    ], "7")
+
+    assert len(numbers) == 3
+    assert "+74951112233" in numbers
+    assert "+78005553535" in numbers
+    assert "+15550100001" in numbers
+    assert "+74951112234" not in numbers
+    assert "+7900" not in numbers
+
+
+def test_large_list_lookup():
+    numbers = NumberList([f"+7900{i:07d}" for i in range(100_000)], ["+7801", "+7802"])
+    assert "+79000099999" in numbers
+    assert "+78021234567" in numbers
+    assert "+79100099999" not in numbers
+
+
+def test_router_hot_reload_and_priority(tmp_path):
+    vip, blacklist = tmp_path / "vip.txt", tmp_path / "black.txt"
+    vip.write_text("+79001112233\n", encoding="utf-8")
+    blacklist.write_text("+7800*\n", encoding="utf-8")
+    router = CallerRouter(str(vip), str(blacklist), vip_numbers=[], blacklist_numbers=["+15550100001"])
+
+    assert router.classify("8 900 111 22 33") == VIP
+    assert router.classify("+7 800 555 35 35") == BLOCKED
+    assert router.classify("+15550100001") == BLOCKED
+    assert router.classify("+79990000000") == REGULAR
+    assert router.classify(None) == REGULAR
+
+    # Чёрный список важнее VIP
+    blacklist.write_text("+7800*\n+79001112233\n", encoding="utf-8")
+    router.reload()
+    assert router.classify("+79001112233") == BLOCKED
+    assert set(router.watched_paths()) == {str(vip), str(blacklist)}
+
+
+def test_caller_from_body():
+    body = json.dumps({"message": {"type": "x", "call": {"id": "c", "customer": {"number": "+79001112233"}}}}).encode()
+    assert caller_from_body(body) == "+79001112233"
+    assert caller_from_body(b'{"message": {"type": "x"}}') is None
+
+
+@pytest.mark.asyncio
+async def test_vip_messages_are_processed_first():
+    dispatcher = MessageDispatcher(workers=1)
+    started, gate = threading.Event(), threading.Event()
+    seen = []
+
+    @dispatcher.background("transcript")
+    def handler(message):
+        if message["n"] == "first":
+            started.set()
+            gate.wait(5)
+        seen.append(message["n"])
+
+    def body(n):
+        return json.dumps({"message": {"type": "transcript", "n": n}}).encode()
+
+    await dispatcher.dispatch(body("first"))
+    assert started.wait(5)
+    await dispatcher.dispatch(body("regular"), priority=PRIORITY_DEFAULT)
+    await dispatcher.dispatch(body("vip"), priority=PRIORITY_VIP)
+    gate.set()
+    dispatcher.stop()
+
+    assert seen == ["first", "vip", "regular"]
+
+
+@pytest.mark.asyncio
+async def test_inbound_rejects_blacklisted_before_parsing(tmp_path, monkeypatch):
+    from app.main import app
+
+    router = CallerRouter(None, None, vip_numbers=[], blacklist_numbers=["+7800*"])
+    monkeypatch.setattr(inbound, "caller_router", router)
+
+    # Тело не является корректным JSON: отказ происходит до разбора
+    body = b'{"message": {"type": "assistant-request", "call": {"customer": {"number": "+78005553535"}}, '
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        blocked = await ac.post("/inbound", content=body, headers={"content-type": "application/json"})
+        allowed = await ac.post("/inbound", json={"message": {
+            "type": "assistant-request", "call": {"customer": {"number": "+79001234567"}}
+        }})
+
+    assert blocked.status_code == 200
+    assert "error" in blocked.json()
+    assert "assistant" in allowed.json()
+    assert router.stats()["blocked"] == 1
+
+
+@pytest.mark.asyncio
+async def test_blacklisted_caller_events_of_running_call_are_processed(monkeypatch):
+    from app.main import app
+
+    router = CallerRouter(None, None, vip_numbers=[], blacklist_numbers=["+7800*"])
+    monkeypatch.setattr(inbound, "caller_router", router)
+    handled = []
+    monkeypatch.setitem(inbound.inbound_dispatcher._background, "end-of-call-report", lambda message: handled.append(message["type"]))
+
+    # Номер попал в чёрный список посреди звонка
+    call = {"id": "bl-1", "customer": {"number": "+78005553535"}}
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        tools = await ac.post("/inbound", json={"message": {"type": "tool-calls", "call": call, "toolCallList": []}})
+        report = await ac.post("/inbound", json={"message": {"type": "end-of-call-report", "call": call}})
+    inbound.inbound_dispatcher.stop()
+
+    assert tools.status_code == 200 and "results" in tools.json()
+    assert report.status_code == 202
+    assert handled == ["end-of-call-report"]
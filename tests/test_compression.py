@@ -0,0 +1,158 @@
+import asyncio
+import gzip
+import pytest
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
+from httpx import AsyncClient, ASGITransport
+from app.core import compression
+from app.core.compression import CompressionMiddleware, choose_encoding, etag_matches
+
+BIG = [{"id": i, "text": "повторяющийся текст заказа"} for i in range(200)]
+
+
+def _app(**kwargs):
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, **kwargs)
+    calls = {"orders": 0}
+
+    @app.get("/v1/orders")
+    async def orders():
+        calls["orders"] += 1
+        return BIG
+
+    @app.get("/v1/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/v1/versioned")
+    async def versioned():
+        return Response(content=b"x" * 4096, media_type="text/plain", headers={"ETag": '"v1"', "Cache-Control": "max-age=5"})
+
+    @app.get("/v1/stream")
+    async def stream():
+        async def chunks():
+            for _ in range(3):
+                yield b"y" * 2048
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    @app.get("/v1/events")
+    async def events():
+        async def chunks():
+            # Как /v1/logs/stream: первое событие может прийти нескоро
+            await asyncio.sleep(3600)
+            yield b"data: late\n\n"
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    @app.get("/other")
+    async def other():
+        return BIG
+
+    return app, calls
+
+
+def test_choose_encoding_prefers_brotli_and_honours_q():
+    available = {"gzip": None, "br": None}
+    assert choose_encoding("gzip, deflate, br", available) == "br"
+    assert choose_encoding("gzip, br;q=0", available) == "gzip"
+    assert choose_encoding("*", {"gzip": None}) == "gzip"
+    assert choose_encoding("identity", available) is None
+    assert choose_encoding("", available) is None
+
+
+def test_etag_matching_is_weak():
+    assert etag_matches('W/"abc"', '"abc"')
+    assert etag_matches('"x", "abc"', 'W/"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"abd"', '"abc"')
+
+
+@pytest.mark.asyncio
+async def test_large_json_is_gzipped_with_etag_and_cache_control():
+    app, _ = _app(minimum_size=500)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/v1/orders", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["cache-control"] == "no-cache"
+    assert response.headers["etag"].startswith('W/"')
+    assert int(response.headers["content-length"]) < 1000
+    assert response.json() == BIG
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(compression.brotli is None, reason="brotli is not installed")
+async def test_brotli_when_available():
+    app, _ = _app(minimum_size=500)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/v1/orders", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.json() == BIG
+
+
+@pytest.mark.asyncio
+async def test_repeated_poll_gets_304_and_compression_is_cached(monkeypatch):
+    compressed = []
+    original = compression.COMPRESSORS["gzip"]
+
+    def counting(body):
+        compressed.append(len(body))
+        return original(body)
+
+    monkeypatch.setitem(compression.COMPRESSORS, "gzip", counting)
+    app, calls = _app(minimum_size=500)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        first = await ac.get("/v1/orders", headers={"Accept-Encoding": "gzip"})
+        second = await ac.get("/v1/orders", headers={"Accept-Encoding": "gzip"})
+        polled = await ac.get("/v1/orders", headers={"Accept-Encoding": "gzip", "If-None-Match": first.headers["etag"]})
+
+    # Данные не менялись: сжатие выполнено один раз, опрос с ETag — 304 без тела
+    assert len(compressed) == 1
+    assert second.content == first.content
+    assert polled.status_code == 304 and polled.content == b""
+    assert polled.headers["etag"] == first.headers["etag"]
+    assert calls["orders"] == 3
+
+
+@pytest.mark.asyncio
+async def test_small_streaming_and_foreign_routes_are_left_alone():
+    app, _ = _app(minimum_size=500)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        small = await ac.get("/v1/small", headers={"Accept-Encoding": "gzip"})
+        stream = await ac.get("/v1/stream", headers={"Accept-Encoding": "gzip"})
+        other = await ac.get("/other", headers={"Accept-Encoding": "gzip"})
+        versioned = await ac.get("/v1/versioned", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in small.headers and "etag" in small.headers
+    assert "content-encoding" not in stream.headers and stream.content == b"y" * 6144
+    assert "content-encoding" not in other.headers and "etag" not in other.headers
+    # Версия и политика кэширования обработчика сохраняются
+    assert versioned.headers["etag"] == 'W/"v1"'
+    assert versioned.headers["cache-control"] == "max-age=5"
+    assert gzip.decompress(gzip.compress(versioned.content)) == b"x" * 4096
+
+
+@pytest.mark.asyncio
+async def test_event_stream_headers_are_sent_immediately():
+    app, _ = _app(minimum_size=500)
+    scope = {
+        "type": "http", "method": "GET", "path": "/v1/events", "raw_path": b"/v1/events",
+        "query_string": b"", "headers": [(b"accept-encoding", b"gzip")],
+    }
+    sent = []
+
+    async def receive():
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        sent.append(message)
+
+    task = asyncio.ensure_future(app(scope, receive, send))
+    deadline = asyncio.get_running_loop().time() + 2
+    while not sent and asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(0.01)
+    task.cancel()
+
+    # Заголовки уходят сразу, не дожидаясь первого события, и без сжатия
+    assert sent and sent[0]["type"] == "http.response.start"
+    assert b"content-encoding" not in dict(sent[0]["headers"])
@@ -0,0 +1,93 @@
+import multiprocessing
+import time
+import yaml
+from app.core.config_generation import ConfigGeneration
+from app.core.config_watcher import ConfigStore
+
+WORKERS = 4
+CONVERGENCE_TIMEOUT = 2.0
+
+
+def _write_config(path, prompt):
+    data = {
+        "system_prompt": prompt,
+        "voice_settings": {"provider": "11labs", "voice_id": "adam"},
+    }
+    path.write_text(yaml.dump(data), encoding="utf-8")
+
+
+def _worker(config_path, generation_path, expected_prompt, ready, results):
+    """Имитирует воркер uvicorn: на каждый «запрос» берёт текущий снимок."""
+    store = ConfigStore(config_path, generation=ConfigGeneration(generation_path))
+    store.current()
+    ready.put(True)
+
+    deadline = time.monotonic() + CONVERGENCE_TIMEOUT * 5
+    while time.monotonic() < deadline:
+        if store.current().system_prompt == expected_prompt:
+            results.put(time.time())
+            return
+        time.sleep(0.005)
+    results.put(None)
+
+
+def test_generation_bump_is_visible_across_instances(tmp_path):
+    path = tmp_path / "config.generation"
+    writer = ConfigGeneration(path)
+    reader = ConfigGeneration(path)
+
+    assert reader.read() == 0
+    stamp = writer.bump()
+    assert reader.read() == stamp
+    assert writer.bump() > stamp
+
+
+def test_store_reloads_when_generation_changes(tmp_path):
+    config_file = tmp_path / "settings.yaml"
+    _write_config(config_file, "Old")
+    generation_path = tmp_path / "config.generation"
+
+    worker_a = ConfigStore(str(config_file), generation=ConfigGeneration(generation_path))
+    worker_b = ConfigStore(str(config_file), generation=ConfigGeneration(generation_path))
+    assert worker_b.current().system_prompt == "Old"
+
+    _write_config(config_file, "New")
+    # Без публикации второй воркер продолжает отдавать свой снимок
+    assert worker_b.current().system_prompt == "Old"
+
+    worker_a.publish()
+    assert worker_b.current().system_prompt == "New"
+
+
+def test_worker_processes_converge(tmp_path):
+    config_file = tmp_path / "settings.yaml"
+    _write_config(config_file, "Old")
+    generation_path = tmp_path / "config.generation"
+
+    ctx = multiprocessing.get_context("spawn")
+    ready, results = ctx.Queue(), ctx.Queue()
+    processes = [
+        ctx.Process(
+            target=_worker,
+            args=(str(config_file), str(generation_path), "New", ready, results)
+        )
+        for _ in range(WORKERS)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for _ in processes:
+            ready.get(timeout=30)
+
+        _write_config(config_file, "New")
+        published_at = time.time()
+        ConfigStore(str(config_file), generation=ConfigGeneration(generation_path)).publish()
+
+        converged_at = [results.get(timeout=30) for _ in processes]
+        assert None not in converged_at
+        assert max(converged_at) - published_at < CONVERGENCE_TIMEOUT
+    finally:
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
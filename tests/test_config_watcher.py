@@ -0,0 +1,77 @@
+import time
+import pytest
+import yaml
+from app.core.config_watcher import ConfigStore, ConfigWatcher
+
+
+def _write_config(path, prompt, voice_id="adam", kb_file=None):
+    data = {
+        "system_prompt": prompt,
+        "voice_settings": {"provider": "11labs", "voice_id": voice_id},
+    }
+    if kb_file:
+        data["knowledge_base_file"] = str(kb_file)
+    path.write_text(yaml.dump(data), encoding="utf-8")
+
+
+def _wait_for(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_store_loads_snapshot_lazily(tmp_path):
+    config_file = tmp_path / "settings.yaml"
+    _write_config(config_file, "First prompt")
+
+    store = ConfigStore(str(config_file))
+    assert store.snapshot is None
+    assert store.current().system_prompt == "First prompt"
+    assert store.current() is store.snapshot
+
+
+def test_invalid_config_keeps_last_good_snapshot(tmp_path):
+    config_file = tmp_path / "settings.yaml"
+    _write_config(config_file, "Good prompt")
+    store = ConfigStore(str(config_file))
+    good = store.current()
+
+    # voice_id пустой — не проходит валидацию
+    _write_config(config_file, "Broken prompt", voice_id="")
+    assert store.reload() is good
+    assert store.current().system_prompt == "Good prompt"
+
+
+def test_snapshot_is_immutable(tmp_path):
+    config_file = tmp_path / "settings.yaml"
+    _write_config(config_file, "Prompt")
+    store = ConfigStore(str(config_file))
+
+    with pytest.raises(Exception):
+        store.current().system_prompt = "Changed"
+
+
+def test_watcher_picks_up_file_changes(tmp_path):
+    config_file = tmp_path / "settings.yaml"
+    kb_file = tmp_path / "kb.txt"
+    kb_file.write_text("v1", encoding="utf-8")
+    _write_config(config_file, "Before", kb_file=kb_file)
+
+    store = ConfigStore(str(config_file))
+    watcher = ConfigWatcher(store, interval=0.05)
+    watcher.start()
+    try:
+        assert store.current().system_prompt == "Before"
+
+        _write_config(config_file, "After", kb_file=kb_file)
+        assert _wait_for(lambda: store.current().system_prompt == "After")
+
+        # Изменение базы знаний тоже приводит к новому снимку
+        snapshot = store.current()
+        kb_file.write_text("v2 with more content", encoding="utf-8")
+        assert _wait_for(lambda: store.current() is not snapshot)
+    finally:
+        watcher.stop()
@@ -0,0 +1,163 @@
+import multiprocessing
+import os
+import time
+import pytest
+import yaml
+from httpx import AsyncClient, ASGITransport
+from app import main
+from app.core.config_watcher import ConfigStore
+from app.core.config_writer import ConfigConflict, ConfigWriter
+from app.main import app
+
+CONFIG = {
+    "system_prompt": "Первая версия",
+    "voice_settings": {"provider": "11labs", "voice_id": "voice-1"},
+}
+
+
+def _writer(tmp_path, keep=3):
+    path = tmp_path / "settings.yaml"
+    path.write_text(yaml.dump(CONFIG, allow_unicode=True), encoding="utf-8")
+    os.chmod(path, 0o640)
+    store = ConfigStore(config_path=str(path))
+    return ConfigWriter(store, history_dir=str(tmp_path / "history"), keep=keep), path
+
+
+def _with_prompt(prompt):
+    return {**CONFIG, "system_prompt": prompt}
+
+
+def test_write_is_atomic_and_keeps_history(tmp_path):
+    writer, path = _writer(tmp_path)
+    _, etag = writer.store.rendered()
+
+    new_etag = writer.write(_with_prompt("Вторая версия"), if_match=etag)
+
+    assert yaml.safe_load(path.read_text(encoding="utf-8"))["system_prompt"] == "Вторая версия"
+    assert writer.store.current().system_prompt == "Вторая версия"
+    assert writer.store.rendered()[1] == new_etag != etag
+    # Права файла сохранены, временных файлов не осталось
+    assert path.stat().st_mode & 0o777 == 0o640
+    assert sorted(p.name for p in tmp_path.iterdir()) == [".settings.yaml.lock", "history", "settings.yaml"]
+    [saved] = writer.history()
+    assert yaml.safe_load((tmp_path / "history" / f"{int(saved['version']):020d}.yaml").read_text())["system_prompt"] == "Первая версия"
+
+
+def test_if_match_rejects_stale_version(tmp_path):
+    writer, path = _writer(tmp_path)
+    _, etag = writer.store.rendered()
+    writer.write(_with_prompt("Чужая правка"), if_match=etag)
+
+    with pytest.raises(ConfigConflict) as error:
+        writer.write(_with_prompt("Моя правка"), if_match=etag)
+    assert error.value.current_etag == writer.store.rendered()[1]
+    assert writer.store.current().system_prompt == "Чужая правка"
+
+    # "*" и запись без If-Match не проверяют версию
+    writer.write(_with_prompt("Принудительно"), if_match="*")
+    writer.write(_with_prompt("Без условия"))
+    assert writer.store.current().system_prompt == "Без условия"
+
+
+def _write_from_process(tmp_path, prompt, if_match, results):
+    writer = ConfigWriter(
+        ConfigStore(config_path=str(tmp_path / "settings.yaml")),
+        history_dir=str(tmp_path / "history")
+    )
+    archive = writer._archive
+
+    def slow_archive(path):
+        # Окно между проверкой If-Match и заменой файла, в которое без flock
+        # успевает пролезть второй воркер
+        time.sleep(0.3)
+        archive(path)
+
+    writer._archive = slow_archive
+    try:
+        writer.write(_with_prompt(prompt), if_match=if_match)
+        results.put(("ok", prompt))
+    except ConfigConflict:
+        results.put(("conflict", prompt))
+
+
+def test_if_match_holds_across_processes(tmp_path):
+    _, path = _writer(tmp_path)
+    _, etag = ConfigStore(config_path=str(path)).rendered()
+
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    workers = [
+        ctx.Process(target=_write_from_process, args=(tmp_path, prompt, etag, results))
+        for prompt in ("Воркер 1", "Воркер 2")
+    ]
+    for worker in workers:
+        worker.start()
+    outcomes = sorted(results.get(timeout=10) for _ in workers)
+    for worker in workers:
+        worker.join(timeout=10)
+
+    assert [status for status, _ in outcomes] == ["conflict", "ok"]
+    [winner] = [prompt for status, prompt in outcomes if status == "ok"]
+    assert yaml.safe_load(path.read_text(encoding="utf-8"))["system_prompt"] == winner
+
+
+def test_invalid_config_leaves_file_untouched(tmp_path):
+    writer, path = _writer(tmp_path)
+    before = path.read_bytes()
+    with pytest.raises(ValueError):
+        writer.write({"system_prompt": "Нет голоса"})
+    assert path.read_bytes() == before
+    assert writer.history() == []
+
+
+def test_history_is_bounded_and_rollback_restores(tmp_path):
+    writer, path = _writer(tmp_path, keep=2)
+    for i in range(4):
+        writer.write(_with_prompt(f"Версия {i}"))
+
+    history = writer.history()
+    assert len(history) == 2
+    # Новые сверху: последняя сохранённая — версия перед текущей
+    newest = history[0]["version"]
+    writer.rollback(newest)
+    assert writer.store.current().system_prompt == "Версия 2"
+    assert len(writer.history()) == 2
+
+    with pytest.raises(KeyError):
+        writer.rollback("12345")
+    with pytest.raises(KeyError):
+        writer.rollback("../settings")
+
+
+@pytest.mark.asyncio
+async def test_get_config_supports_conditional_requests():
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        first = await ac.get("/v1/config")
+        etag = first.headers["etag"]
+        cached = await ac.get("/v1/config", headers={"If-None-Match": etag})
+        other = await ac.get("/v1/config", headers={"If-None-Match": '"stale"'})
+
+    assert first.status_code == 200 and "system_prompt" in first.json()
+    assert cached.status_code == 304 and cached.content == b""
+    assert cached.headers["etag"] == etag
+    assert other.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_post_config_with_stale_if_match_returns_412(tmp_path, monkeypatch):
+    writer, _ = _writer(tmp_path)
+    monkeypatch.setattr(main, "config_writer", writer)
+    _, etag = writer.store.rendered()
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        ok = await ac.post("/v1/config", json=_with_prompt("Новая"), headers={"If-Match": etag})
+        stale = await ac.post("/v1/config", json=_with_prompt("Устаревшая"), headers={"If-Match": etag})
+        history = await ac.get("/v1/config/history")
+        rollback = await ac.post(f"/v1/config/rollback/{history.json()[0]['version']}", headers={"If-Match": ok.headers["etag"]})
+
+    assert ok.status_code == 200 and ok.json()["status"] == "success"
+    assert stale.status_code == 412 and stale.headers["etag"] == ok.headers["etag"]
+    assert rollback.status_code == 200
+    assert writer.store.current().system_prompt == "Первая версия"
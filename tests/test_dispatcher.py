@@ -0,0 +1,106 @@
+import threading
+import pytest
+from httpx import AsyncClient, ASGITransport
+from app.core.metrics import Histogram
+from app.handlers import inbound
+from app.handlers.dispatcher import MessageDispatcher
+
+
+def _dispatcher(**kwargs):
+    dispatcher = MessageDispatcher(**kwargs)
+    seen = []
+
+    @dispatcher.inline("assistant-request")
+    async def assistant(message):
+        return {"assistant": message.get("call", {}).get("id")}
+
+    @dispatcher.background("transcript", "status-update")
+    def telemetry(message):
+        seen.append(message["type"])
+
+    return dispatcher, seen
+
+
+def test_background_detection_never_hides_inline_types(webhook_body):
+    dispatcher, _ = _dispatcher()
+
+    assert dispatcher.is_background(webhook_body({"type": "transcript", "transcript": "hi"}))
+    # Вложенный "type" фонового вида не должен увести срочное сообщение в фон
+    assert not dispatcher.is_background(webhook_body({"call": {"type": "transcript"}, "type": "assistant-request"}))
+    assert not dispatcher.is_background(webhook_body({"type": "unknown-event"}))
+    assert not dispatcher.is_background(b"not json")
+
+
+@pytest.mark.asyncio
+async def test_inline_and_background_routing(webhook_body):
+    dispatcher, seen = _dispatcher(workers=2)
+
+    assert await dispatcher.dispatch(webhook_body({"type": "assistant-request", "call": {"id": "c1"}})) == {"assistant": "c1"}
+    for _ in range(5):
+        assert await dispatcher.dispatch(webhook_body({"type": "transcript"})) is None
+    assert await dispatcher.dispatch(webhook_body({"type": "status-update"})) is None
+    dispatcher.stop()
+
+    assert sorted(seen) == ["status-update"] + ["transcript"] * 5
+    stats = dispatcher.stats()["types"]
+    assert stats["assistant-request"]["inline"] == 1
+    assert stats["transcript"]["background"] == 5 and stats["transcript"]["inline"] == 0
+    assert stats["transcript"]["latency"]["count"] == 5
+
+
+@pytest.mark.asyncio
+async def test_full_queue_is_processed_by_caller(webhook_body):
+    dispatcher = MessageDispatcher(workers=1, max_queue=1)
+    started, gate = threading.Event(), threading.Event()
+    seen = []
+
+    @dispatcher.background("transcript")
+    def slow(message):
+        if message["n"] == 0:
+            started.set()
+            gate.wait(5)
+        seen.append(message["n"])
+
+    await dispatcher.dispatch(webhook_body({"type": "transcript", "n": 0}))
+    assert started.wait(5)
+    # Воркер занят, в очереди одно сообщение: третье обработает сам запрос
+    for n in (1, 2):
+        await dispatcher.dispatch(webhook_body({"type": "transcript", "n": n}))
+    assert seen == [2]
+    gate.set()
+    dispatcher.stop()
+
+    assert sorted(seen) == [0, 1, 2]
+    assert dispatcher.stats()["types"]["transcript"]["overflow"] == 1
+
+
+def test_histogram_quantiles():
+    histogram = Histogram(buckets=(0.001, 0.01, 0.1))
+    for value in [0.0005] * 90 + [0.05] * 10:
+        histogram.observe(value)
+
+    assert histogram.quantile(0.5) == 0.001
+    assert histogram.quantile(0.99) == 0.1
+    assert histogram.snapshot()["buckets"] == {"0.001": 90, "0.01": 90, "0.1": 100, "+Inf": 100}
+
+
+@pytest.mark.asyncio
+async def test_inbound_telemetry_returns_202(monkeypatch):
+    from app.main import app
+
+    dispatcher = MessageDispatcher(workers=1)
+    dispatcher._inline.update(inbound.inbound_dispatcher._inline)
+    dispatcher._inline_types.update(inbound.inbound_dispatcher._inline_types)
+    dispatcher.background("transcript")(lambda message: None)
+    monkeypatch.setattr(inbound, "inbound_dispatcher", dispatcher)
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        telemetry = await ac.post("/inbound", json={"message": {"type": "transcript", "transcript": "hello"}})
+        assistant = await ac.post("/inbound", json={"message": {"type": "assistant-request"}})
+    dispatcher.stop()
+
+    assert telemetry.status_code == 202
+    assert telemetry.json() == {"status": "received", "vapi_status": "success"}
+    assert assistant.status_code == 200 and "assistant" in assistant.json()
+    assert dispatcher.stats()["types"]["transcript"]["background"] == 1
@@ -0,0 +1,60 @@
+import json
+import pytest
+from httpx import AsyncClient, ASGITransport
+from app.main import app
+from app.core.config_loader import AppSettings
+from app.core.config_watcher import get_current_config
+from app.services.assistant_payload import AssistantResponseCache, assistant_response_cache
+
+
+def _make_config(**fields) -> AppSettings:
+    return AppSettings(
+        system_prompt="Base prompt",
+        voice_settings={
+            "provider": "11labs",
+            "voice_id": "adam",
+            "dynamic_fields": fields
+        }
+    )
+
+
+def test_cache_reuses_body_for_same_config():
+    cache = AssistantResponseCache()
+    config = _make_config(customer_name="Client name")
+
+    first = cache.get(config)
+    second = cache.get(config)
+
+    assert first is second
+    assert cache.rebuilds == 1
+
+    payload = json.loads(first)
+    tools = payload["assistant"]["model"]["tools"]
+    assert tools[0]["function"]["parameters"]["required"] == ["customer_name"]
+
+
+def test_cache_keyed_by_content_not_identity():
+    cache = AssistantResponseCache()
+
+    cache.get(_make_config(customer_name="Client name"))
+    # Новый объект с тем же содержимым не должен пересобирать ответ
+    cache.get(_make_config(customer_name="Client name"))
+    assert cache.rebuilds == 1
+
+    body = cache.get(_make_config(customer_email="Email"))
+    assert cache.rebuilds == 2
+    assert "customer_email" in body.decode("utf-8")
+
+
+@pytest.mark.asyncio
+async def test_assistant_request_returns_cached_payload():
+    assistant_response_cache.clear()
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        response = await ac.post("/inbound", json={"message": {"type": "assistant-request"}})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.content == assistant_response_cache.get(get_current_config())
+    assert "tools" in response.json()["assistant"]["model"]
@@ -0,0 +1,116 @@
+import threading
+import pytest
+from app.services import knowledge_base
+from app.services.knowledge_base import KnowledgeBase, split_chunks
+
+
+@pytest.fixture
+def small_segments(monkeypatch):
+    # Маленькие сегменты, чтобы проверить инкрементальную пересборку на коротком тексте
+    monkeypatch.setattr(knowledge_base, "MIN_SEGMENT_CHUNKS", 2)
+    monkeypatch.setattr(knowledge_base, "AVG_SEGMENT_CHUNKS", 3)
+    monkeypatch.setattr(knowledge_base, "MAX_SEGMENT_CHUNKS", 4)
+
+
+def _corpus(n):
+    topics = ["billing invoices refunds", "voice assistant webhooks", "calendar booking slots", "доставка заказов курьером"]
+    return "\n\n".join(f"Paragraph {i}: {topics[i % len(topics)]} section {i}." for i in range(n))
+
+
+def test_split_chunks_by_paragraph():
+    text = "First paragraph.\n\nSecond paragraph.\n   \nThird " + "word " * 400
+    chunks = split_chunks(text)
+    assert chunks[:2] == ["First paragraph.", "Second paragraph."]
+    assert all(len(chunk) <= knowledge_base.MAX_CHUNK_CHARS for chunk in chunks)
+    assert len(chunks) == 4
+
+
+def test_search_ranks_relevant_chunks(tmp_path):
+    source = tmp_path / "kb.txt"
+    source.write_text(_corpus(40), encoding="utf-8")
+    kb = KnowledgeBase(source, tmp_path / "index")
+    kb.build()
+
+    results = kb.search("refunds for invoices", k=3)
+    assert len(results) == 3
+    assert all("refunds" in chunk.text for chunk in results)
+    assert results[0].score >= results[-1].score
+
+    # Кириллица токенизируется так же, как латиница
+    assert "курьером" in kb.search("курьером", k=1)[0].text
+    assert kb.search("nonexistentterm") == []
+
+
+def test_index_is_reused_from_disk(tmp_path):
+    source = tmp_path / "kb.txt"
+    source.write_text(_corpus(20), encoding="utf-8")
+    KnowledgeBase(source, tmp_path / "index").build()
+
+    reopened = KnowledgeBase(source, tmp_path / "index")
+    reopened.build()
+    assert reopened.segments_built == 0
+    assert reopened.search("webhooks", k=1)
+
+
+def test_rebuild_is_incremental(tmp_path, small_segments):
+    source = tmp_path / "kb.txt"
+    source.write_text(_corpus(60), encoding="utf-8")
+    kb = KnowledgeBase(source, tmp_path / "index")
+    kb.build()
+    total = kb.segments_built
+    assert total > 5
+
+    # Дописываем абзац в конец — большинство сегментов должны переиспользоваться
+    with open(source, "a", encoding="utf-8") as f:
+        f.write("\n\nBrand new paragraph about loyalty points.")
+    assert kb.build()
+
+    assert kb.segments_built - total <= 2
+    assert kb.segments_reused >= total - 2
+    assert "loyalty" in kb.search("loyalty points", k=1)[0].text
+    # Файлы неиспользуемых сегментов удаляются
+    assert len(list((tmp_path / "index").glob("seg-*.bin"))) == len(kb._snapshot.segments)
+
+
+def test_refresh_rebuilds_in_background(tmp_path):
+    source = tmp_path / "kb.txt"
+    source.write_text("Old content about pricing.", encoding="utf-8")
+    kb = KnowledgeBase(source, tmp_path / "index", check_interval=0)
+    kb.build()
+
+    source.write_text("New content about discounts and pricing.", encoding="utf-8")
+    import time
+    deadline = time.monotonic() + 3
+    while time.monotonic() < deadline:
+        results = kb.search("discounts")
+        if results:
+            break
+        time.sleep(0.02)
+    assert results and "discounts" in results[0].text
+
+
+def test_workers_sharing_index_dir_build_concurrently(tmp_path, small_segments):
+    source = tmp_path / "kb.txt"
+    source.write_text(_corpus(60), encoding="utf-8")
+    index_dir = tmp_path / "index"
+    # Каждый экземпляр — как отдельный воркер со своим снимком индекса
+    workers = [KnowledgeBase(source, index_dir) for _ in range(4)]
+    errors = []
+
+    def build(kb):
+        try:
+            kb.build()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=build, args=(kb,)) for kb in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    # Собрал один воркер, остальные взяли его манифест
+    assert sum(1 for kb in workers if kb.segments_built) == 1
+    assert not list(index_dir.glob("*.tmp"))
+    assert all("курьером" in kb.search("курьером", k=1)[0].text for kb in workers)
@@ -0,0 +1,142 @@
+import asyncio
+import pytest
+from app.core.load_shedding import LoadShedder
+from app.handlers.dispatcher import PRIORITY_DEFAULT, PRIORITY_VIP, MessageDispatcher
+
+
+@pytest.mark.asyncio
+async def test_budget_queues_then_sheds():
+    shedder = LoadShedder({"tool-calls": (1, 1)})
+    budget = shedder.budget_for("tool-calls")
+
+    assert await shedder.acquire(budget)
+    waiting = asyncio.ensure_future(shedder.acquire(budget))
+    await asyncio.sleep(0)
+    # Очередь класса (1) занята — следующее событие отбрасывается сразу
+    assert not await shedder.acquire(budget)
+    assert not waiting.done()
+
+    shedder.release(budget)
+    assert await waiting
+    shedder.release(budget)
+
+    stats = shedder.stats()["classes"]["tool-calls"]
+    assert stats["in_flight"] == 0 and stats["queued"] == 0
+    assert stats["admitted"] == 2 and stats["shed"] == 1
+    assert budget.wait.count == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_frees_its_place():
+    shedder = LoadShedder({"tool-calls": (1, 4)})
+    budget = shedder.budget_for("tool-calls")
+    assert await shedder.acquire(budget)
+
+    waiting = asyncio.ensure_future(shedder.acquire(budget))
+    await asyncio.sleep(0)
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+
+    shedder.release(budget)
+    assert budget.in_flight == 0 and not budget.waiters
+
+
+@pytest.mark.asyncio
+async def test_at_risk_follows_critical_class(clock):
+    shedder = LoadShedder(
+        {"assistant-request": (1, 4), "tool-calls": (1, 4)},
+        critical=("assistant-request",),
+        slo=0.1,
+        clock=clock
+    )
+    assistant = shedder.budget_for("assistant-request")
+    assert not shedder.at_risk()
+
+    # Ожидающий assistant-request — уже угроза SLO
+    assert await shedder.acquire(assistant)
+    waiting = asyncio.ensure_future(shedder.acquire(assistant))
+    await asyncio.sleep(0)
+    assert shedder.at_risk()
+    shedder.release(assistant, elapsed=0.01)
+    await waiting
+
+    # Медленные ответы поднимают скользящую латентность выше SLO
+    for _ in range(10):
+        shedder.release(assistant, elapsed=1.0)
+        assistant.in_flight += 1
+    assert shedder.at_risk()
+    # Без новых замеров старый всплеск перестаёт считаться угрозой
+    clock.now += 10
+    assert not shedder.at_risk()
+
+
+def test_vip_budget_falls_back_to_class_and_default():
+    shedder = LoadShedder({"assistant-request": (1, 1), "assistant-request:vip": (1, 1), "*": (1, 1)})
+    assert shedder.budget_for("assistant-request", vip=True).name == "assistant-request:vip"
+    assert shedder.budget_for("assistant-request").name == "assistant-request"
+    assert shedder.budget_for("unknown-event", vip=True).name == "*"
+
+
+def _dispatcher(shedder):
+    dispatcher = MessageDispatcher(workers=1, shedder=shedder)
+    seen = []
+
+    @dispatcher.inline("assistant-request")
+    async def assistant(message):
+        return {"call": message["call"]["id"]}
+
+    @dispatcher.background("transcript", sheddable=True)
+    def transcript(message):
+        seen.append("transcript")
+
+    @dispatcher.background("end-of-call-report")
+    def report(message):
+        seen.append("end-of-call-report")
+
+    return dispatcher, seen
+
+
+@pytest.mark.asyncio
+async def test_telemetry_is_shed_first_when_assistant_slo_at_risk(webhook_body):
+    shedder = LoadShedder({"assistant-request": (1, 4)}, critical=("assistant-request",))
+    dispatcher, seen = _dispatcher(shedder)
+    budget = shedder.budget_for("assistant-request")
+
+    # Занимаем слот и ставим assistant-request в очередь класса
+    assert await shedder.acquire(budget)
+    waiting = asyncio.ensure_future(dispatcher.dispatch(webhook_body({"type": "assistant-request", "call": {"id": "c1"}})))
+    await asyncio.sleep(0)
+    assert shedder.at_risk()
+
+    assert await dispatcher.dispatch(webhook_body({"type": "transcript", "transcript": "hi"})) is None
+    assert await dispatcher.dispatch(webhook_body({"type": "end-of-call-report"})) is None
+
+    shedder.release(budget)
+    assert await waiting == {"call": "c1"}
+    assert await dispatcher.dispatch(webhook_body({"type": "transcript", "transcript": "hi"})) is None
+    dispatcher.stop()
+
+    # Отчёт о звонке не отбрасывается, телеметрия — только пока была угроза
+    assert sorted(seen) == ["end-of-call-report", "transcript"]
+    stats = dispatcher.stats()
+    assert stats["types"]["transcript"]["shed"] == 1
+    assert stats["types"]["end-of-call-report"]["shed"] == 0
+    assert stats["types"]["assistant-request"]["latency"]["count"] == 1
+    assert budget.wait.count == 2
+
+
+@pytest.mark.asyncio
+async def test_full_class_queue_answers_503_while_vip_budget_is_free(webhook_body):
+    shedder = LoadShedder({"assistant-request": (1, 0), "assistant-request:vip": (1, 0)})
+    dispatcher, _ = _dispatcher(shedder)
+    regular = shedder.budget_for("assistant-request")
+    assert await shedder.acquire(regular)
+
+    body = webhook_body({"type": "assistant-request", "call": {"id": "c1"}})
+    response = await dispatcher.dispatch(body, priority=PRIORITY_DEFAULT)
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    # VIP-звонки не ждут за обычными
+    assert await dispatcher.dispatch(body, priority=PRIORITY_VIP) == {"call": "c1"}
+    assert dispatcher.stats()["types"]["assistant-request"]["shed"] == 1
@@ -0,0 +1,125 @@
+import json
+import time
+from functools import partial
+from loguru import logger
+from app.services.log_index import LogIndex, build_segment_index, index_path_for, index_rotated_segment
+
+BASE_TS = 1767225600  # 2026-01-01 00:00:00 UTC
+
+
+def _line(ts, level="INFO", message=None):
+    return json.dumps({
+        "text": "",
+        "record": {
+            "function": "handler",
+            "level": {"name": level},
+            "line": 1,
+            "message": message or f"at {ts}",
+            "name": "app.main",
+            "time": {"repr": str(ts), "timestamp": ts},
+        }
+    }) + "\n"
+
+
+def _write_segment(path, timestamps, error_every=0):
+    with open(path, "w", encoding="utf-8") as f:
+        for i, ts in enumerate(timestamps):
+            level = "ERROR" if error_every and i % error_every == 0 else "INFO"
+            f.write(_line(ts, level))
+
+
+def test_segment_index_groups_records_into_buckets(tmp_path):
+    segment = tmp_path / "app.2026-01-01_00-00-00_000000.json"
+    _write_segment(segment, [BASE_TS + i * 10 for i in range(30)], error_every=7)
+
+    index = build_segment_index(segment)
+
+    assert index_path_for(segment).exists()
+    # 30 записей по 10 секунд = 5 минутных бакетов
+    assert len(index.runs) == 5
+    assert index.first_ts == BASE_TS
+    assert sum(run.levels.get("ERROR", 0) for run in index.runs) == 5
+
+
+def test_query_spans_rotated_and_active_segments(tmp_path):
+    log_file = tmp_path / "app.json"
+    _write_segment(tmp_path / "app.2026-01-01_00-00-00_000000.json", [BASE_TS + i for i in range(0, 600, 5)])
+    _write_segment(tmp_path / "app.2026-01-01_00-10-00_000000.json", [BASE_TS + i for i in range(600, 1200, 5)])
+    _write_segment(log_file, [BASE_TS + i for i in range(1200, 1800, 5)], error_every=10)
+
+    index = LogIndex(log_file)
+
+    records = index.query(start=BASE_TS + 590, end=BASE_TS + 1210, limit=1000)
+    timestamps = [float(r["timestamp"]) for r in records]
+    assert timestamps == [BASE_TS + i for i in range(590, 1210, 5)]
+
+    errors = index.query(level="error", limit=1000)
+    assert len(errors) == 12
+    assert all(r["level"] == "ERROR" for r in errors)
+
+
+def test_active_segment_is_indexed_incrementally(tmp_path):
+    log_file = tmp_path / "app.json"
+    _write_segment(log_file, [BASE_TS + i for i in range(10)])
+    index = LogIndex(log_file)
+    assert len(index.query(limit=1000)) == 10
+
+    with open(log_file, "a", encoding="utf-8") as f:
+        f.write(_line(BASE_TS + 3600, "CRITICAL"))
+        f.write(_line(BASE_TS + 3601)[:30])  # недописанная строка
+
+    records = index.query(start=BASE_TS + 3000)
+    assert [r["level"] for r in records] == ["CRITICAL"]
+
+
+def test_stale_sidecar_is_rebuilt(tmp_path):
+    segment = tmp_path / "app.2026-01-01_00-00-00_000000.json"
+    _write_segment(segment, [BASE_TS + i for i in range(5)])
+    build_segment_index(segment)
+
+    with open(segment, "a", encoding="utf-8") as f:
+        f.write(_line(BASE_TS + 10))
+
+    index = LogIndex(tmp_path / "app.json")
+    assert len(index.query(limit=100)) == 6
+
+
+def test_loguru_rotation_hook_writes_sidecar(tmp_path):
+    log_file = tmp_path / "app.json"
+    sink_id = logger.add(
+        str(log_file),
+        rotation="2 KB",
+        serialize=True,
+        compression=index_rotated_segment,
+        filter=lambda record: record["extra"].get("rotation_test")
+    )
+    try:
+        test_logger = logger.bind(rotation_test=True)
+        for i in range(20):
+            test_logger.info(f"rotation record {i}")
+    finally:
+        logger.remove(sink_id)
+
+    deadline = time.monotonic() + 3
+    while time.monotonic() < deadline and not list(tmp_path.glob("app.*.json.idx")):
+        time.sleep(0.02)
+
+    assert list(tmp_path.glob("app.*.json.idx"))
+    assert len(LogIndex(log_file).query(limit=100)) == 20
+
+
+def test_loguru_close_does_not_index_live_file(tmp_path):
+    log_file = tmp_path / "app.json"
+    # Без rotation Loguru вызывает compression при logger.remove() с путём активного файла
+    sink_id = logger.add(
+        str(log_file),
+        serialize=True,
+        compression=partial(index_rotated_segment, live_file=str(log_file)),
+        filter=lambda record: record["extra"].get("close_test")
+    )
+    logger.bind(close_test=True).info("live record")
+    logger.remove(sink_id)
+
+    time.sleep(0.1)
+    assert log_file.exists()
+    assert not list(tmp_path.glob("*.idx"))
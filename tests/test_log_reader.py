@@ -0,0 +1,127 @@
+import json
+import pytest
+from httpx import AsyncClient, ASGITransport
+from app.services import log_reader
+from app.services.log_reader import read_log_page
+
+
+def _loguru_line(i, level="INFO", name="app.main"):
+    return json.dumps({
+        "text": f"message {i}\n",
+        "record": {
+            "function": "handler",
+            "level": {"name": level},
+            "line": i,
+            "message": f"message {i}",
+            "name": name,
+            "time": {"repr": f"2026-01-01 00:00:{i % 60:02d}", "timestamp": 1767225600 + i},
+        }
+    })
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = tmp_path / "app.json"
+    lines = []
+    for i in range(300):
+        level = "ERROR" if i % 10 == 0 else "INFO"
+        name = "app.core.logger" if i % 3 == 0 else "app.main"
+        lines.append(_loguru_line(i, level, name))
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+
+def _messages(page):
+    return [r["message"] for r in page.records]
+
+
+def test_tail_returns_last_records_in_order(log_file, monkeypatch):
+    # Маленький блок, чтобы проверить склейку строк на границах блоков
+    monkeypatch.setattr(log_reader, "BLOCK_SIZE", 97)
+    page = read_log_page(log_file, limit=5)
+
+    assert _messages(page) == [f"message {i}" for i in range(295, 300)]
+    assert page.next_after == log_file.stat().st_size
+
+
+def test_before_cursor_pages_backwards(log_file):
+    first = read_log_page(log_file, limit=50)
+    second = read_log_page(log_file, limit=50, before=first.next_before)
+
+    assert _messages(second) == [f"message {i}" for i in range(200, 250)]
+
+    # Самая первая страница файла не даёт курсора дальше
+    page = read_log_page(log_file, limit=1000)
+    assert page.next_before is None
+    assert len(page.records) == 300
+
+
+def test_after_cursor_returns_only_new_records(log_file):
+    page = read_log_page(log_file, limit=10)
+    assert read_log_page(log_file, after=page.next_after).records == []
+
+    with open(log_file, "a", encoding="utf-8") as f:
+        f.write(_loguru_line(300) + "\n")
+        # Недописанная строка не должна попасть в выдачу
+        f.write(_loguru_line(301)[:40])
+
+    new_page = read_log_page(log_file, after=page.next_after)
+    assert _messages(new_page) == ["message 300"]
+
+
+def test_filters_applied_while_streaming(log_file):
+    errors = read_log_page(log_file, limit=3, level="error")
+    assert _messages(errors) == ["message 270", "message 280", "message 290"]
+
+    core = read_log_page(log_file, limit=1000, module="app.core")
+    assert all(r["module"] == "app.core.logger" for r in core.records)
+    assert len(core.records) == 100
+
+
+def test_missing_file_returns_empty_page(tmp_path):
+    page = read_log_page(tmp_path / "missing.json")
+    assert page.records == []
+
+
+@pytest.mark.asyncio
+async def test_logs_endpoint_sets_cursor_headers(log_file, monkeypatch):
+    from app.main import app
+
+    monkeypatch.setattr(log_reader, "LOG_FILE", log_file)
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        response = await ac.get("/v1/logs", params={"limit": 2})
+
+    assert response.status_code == 200
+    assert [r["message"] for r in response.json()] == ["message 298", "message 299"]
+    assert "X-Next-Before" in response.headers
+    assert int(response.headers["X-Next-After"]) == log_file.stat().st_size
+
+
+@pytest.mark.asyncio
+async def test_logs_poll_is_answered_from_file_version(log_file, monkeypatch):
+    from app.main import app
+
+    monkeypatch.setattr(log_reader, "LOG_FILE", log_file)
+    reads = []
+    read = log_reader.read_log_page
+    monkeypatch.setattr(log_reader, "read_log_page", lambda **kwargs: reads.append(kwargs) or read(**kwargs))
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        first = await ac.get("/v1/logs", params={"limit": 2})
+        etag = first.headers["ETag"]
+        repeated = await ac.get("/v1/logs", params={"limit": 2}, headers={"If-None-Match": etag})
+        other_page = await ac.get("/v1/logs", params={"limit": 3}, headers={"If-None-Match": etag})
+        assert len(reads) == 2
+
+        with open(log_file, "a", encoding="utf-8") as f:
+            f.write(_loguru_line(300) + "\n")
+        changed = await ac.get("/v1/logs", params={"limit": 2}, headers={"If-None-Match": etag})
+
+    assert repeated.status_code == 304 and repeated.content == b""
+    assert other_page.status_code == 200
+    assert changed.status_code == 200
+    assert [r["message"] for r in changed.json()] == ["message 299", "message 300"]
+    assert len(reads) == 3
@@ -0,0 +1,64 @@
+import asyncio
+import json
+import pytest
+from types import SimpleNamespace
+from app.core.logger import logger
+from app.services.log_stream import LogBroadcaster, log_broadcaster, stream_events
+
+
+def _record(message, level="INFO", name="app.main"):
+    return {"time": "2026-01-01 00:00:00", "level": SimpleNamespace(name=level), "message": message,
+            "name": name, "function": "handler", "line": 1}
+
+
+@pytest.mark.asyncio
+async def test_subscriber_buffer_drops_oldest():
+    broadcaster = LogBroadcaster()
+    subscriber = broadcaster.subscribe(buffer_size=3)
+
+    for i in range(5):
+        broadcaster.publish(_record(f"msg {i}"))
+
+    assert [json.loads(item)["message"] for item in subscriber.buffer] == ["msg 2", "msg 3", "msg 4"]
+    assert subscriber.dropped == 2
+
+
+@pytest.mark.asyncio
+async def test_filters_are_applied_per_subscriber():
+    broadcaster = LogBroadcaster()
+    errors = broadcaster.subscribe(level="error")
+    core = broadcaster.subscribe(module="app.core")
+
+    broadcaster.publish(_record("boom", level="ERROR"))
+    broadcaster.publish(_record("reloaded", name="app.core.config_watcher"))
+
+    assert [json.loads(item)["message"] for item in errors.buffer] == ["boom"]
+    assert [json.loads(item)["message"] for item in core.buffer] == ["reloaded"]
+
+
+@pytest.mark.asyncio
+async def test_unsubscribed_client_receives_nothing():
+    broadcaster = LogBroadcaster()
+    subscriber = broadcaster.subscribe()
+    broadcaster.unsubscribe(subscriber)
+    broadcaster.publish(_record("ignored"))
+
+    assert not subscriber.buffer
+    assert broadcaster.subscriber_count == 0
+
+
+@pytest.mark.asyncio
+async def test_logger_records_reach_stream():
+    subscriber = log_broadcaster.subscribe(module="tests")
+    events = stream_events(subscriber, heartbeat=0.05)
+    try:
+        logger.info("streamed record")
+        event = await asyncio.wait_for(events.__anext__(), timeout=2)
+        while event.startswith(":"):
+            event = await asyncio.wait_for(events.__anext__(), timeout=2)
+    finally:
+        await events.aclose()
+        log_broadcaster.unsubscribe(subscriber)
+
+    assert event.startswith("data: ")
+    assert json.loads(event[len("data: "):])["message"] == "streamed record"
@@ -0,0 +1,93 @@
+import json
+from loguru import logger
+from app.core.logger import compact_json_format, format_payload
+from app.services.log_index import _record_meta
+from app.services.log_reader import parse_log_entry
+
+
+def test_compact_json_lines_are_readable_by_log_tools(tmp_path):
+    log_file = tmp_path / "app.json"
+    sink_id = logger.add(
+        str(log_file),
+        format=compact_json_format,
+        enqueue=True,
+        filter=lambda record: record["extra"].get("compact_test")
+    )
+    try:
+        test_logger = logger.bind(compact_test=True)
+        test_logger.info("compact {value}", value="record")
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            test_logger.exception("failed")
+        logger.complete()
+    finally:
+        logger.remove(sink_id)
+
+    lines = log_file.read_bytes().splitlines()
+    assert len(lines) == 2
+
+    entry = parse_log_entry(lines[0])
+    assert entry["message"] == "compact record"
+    assert entry["level"] == "INFO"
+    assert entry["module"] == "tests.test_logger"
+
+    ts, level = _record_meta(lines[1])
+    assert level == "ERROR" and ts > 0
+    assert json.loads(lines[1])["exception"].startswith("ZeroDivisionError")
+
+
+def test_format_payload_is_size_capped():
+    payload = {"message": {"type": "transcript", "transcript": "x" * 5000}}
+    text = format_payload(payload, limit=100)
+    assert len(text) < 150
+    assert text.endswith("chars)")
+    assert format_payload({"a": 1}) == "{'a': 1}"
+
+
+def test_background_writer_rotates_and_flushes(tmp_path):
+    from app.core.log_writer import BackgroundLogWriter
+
+    rotated = []
+    log_file = tmp_path / "app.json"
+    writer = BackgroundLogWriter(path=str(log_file), rotation_bytes=1000, on_rotate=rotated.append)
+
+    for i in range(100):
+        writer(f'{{"message": "record {i}"}}\n')
+    writer.stop()
+
+    segments = sorted(tmp_path.glob("app.*.json"))
+    assert rotated and len(segments) == len(rotated)
+    lines = [line for path in segments + [log_file] for line in path.read_text().splitlines()]
+    assert len(lines) == 100
+    assert all(path.stat().st_size <= 1000 for path in segments)
+
+
+def test_background_writer_keeps_records_queued_after_stop(tmp_path):
+    from app.core import log_writer
+    from app.core.log_writer import BackgroundLogWriter
+
+    log_file = tmp_path / "app.json"
+    writer = BackgroundLogWriter(path=str(log_file))
+    # Запись, вставшая в очередь после стоп-маркера, не теряется и не роняет поток
+    writer._queue.put("before\n")
+    writer._queue.put(log_writer._STOP)
+    writer._queue.put("after\n")
+    writer._run()
+
+    assert log_file.read_text().splitlines() == ["before", "after"]
+    assert writer._queue.empty()
+
+
+def test_background_writer_rotation_counts_bytes(tmp_path):
+    from app.core.log_writer import BackgroundLogWriter
+
+    log_file = tmp_path / "app.json"
+    writer = BackgroundLogWriter(path=str(log_file), rotation_bytes=1000)
+    for i in range(100):
+        writer(f'{{"message": "запись {i}"}}\n')
+    writer.stop()
+
+    segments = sorted(tmp_path.glob("app.*.json"))
+    assert segments
+    assert all(path.stat().st_size <= 1000 for path in segments + [log_file])
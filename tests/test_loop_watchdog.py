@@ -0,0 +1,63 @@
+import asyncio
+import time
+import pytest
+from app.core.loop_watchdog import LoopWatchdog
+from app.core.metrics import registry
+
+
+def blocking_handler_step():
+    # Намеренно блокирующий вызов внутри async-кода
+    time.sleep(0.3)
+
+
+@pytest.mark.asyncio
+async def test_blocking_call_is_detected_with_call_site():
+    watchdog = LoopWatchdog(threshold=0.05, interval=0.01)
+    watchdog.start()
+    try:
+        await asyncio.sleep(0.05)
+        assert watchdog.stalls == 0
+
+        blocking_handler_step()
+        await asyncio.sleep(0.05)
+    finally:
+        watchdog.stop()
+
+    stats = watchdog.stats()
+    assert stats["stalls"] == 1
+    [site] = stats["sites"]
+    assert site.startswith("tests/test_loop_watchdog.py:") and site.endswith("in blocking_handler_step")
+    assert "time.sleep(0.3)" in watchdog.last_stack
+    assert stats["max_stall_ms"] >= 250
+
+
+@pytest.mark.asyncio
+async def test_short_pauses_and_idle_loop_are_not_reported():
+    watchdog = LoopWatchdog(threshold=0.1, interval=0.01)
+    watchdog.start()
+    try:
+        for _ in range(5):
+            time.sleep(0.02)
+            await asyncio.sleep(0.02)
+    finally:
+        watchdog.stop()
+    assert watchdog.stalls == 0 and not watchdog.running
+
+
+@pytest.mark.asyncio
+async def test_stalls_are_exported_as_metrics(monkeypatch):
+    from app.core import loop_watchdog as module
+
+    watchdog = LoopWatchdog(threshold=0.05, interval=0.01)
+    monkeypatch.setattr(module, "loop_watchdog", watchdog)
+    watchdog.start()
+    try:
+        blocking_handler_step()
+        await asyncio.sleep(0.05)
+    finally:
+        watchdog.stop()
+
+    text = registry.render()
+    assert "# TYPE app_event_loop_stalls_total counter" in text
+    assert 'in blocking_handler_step"} 1' in text
+    assert "app_event_loop_lag_seconds_count" in text
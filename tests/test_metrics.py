@@ -0,0 +1,102 @@
+import pytest
+from httpx import AsyncClient, ASGITransport
+from app.core.metrics import MetricsRegistry, registry, timed
+from app.main import app
+
+
+def _series(text: str, prefix: str) -> dict:
+    values = {}
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            name, value = line.rsplit(" ", 1)
+            values[name] = value
+    return values
+
+
+def test_render_prometheus_text():
+    metrics = MetricsRegistry(buckets=(0.1, 1.0))
+    histogram = metrics.histogram("op_seconds", "Operation time.", (("operation", 'say "hi"'),))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+    metrics.gauge("queue_depth", "Queue depth.", lambda: {"b": 2, "a": 1}, label="queue")
+    metrics.gauge("generation", "Generation.", lambda: 12345678901234567)
+    metrics.gauge("broken", "Broken source.", lambda: 1 / 0)
+
+    text = metrics.render()
+    assert "# TYPE op_seconds histogram" in text
+    assert 'op_seconds_bucket{operation="say \\"hi\\"",le="0.1"} 1' in text
+    assert 'op_seconds_bucket{operation="say \\"hi\\"",le="1.0"} 2' in text
+    assert 'op_seconds_bucket{operation="say \\"hi\\"",le="+Inf"} 3' in text
+    assert 'op_seconds_count{operation="say \\"hi\\""} 3' in text
+    assert 'queue_depth{queue="a"} 1\nqueue_depth{queue="b"} 2' in text
+    # Целые значения не проходят через float и не теряют точность
+    assert "generation 12345678901234567" in text
+    assert "broken" not in text
+
+
+def test_timed_records_calls_and_failures():
+    @timed("test_operation")
+    def operation(fail: bool = False):
+        if fail:
+            raise ValueError("boom")
+        return "ok"
+
+    histogram = registry.histogram("app_operation_duration_seconds", labels=(("operation", "test_operation"),))
+    before = histogram.count
+    assert operation() == "ok"
+    with pytest.raises(ValueError):
+        operation(fail=True)
+    assert histogram.count == before + 2
+    assert operation.__name__ == "operation"
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_reports_route_templates():
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        await ac.get("/v1/calls/first-call")
+        await ac.get("/v1/calls/second-call")
+        await ac.get("/no-such-route")
+        response = await ac.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    series = _series(response.text, "http_request_duration_seconds_count")
+    # Путь с параметром попадает в одну серию по шаблону маршрута
+    assert int(series['http_request_duration_seconds_count{method="GET",route="/v1/calls/{call_id}",status="404"}']) >= 2
+    assert 'http_request_duration_seconds_count{method="GET",route="unmatched",status="404"}' in series
+    assert not any("first-call" in name for name in series)
+    assert 'app_queue_depth{queue="inbound"}' in response.text
+    assert 'app_operation_duration_seconds_count{operation="config_load"}' in response.text
+
+
+@pytest.mark.asyncio
+async def test_made_up_methods_do_not_create_series():
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        await ac.request("XWARM", "/health")
+        await ac.request("YWARM", "/nope")
+        await ac.get("/metrics")
+        before = _series((await ac.get("/metrics")).text, "http_request_duration_seconds_count")
+        for i in range(50):
+            await ac.request(f"X{i}", "/health")
+            await ac.request(f"Y{i}", "/nope")
+        after = _series((await ac.get("/metrics")).text, "http_request_duration_seconds_count")
+
+    assert set(after) == set(before)
+    assert not any('method="X' in name or 'method="Y' in name for name in after)
+    assert any('method="OTHER"' in name for name in after)
+
+
+@pytest.mark.asyncio
+async def test_readiness_reports_generation_and_queues():
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        response = await ac.get("/ready")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "ready"
+    assert isinstance(body["config_generation"], int)
+    assert set(body["queues"]) == {"inbound", "orders", "telegram", "logs"}
@@ -0,0 +1,155 @@
+import json
+import pytest
+from datetime import datetime, timedelta, timezone
+from httpx import AsyncClient, ASGITransport
+from app.schemas.orders import Order
+from app.services import order_store
+from app.services.order_store import OrderStore, decode_cursor
+
+BASE_TIME = datetime(2026, 1, 1, tzinfo=timezone.utc)
+STATUSES = ["new", "completed", "failed"]
+
+
+def _orders(count):
+    return [
+        Order(
+            id=f"ord-{i:05d}",
+            customer_name=f"Customer {i}",
+            phone=f"+7900{i:07d}",
+            status=STATUSES[i % 3],
+            # Пары заказов с одинаковым временем проверяют tie-break по id
+            created_at=BASE_TIME + timedelta(seconds=i // 2),
+            details={"n": i}
+        )
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = OrderStore(tmp_path / "orders.db", max_workers=2)
+    store.add_orders(_orders(250))
+    yield store
+    store.close()
+
+
+def _walk(store, limit, status=None):
+    seen, cursor, pages = [], None, 0
+    while True:
+        page, cursor = store.list_orders(limit=limit, cursor=cursor, status=status)
+        seen.extend(page)
+        pages += 1
+        if cursor is None:
+            return seen, pages
+
+
+def test_keyset_pagination_covers_all_orders_once(store):
+    seen, pages = _walk(store, limit=40)
+
+    ids = [o["id"] for o in seen]
+    assert len(ids) == 250 and len(set(ids)) == 250
+    assert pages == 7
+    # Новые сверху; при равном времени — по убыванию id
+    keys = [(o["created_at"], o["id"]) for o in seen]
+    assert keys == sorted(keys, reverse=True)
+    assert seen[0]["details"] == {"n": 249}
+
+
+def test_status_filter(store):
+    seen, _ = _walk(store, limit=30, status="failed")
+
+    assert {o["status"] for o in seen} == {"failed"}
+    assert len(seen) == store.count("failed") == 83
+
+
+def test_duplicate_ids_are_ignored(store):
+    assert store.add_orders(_orders(260)) == 10
+    assert store.count() == 260
+
+
+def test_repeated_id_updates_order(store):
+    [order] = _orders(1)
+    updated = order.model_copy(update={
+        "status": "completed",
+        "details": {"n": 0, "fixed": True},
+        "created_at": BASE_TIME + timedelta(days=1)
+    })
+
+    assert store.add_orders([updated]) == 1
+    assert store.count() == 250
+    [row] = [o for o in _walk(store, limit=500)[0] if o["id"] == order.id]
+    assert row["status"] == "completed" and row["details"] == {"n": 0, "fixed": True}
+    # Время создания остаётся от первой записи
+    assert row["created_at"] == BASE_TIME.isoformat()
+
+
+def test_queries_use_indexes(store):
+    conn = store._connection()
+    after = decode_cursor(store.list_orders(limit=5)[1])
+    for status in (None, "new"):
+        where = "WHERE status = ? AND (created_at, id) < (?, ?)" if status else "WHERE (created_at, id) < (?, ?)"
+        params = ([status] if status else []) + list(after) + [5]
+        plan = " ".join(
+            row[3] for row in conn.execute(
+                f"EXPLAIN QUERY PLAN SELECT * FROM orders {where} ORDER BY created_at DESC, id DESC LIMIT ?",
+                params
+            )
+        )
+        assert "USING INDEX idx_orders_" in plan
+        assert "TEMP B-TREE" not in plan
+
+
+def test_invalid_cursor_raises(store):
+    with pytest.raises(ValueError):
+        store.list_orders(cursor="not-a-cursor")
+
+
+@pytest.mark.asyncio
+async def test_orders_endpoints(store, monkeypatch):
+    from app.main import app
+
+    monkeypatch.setattr(order_store, "_store", store)
+    monkeypatch.setattr(order_store, "EXPORT_BATCH_SIZE", 64)
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        first = await ac.get("/v1/orders", params={"limit": 10, "status": "new"})
+        second = await ac.get("/v1/orders", params={"limit": 10, "cursor": first.headers["X-Next-Cursor"]})
+        bad = await ac.get("/v1/orders", params={"cursor": "???"})
+        export = await ac.get("/v1/orders/export")
+
+    assert first.status_code == 200
+    assert len(first.json()) == 10 and {o["status"] for o in first.json()} == {"new"}
+    assert second.json()[0]["created_at"] <= first.json()[-1]["created_at"]
+    assert bad.status_code == 400
+
+    exported = json.loads(export.content)
+    assert len(exported) == 250
+    assert [o["id"] for o in exported] == [o["id"] for o in _walk(store, limit=500)[0]]
+
+
+@pytest.mark.asyncio
+async def test_orders_poll_is_answered_from_data_version(store, monkeypatch):
+    from app.main import app
+
+    monkeypatch.setattr(order_store, "_store", store)
+    pages = []
+    list_orders = store.list_orders
+    monkeypatch.setattr(store, "list_orders", lambda **kwargs: pages.append(kwargs) or list_orders(**kwargs))
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        first = await ac.get("/v1/orders", params={"limit": 10})
+        etag = first.headers["ETag"]
+        repeated = await ac.get("/v1/orders", params={"limit": 10}, headers={"If-None-Match": etag})
+        filtered = await ac.get("/v1/orders", params={"limit": 10, "status": "new"}, headers={"If-None-Match": etag})
+        assert len(pages) == 2
+
+        # Запись из другого соединения (как у фонового писателя заказов)
+        await store.run(store.add_orders, _orders(251)[-1:])
+        changed = await ac.get("/v1/orders", params={"limit": 10}, headers={"If-None-Match": etag})
+
+    assert repeated.status_code == 304 and repeated.content == b""
+    assert filtered.status_code == 200
+    assert changed.status_code == 200 and changed.json()[0]["id"] == "ord-00250"
+    assert len(pages) == 3
@@ -0,0 +1,202 @@
+import json
+import threading
+import time
+import pytest
+from datetime import datetime, timezone
+from httpx import AsyncClient, ASGITransport
+from app.core.config_loader import AppSettings
+from app.handlers import inbound
+from app.schemas.orders import Order
+from app.services import order_store, order_writer as order_writer_module
+from app.services.order_store import OrderStore
+from app.services.order_writer import OrderWriter, collect_tool_results, order_from_end_of_call
+
+FIELDS = {"customer_name": "Client name", "preferred_time": "Time"}
+
+
+def _order(i):
+    return Order(
+        id=f"ord-{i}", customer_name="Client", phone="+79000000000",
+        status="new", created_at=datetime.now(timezone.utc)
+    )
+
+
+class RecordingStore:
+    def __init__(self, fail_times=0):
+        self.batches = []
+        self.fail_times = fail_times
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def add_orders(self, orders):
+        self.gate.wait(5)
+        if self.fail_times:
+            self.fail_times -= 1
+            raise RuntimeError("database is locked")
+        self.batches.append([order.id for order in orders])
+        return len(orders)
+
+
+def test_writer_batches_queued_orders():
+    store = RecordingStore()
+    writer = OrderWriter(store_factory=lambda: store, batch_size=50)
+
+    # Пока первая запись «висит», остальные копятся и уходят пачками
+    store.gate.clear()
+    writer.submit(_order(0))
+    for i in range(1, 121):
+        assert writer.submit(_order(i))
+    store.gate.set()
+    assert writer.flush(5)
+
+    assert sum(len(b) for b in store.batches) == 121
+    # Первую пачку поток мог забрать до того, как очередь заполнилась
+    assert len(store.batches) <= 4
+    assert max(len(b) for b in store.batches) == 50
+    assert writer.written == 121 and writer.batches == len(store.batches)
+    writer.stop()
+
+
+def test_writer_reports_full_queue():
+    store = RecordingStore()
+    store.gate.clear()
+    writer = OrderWriter(store_factory=lambda: store, max_queue=2)
+
+    writer.submit(_order(0))
+    # Поток мог ещё не забрать первый заказ, поэтому заполняем с запасом
+    results = [writer.submit(_order(i)) for i in range(1, 5)]
+    assert results[-1] is False
+
+    store.gate.set()
+    writer.stop()
+
+
+def test_writer_retries_then_gives_up():
+    store = RecordingStore(fail_times=1)
+    writer = OrderWriter(store_factory=lambda: store, retry_delay=0)
+    writer.submit(_order(1))
+    assert writer.flush(5)
+    assert store.batches == [["ord-1"]] and writer.failed == 0
+
+    store.fail_times = 10
+    writer.submit(_order(2))
+    assert writer.flush(5)
+    assert writer.failed == 1
+    writer.stop()
+
+
+def test_tool_results_validate_arguments():
+    message = {
+        "call": {"id": "c1", "customer": {"number": "+79001112233"}},
+        "toolCallList": [
+            {"id": "t1", "function": {"name": "collect_customer_data",
+                                      "arguments": json.dumps({"customer_name": "Ivan", "preferred_time": "10:00"})}},
+            {"id": "t2", "function": {"name": "collect_customer_data", "arguments": {"customer_name": "Ivan"}}},
+            {"id": "t3", "function": {"name": "other_tool", "arguments": {}}},
+        ]
+    }
+
+    results, orders = collect_tool_results(message, FIELDS)
+
+    assert [r["toolCallId"] for r in results] == ["t1", "t2"]
+    assert results[0]["result"] == "Data saved"
+    assert "preferred_time" in results[1]["result"]
+    assert len(orders) == 1
+    assert orders[0].id == "call-c1"
+    assert orders[0].customer_name == "Ivan" and orders[0].phone == "+79001112233"
+    assert orders[0].details == {"customer_name": "Ivan", "preferred_time": "10:00"}
+
+
+def test_end_of_call_requires_complete_data():
+    message = {"call": {"id": "c2"}, "analysis": {"structuredData": {"customer_name": "Anna"}}}
+    assert order_from_end_of_call(message, FIELDS) is None
+
+    message["analysis"]["structuredData"]["preferred_time"] = "evening"
+    order = order_from_end_of_call(message, FIELDS)
+    assert order.status == "completed" and order.id == "call-c2"
+
+
+@pytest.mark.asyncio
+async def test_inbound_tool_call_is_acked_and_persisted(tmp_path, monkeypatch):
+    from app.main import app
+
+    store = OrderStore(tmp_path / "orders.db", max_workers=1)
+    writer = OrderWriter(store_factory=lambda: store)
+    config = AppSettings(
+        system_prompt="Prompt",
+        voice_settings={"provider": "11labs", "voice_id": "adam", "dynamic_fields": FIELDS}
+    )
+    monkeypatch.setattr(order_store, "_store", store)
+    monkeypatch.setattr(order_writer_module, "order_writer", writer)
+    monkeypatch.setattr(inbound, "config_for_message", lambda message: config)
+
+    payload = {"message": {
+        "type": "tool-calls",
+        "call": {"id": "abc", "customer": {"number": "+79005556677"}},
+        "toolCallList": [{"id": "t1", "function": {
+            "name": "collect_customer_data",
+            "arguments": {"customer_name": "Oleg", "preferred_time": "noon"}
+        }}]
+    }}
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        response = await ac.post("/inbound", json=payload)
+        # Повторная доставка того же звонка не создаёт второй заказ
+        await ac.post("/inbound", json=payload)
+
+    assert response.status_code == 200
+    assert response.json() == {"results": [{"toolCallId": "t1", "result": "Data saved"}]}
+
+    assert writer.flush(5)
+    orders, _ = store.list_orders()
+    assert [(o["id"], o["customer_name"], o["phone"]) for o in orders] == [("call-abc", "Oleg", "+79005556677")]
+    writer.stop()
+    store.close()
+
+
+@pytest.mark.asyncio
+async def test_corrected_tool_call_and_end_of_call_update_order(tmp_path, monkeypatch):
+    from app.main import app
+
+    store = OrderStore(tmp_path / "orders.db", max_workers=1)
+    writer = OrderWriter(store_factory=lambda: store)
+    config = AppSettings(
+        system_prompt="Prompt",
+        voice_settings={"provider": "11labs", "voice_id": "adam", "dynamic_fields": FIELDS}
+    )
+    monkeypatch.setattr(order_store, "_store", store)
+    monkeypatch.setattr(order_writer_module, "order_writer", writer)
+    monkeypatch.setattr(inbound, "config_for_message", lambda message: config)
+
+    call = {"id": "fix-1", "customer": {"number": "+79005556677"}}
+
+    def tool_call(tool_call_id, name):
+        return {"message": {"type": "tool-calls", "call": call, "toolCallList": [{"id": tool_call_id, "function": {
+            "name": "collect_customer_data",
+            "arguments": {"customer_name": name, "preferred_time": "noon"}
+        }}]}}
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        await ac.post("/inbound", json=tool_call("t1", "Olga"))
+        assert writer.flush(5)
+        # Клиент поправил имя — ассистент вызывает инструмент ещё раз
+        await ac.post("/inbound", json=tool_call("t2", "Oleg"))
+        assert writer.flush(5)
+        [order] = store.list_orders()[0]
+        assert order["customer_name"] == "Oleg" and order["status"] == "new"
+
+        await ac.post("/inbound", json={"message": {
+            "type": "end-of-call-report",
+            "call": call,
+            "analysis": {"structuredData": {"customer_name": "Oleg", "preferred_time": "evening"}}
+        }})
+
+    deadline = time.monotonic() + 5
+    while store.list_orders()[0][0]["status"] != "completed" and time.monotonic() < deadline:
+        writer.flush(1)
+        time.sleep(0.01)
+    [order] = store.list_orders()[0]
+    assert order["status"] == "completed" and order["details"]["preferred_time"] == "evening"
+    writer.stop()
+    store.close()
@@ -0,0 +1,68 @@
+import json
+from app.core.config_loader import AppSettings
+from app.services.assistant_payload import AssistantResponseCache
+from app.services.knowledge_base import KnowledgeBase
+from app.services.prompt_builder import compile_prompt, estimate_tokens
+
+
+def _config(prompt, **kwargs):
+    return AppSettings(
+        system_prompt=prompt,
+        voice_settings={"provider": "11labs", "voice_id": "adam"},
+        **kwargs
+    )
+
+
+def _kb(tmp_path, paragraphs):
+    source = tmp_path / "kb.txt"
+    source.write_text("\n\n".join(paragraphs), encoding="utf-8")
+    kb = KnowledgeBase(source, tmp_path / "index")
+    kb.build()
+    return kb
+
+
+def test_prompt_without_placeholders_is_fully_static():
+    prompt = compile_prompt(_config('Answer with JSON like {"ok": true}.'))
+    assert prompt.is_static
+    assert prompt.render({}) == 'Answer with JSON like {"ok": true}.'
+
+
+def test_call_placeholders_are_rendered_per_call():
+    prompt = compile_prompt(_config("Caller: {caller_number}. Now: {current_time}. Braces {stay}."))
+    assert not prompt.is_static
+    rendered = prompt.render({"caller_number": "+15550100", "current_time": "12:00"})
+    assert rendered == "Caller: +15550100. Now: 12:00. Braces {stay}."
+    # Значения экранируются для JSON
+    assert json.loads(b'"' + prompt.render_json({"caller_number": 'quote " and \n'}) + b'"').startswith('Caller: quote " and \n')
+
+
+def test_knowledge_context_is_appended(tmp_path):
+    kb = _kb(tmp_path, ["Refunds are processed within 5 days.", "We are open on weekends."])
+    prompt = compile_prompt(_config("You handle refunds."), kb, token_budget=1000)
+
+    text = prompt.render({})
+    assert text.startswith("You handle refunds.\n\n### Knowledge base\n")
+    assert "Refunds are processed" in text
+    assert prompt.knowledge_tokens > 0
+
+
+def test_knowledge_context_is_trimmed_to_budget(tmp_path):
+    kb = _kb(tmp_path, [f"Refund policy detail number {i}. " * 20 for i in range(50)])
+    prompt = compile_prompt(_config("Refund assistant."), kb, token_budget=400)
+
+    assert estimate_tokens(prompt.render({})) <= 400
+    assert prompt.knowledge_tokens > 200
+
+
+def test_assistant_payload_contains_rendered_prompt():
+    cache = AssistantResponseCache()
+    config = _config("Greet caller {caller_number}.")
+    message = {"type": "assistant-request", "call": {"customer": {"number": "+15550199"}}}
+
+    payload = json.loads(cache.get(config, message))
+    messages = payload["assistant"]["model"]["messages"]
+    assert messages == [{"role": "system", "content": "Greet caller +15550199."}]
+
+    # Статичная часть не пересобирается между звонками
+    cache.get(config, {"type": "assistant-request"})
+    assert cache.rebuilds == 1
@@ -0,0 +1,119 @@
+import asyncio
+import pytest
+from httpx import AsyncClient, ASGITransport
+from app.core import rate_limit
+from app.core.rate_limit import AdmissionControl, AdmissionMiddleware, TokenBucketLimiter
+from app.handlers import inbound
+
+
+def test_token_bucket_refills_at_rate(clock):
+    limiter = TokenBucketLimiter(rate=2, burst=3, clock=clock)
+
+    assert [limiter.allow("a") for _ in range(4)] == [True, True, True, False]
+    assert limiter.allow("b")
+    clock.now += 0.5
+    assert limiter.allow("a") and not limiter.allow("a")
+    clock.now += 10
+    # Корзина не копит больше burst
+    assert [limiter.allow("a") for _ in range(4)] == [True, True, True, False]
+    assert limiter.rejected == 3
+
+
+def test_limiter_memory_is_bounded(clock):
+    limiter = TokenBucketLimiter(rate=1, burst=5, max_keys=64, shards=4, clock=clock)
+
+    for i in range(10_000):
+        limiter.allow(f"key-{i}")
+    assert len(limiter) <= 64
+    assert limiter.evicted > 0
+
+    # Простоявшие корзины полны и снимаются без вытеснения живых ключей
+    clock.now += 10
+    evicted = limiter.evicted
+    for i in range(16):
+        limiter.allow(f"fresh-{i}")
+    assert limiter.evicted == evicted
+
+
+def test_zero_rate_disables_limit():
+    limiter = TokenBucketLimiter(rate=0, burst=0)
+    assert all(limiter.allow("a") for _ in range(100))
+    assert len(limiter) == 0
+
+
+async def _app(scope, receive, send):
+    await asyncio.sleep(0.05)
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+@pytest.mark.asyncio
+async def test_middleware_sheds_over_concurrency_and_ip_rate():
+    control = AdmissionControl(max_concurrency=2, ip_limiter=TokenBucketLimiter(rate=0.001, burst=3))
+    transport = ASGITransport(app=AdmissionMiddleware(_app, control))
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        first = await asyncio.gather(*[ac.post("/inbound") for _ in range(3)])
+        second = await asyncio.gather(*[ac.post("/inbound") for _ in range(2)])
+        other = await ac.get("/health")
+
+    assert sorted(r.status_code for r in first) == [200, 200, 429]
+    assert [r.status_code for r in second] == [200, 429]
+    assert second[1].headers["retry-after"]
+    assert other.status_code == 200
+    assert control.stats()["shed_concurrency"] == 1
+    assert control.stats()["shed_ip"] == 1
+    assert control.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_trusted_sources_skip_ip_limit():
+    limiter = TokenBucketLimiter(rate=0.001, burst=1)
+    control = AdmissionControl(max_concurrency=0, ip_limiter=limiter, trusted_sources=["127.0.0.0/8"])
+    transport = ASGITransport(app=AdmissionMiddleware(_app, control))
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        responses = [await ac.post("/inbound") for _ in range(5)]
+
+    assert [r.status_code for r in responses] == [200] * 5
+    assert control.is_trusted("127.0.0.1") and not control.is_trusted("10.0.0.1")
+    assert not control.is_trusted("unknown")
+    assert len(limiter) == 0
+
+
+@pytest.mark.asyncio
+async def test_inbound_limits_caller_before_parsing(monkeypatch):
+    from app.main import app
+
+    monkeypatch.setattr(inbound, "caller_limiter", TokenBucketLimiter(rate=0.001, burst=1))
+    body = b'{"message": {"type": "assistant-request", "call": {"id": "rl-1", "customer": {"number": "+79001234567"}}}}'
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        first = await ac.post("/inbound", content=body)
+        # Невалидный JSON: второй запрос отклоняется раньше разбора
+        second = await ac.post("/inbound", content=body[:-2])
+
+    assert first.status_code == 200
+    assert second.status_code == 429
+    assert second.content == rate_limit.TOO_MANY_REQUESTS_BODY
+
+
+@pytest.mark.asyncio
+async def test_caller_limit_skips_events_of_accepted_call(monkeypatch):
+    from app.main import app
+
+    limiter = TokenBucketLimiter(rate=0.001, burst=1)
+    monkeypatch.setattr(inbound, "caller_limiter", limiter)
+    call = b'"call": {"id": "rl-2", "customer": {"number": "+79007654321"}}'
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        responses = [
+            await ac.post("/inbound", content=b'{"message": {"type": "transcript", "n": %d, %s}}' % (i, call))
+            for i in range(5)
+        ]
+        report = await ac.post("/inbound", content=b'{"message": {"type": "end-of-call-report", %s}}' % call)
+
+    # Телеметрия и отчёт о завершении не расходуют и не упираются в лимит звонящего
+    assert [r.status_code for r in responses] == [202] * 5
+    assert report.status_code == 202
+    assert limiter.allow("+79007654321")
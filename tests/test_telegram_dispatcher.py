@@ -0,0 +1,176 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from app.adapters.telegram import MAX_MESSAGE_LENGTH, TelegramDispatcher
+
+
+class StubTelegram:
+    """Локальный HTTP-сервер, имитирующий Bot API sendMessage."""
+
+    def __init__(self, rate_limit_first=0):
+        self.messages = []
+        self.connections = set()
+        self.rate_limit_left = rate_limit_first
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stub.connections.add(self.client_address)
+                if stub.rate_limit_left > 0:
+                    stub.rate_limit_left -= 1
+                    self._reply(429, {"ok": False, "parameters": {"retry_after": 0.1}})
+                    return
+                stub.messages.append(body["text"])
+                self._reply(200, {"ok": True})
+
+            def _reply(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    server = StubTelegram()
+    yield server
+    server.close()
+
+
+def _dispatcher(url, **kwargs):
+    return TelegramDispatcher(token="TOKEN", chat_id="42", api_url=url, **kwargs)
+
+
+def test_alerts_are_coalesced_into_one_message(stub):
+    dispatcher = _dispatcher(stub.url, batch_window=0.3)
+    for i in range(5):
+        assert dispatcher.submit(f"alert {i}")
+    dispatcher.stop()
+
+    assert len(stub.messages) == 1
+    assert all(f"alert {i}" in stub.messages[0] for i in range(5))
+    assert dispatcher.sent_alerts == 5
+
+
+def test_batches_respect_message_limit(stub):
+    dispatcher = _dispatcher(stub.url, batch_window=0.3)
+    for i in range(5):
+        dispatcher.submit(str(i) * 1500)
+    dispatcher.stop()
+
+    assert all(len(message) <= MAX_MESSAGE_LENGTH for message in stub.messages)
+    assert len(stub.messages) == 3
+    assert dispatcher.sent_alerts == 5
+
+
+def test_rate_limit_honors_retry_after():
+    stub = StubTelegram(rate_limit_first=2)
+    try:
+        dispatcher = _dispatcher(stub.url, batch_window=0)
+        dispatcher.submit("after backoff")
+        dispatcher.stop()
+    finally:
+        stub.close()
+
+    assert stub.messages == ["after backoff"]
+    assert dispatcher.failed == 0
+
+
+def test_connection_is_reused(stub):
+    dispatcher = _dispatcher(stub.url, batch_window=0)
+    for i in range(3):
+        dispatcher.submit(f"alert {i}")
+        # Ждём отправки, чтобы алерты не склеились в одно сообщение
+        deadline = time.monotonic() + 2
+        while len(stub.messages) <= i and time.monotonic() < deadline:
+            time.sleep(0.01)
+    dispatcher.stop()
+
+    assert len(stub.messages) == 3
+    # Все сообщения ушли через одно keep-alive соединение
+    assert len(stub.connections) == 1
+
+
+def test_full_queue_drops_instead_of_blocking(stub):
+    dispatcher = _dispatcher(stub.url, max_queue=2)
+    # Поток не запущен вручную — заполняем очередь быстрее, чем он её разбирает
+    dispatcher._thread = threading.Thread(target=lambda: None)
+    assert dispatcher.submit("1") and dispatcher.submit("2")
+    assert not dispatcher.submit("3")
+    assert dispatcher.dropped == 1
+
+
+def test_unconfigured_dispatcher_skips():
+    dispatcher = TelegramDispatcher(token="", chat_id="")
+    assert not dispatcher.submit("ignored")
+    assert dispatcher.queue_depth == 0
+
+
+def test_ticker_summaries_are_sent_when_idle(stub):
+    summaries = [["x10 in last 60s"]]
+    dispatcher = _dispatcher(
+        stub.url,
+        batch_window=0,
+        # Сводка появляется после отправки первого алерта, как у AlertSuppressor
+        ticker=lambda: summaries.pop() if summaries and stub.messages else [],
+        tick_interval=0.05
+    )
+    dispatcher.submit("first occurrence")
+
+    deadline = time.monotonic() + 2
+    while len(stub.messages) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    dispatcher.stop()
+
+    assert stub.messages == ["first occurrence", "x10 in last 60s"]
+
+
+def test_ticker_runs_during_steady_alerts(stub):
+    ticks = []
+
+    def ticker():
+        ticks.append(time.monotonic())
+        return ["summary"] if len(ticks) == 1 else []
+
+    dispatcher = _dispatcher(stub.url, batch_window=0, ticker=ticker, tick_interval=0.05)
+    # Очередь не пустеет дольше tick_interval, а сводка всё равно уходит
+    deadline = time.monotonic() + 0.5
+    while time.monotonic() < deadline:
+        dispatcher.submit("alert")
+        time.sleep(0.005)
+    dispatcher.stop()
+
+    assert len(ticks) >= 3
+    assert any("summary" in message for message in stub.messages)
+
+
+def test_stop_flushes_pending_summaries(stub):
+    dispatcher = _dispatcher(
+        stub.url,
+        batch_window=0,
+        ticker=lambda: [],
+        tick_interval=60,
+        flusher=lambda: ["x3 in last 60s"]
+    )
+    dispatcher.submit("first occurrence")
+    dispatcher.stop()
+
+    assert stub.messages[-1].endswith("x3 in last 60s")
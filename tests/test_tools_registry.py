@@ -76,3 +76,44 @@ def test_snake_case_preservation():
     # Let's check what actually happens based on our implementation
     assert "first_name" in properties
     assert "last_name" in properties  # "Last_Name" becomes "last_name" in to_snake_case
+
+def test_schema_is_memoized_by_field_content():
+    """
+    Same field mapping (even as a new dict) must hit the cache instead of rebuilding.
+    """
+    from app.services.tools_registry import get_cache_stats
+
+    fields = {"memo_field": "Memoized field"}
+    first = get_dynamic_tool_schema(fields)
+    hits_before = get_cache_stats()["schemas"]["hits"]
+
+    second = get_dynamic_tool_schema(dict(fields))
+
+    assert second is first
+    assert get_cache_stats()["schemas"]["hits"] == hits_before + 1
+
+def test_cache_size_stays_bounded():
+    """
+    Many distinct field sets must not grow the caches past their limits.
+    """
+    from app.services.tools_registry import get_cache_stats
+
+    for i in range(600):
+        get_dynamic_tool_schema({f"tenant_{i}_field": "Per-tenant field"})
+
+    stats = get_cache_stats()
+    assert stats["schemas"]["size"] <= stats["schemas"]["maxsize"]
+    assert stats["models"]["size"] <= stats["models"]["maxsize"]
+
+def test_lru_cache_evicts_least_recently_used():
+    from app.core.utils import LRUCache
+
+    cache = LRUCache(maxsize=2)
+    cache.get_or_create("a", lambda: 1)
+    cache.get_or_create("b", lambda: 2)
+    cache.get_or_create("a", lambda: 0)  # "a" становится самым свежим
+    cache.get_or_create("c", lambda: 3)  # вытесняет "b"
+
+    assert cache.get_or_create("a", lambda: -1) == 1
+    assert cache.get_or_create("b", lambda: -2) == -2
+    assert cache.stats()["hits"] == 2
@@ -0,0 +1,175 @@
+import asyncio
+import json
+import pytest
+from fastapi import Response
+from httpx import AsyncClient, ASGITransport
+from app.core.utils import TTLCache
+from app.handlers import inbound
+from app.handlers.dispatcher import MessageDispatcher
+from app.main import app
+from app.services.webhook_dedup import WebhookDeduplicator, dedup_key
+
+
+def test_ttl_cache_expires_and_evicts(clock):
+    cache = TTLCache(ttl=10, maxsize=3, clock=clock)
+    cache.set("a", 1)
+    clock.now += 5
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+
+    clock.now += 6
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.stats()["expired"] == 1
+
+    for key in "cde":
+        cache.set(key, key)
+    # Переполнение вытесняет самую старую запись
+    assert len(cache) == 3 and cache.get("b") is None
+    assert cache.stats()["evicted"] == 1
+
+    # Простой дольше оборота колеса очищает всё
+    clock.now += 1000
+    assert len(cache.items()) == 0 and len(cache) == 0
+
+
+def test_ttl_cache_add_is_set_if_absent(clock):
+    cache = TTLCache(ttl=10, clock=clock)
+    assert cache.add("k", 1)
+    assert not cache.add("k", 2)
+    assert cache.get("k") == 1
+    clock.now += 20
+    assert cache.add("k", 3)
+    assert cache.get("k") == 3
+
+
+def test_dedup_key():
+    tool_calls = {"type": "tool-calls", "call": {"id": "c1"}, "toolCallList": [{"id": "t1"}, {"id": "t2"}]}
+    assert dedup_key(tool_calls) == "c1:tool-calls:t1,t2"
+    assert dedup_key({"type": "status-update", "call": {"id": "c1"}, "timestamp": 17}) == "c1:status-update:17"
+    # Без идентификатора события повтор не отличить от нового сообщения
+    assert dedup_key({"type": "assistant-request", "call": {"id": "c1"}}) is None
+
+
+@pytest.mark.asyncio
+async def test_repeat_returns_cached_response_without_rerun():
+    dedup = WebhookDeduplicator(ttl=60)
+    calls = []
+
+    async def handler():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"results": [{"toolCallId": "t1", "result": "Тест"}]}
+
+    first, second, third = await asyncio.gather(
+        dedup.run("k", handler), dedup.run("k", handler), dedup.run("k", handler)
+    )
+    repeat, duplicate = await dedup.run("k", handler)
+
+    assert calls == [1]
+    assert first == ({"results": [{"toolCallId": "t1", "result": "Тест"}]}, False)
+    assert second[1] and third[1] and duplicate
+    assert json.loads(repeat.body) == first[0]
+    assert dedup.coalesced == 2 and dedup.duplicates == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_handler_is_not_cached():
+    dedup = WebhookDeduplicator(ttl=60)
+
+    async def failing():
+        raise RuntimeError("boom")
+
+    async def ok():
+        return Response(content=b"ok", media_type="text/plain")
+
+    with pytest.raises(RuntimeError):
+        await dedup.run("k", failing)
+    response, duplicate = await dedup.run("k", ok)
+    assert not duplicate and response.body == b"ok"
+
+
+@pytest.mark.asyncio
+async def test_background_duplicate_is_skipped(webhook_body):
+    dispatcher = MessageDispatcher(workers=1, dedup=WebhookDeduplicator(ttl=60))
+    seen = []
+
+    @dispatcher.background("status-update")
+    def status(message):
+        seen.append(message["status"])
+
+    message = {"type": "status-update", "status": "ended", "call": {"id": "c1"}, "timestamp": 1}
+    for _ in range(3):
+        assert await dispatcher.dispatch(webhook_body(message)) is None
+    assert await dispatcher.dispatch(webhook_body({**message, "timestamp": 2})) is None
+    dispatcher.stop()
+
+    assert seen == ["ended", "ended"]
+    assert dispatcher.stats()["types"]["status-update"]["duplicates"] == 2
+
+
+def test_persistence_round_trip(tmp_path, clock):
+    path = tmp_path / "dedup.json"
+    dedup = WebhookDeduplicator(ttl=60, path=path, clock=clock)
+    dedup.mark("live", {"status": "received"})
+    clock.now += 50
+    dedup.mark("fresh", {"status": "received"})
+    dedup.save()
+
+    clock.now += 20
+    restored = WebhookDeduplicator(ttl=60, path=path, clock=clock)
+    # "live" истёк за время простоя, "fresh" ещё действует
+    assert not restored.mark("fresh", {})
+    assert restored.mark("live", {})
+
+
+def test_workers_save_separate_files_merged_on_load(tmp_path, monkeypatch, clock):
+    from app.services import webhook_dedup as module
+
+    path = tmp_path / "dedup.json"
+    for pid, key in ((101, "first"), (102, "second")):
+        monkeypatch.setattr(module.os, "getpid", lambda pid=pid: pid)
+        worker = WebhookDeduplicator(ttl=60, path=path, clock=clock)
+        worker.mark(key, {"status": "received"})
+        worker.save()
+    # Истёкший файл давно остановленного воркера
+    (tmp_path / "dedup.99.json").write_text(json.dumps([["gone", 10.0, 200, "application/json", "{}"]]))
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["dedup.101.json", "dedup.102.json", "dedup.99.json"]
+    restored = WebhookDeduplicator(ttl=60, path=path, clock=clock)
+    assert not restored.mark("first", {}) and not restored.mark("second", {})
+    assert not (tmp_path / "dedup.99.json").exists()
+
+
+def test_broken_persistence_file_is_ignored(tmp_path):
+    path = tmp_path / "dedup.json"
+    path.write_text("{not json", encoding="utf-8")
+    assert len(WebhookDeduplicator(ttl=60, path=path).cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_inbound_repeated_tool_call_is_processed_once(monkeypatch):
+    monkeypatch.setattr(inbound.inbound_dispatcher, "dedup", WebhookDeduplicator(ttl=60))
+    recorded = []
+
+    async def record(orders):
+        recorded.extend(orders)
+
+    monkeypatch.setattr(inbound, "record_orders", record)
+    payload = {"message": {
+        "type": "tool-calls",
+        "call": {"id": "dedup-call", "customer": {"number": "+79005550001"}},
+        "toolCallList": [{"id": "t-dedup", "function": {
+            "name": "collect_customer_data",
+            "arguments": {"customer_name": "Anna"}
+        }}]
+    }}
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        first = await ac.post("/inbound", json=payload)
+        second = await ac.post("/inbound", json=payload)
+
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json()
+    assert len(recorded) <= 1
+    assert inbound.inbound_dispatcher.dedup.duplicates == 1